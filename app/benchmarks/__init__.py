@@ -0,0 +1 @@
+"""Benchmark suite of the assignment service, see `python -m app.benchmarks`"""
@@ -0,0 +1,108 @@
+"""Command line of the benchmark suite
+
+    python -m app.benchmarks run --output bench.json
+    python -m app.benchmarks compare --threshold 0.25
+
+`compare` runs the tracked scenarios of the baseline (or reads
+`--current`) and exits with 1 when one of them regressed. The baseline
+defaults to the committed `app/benchmarks/baseline.json`, regenerated on
+the reference machine with
+
+    python -m app.benchmarks run --scenario small --scenario medium \
+        --scenario wide_weights --scenario tight_volume \
+        --output app/benchmarks/baseline.json
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from app.benchmarks.runner import (
+    BASELINE,
+    compare,
+    run,
+    select_scenarios,
+)
+
+
+def _run(args: argparse.Namespace) -> dict:
+    return run(
+        select_scenarios(args.scenario),
+        repeat=args.repeat,
+        backend=args.backend,
+        compact=args.compact,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark")
+    compare_parser = commands.add_parser(
+        "compare", help="fail when the results regressed against a baseline"
+    )
+    compare_parser.add_argument(
+        "baseline",
+        nargs="?",
+        default=str(BASELINE),
+        help="stored results, the committed baseline if unset",
+    )
+    compare_parser.add_argument(
+        "--current", help="results to compare, runs the benchmark if unset"
+    )
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="accepted relative increase, 0.25 for 25%%",
+    )
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--output", help="save the results as JSON")
+        sub.add_argument("--scenario", action="append", help="scenario name")
+        sub.add_argument("--repeat", type=int, default=3)
+        sub.add_argument("--backend", default="auto")
+        sub.add_argument("--compact", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not args.scenario:
+            # the untracked scenarios never regress, no need to run them
+            args.scenario = [
+                name
+                for name, s in baseline["scenarios"].items()
+                if s.get("tracked", True)
+            ]
+
+    if args.command == "compare" and args.current:
+        with open(args.current) as f:
+            results = json.load(f)
+    else:
+        results = _run(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.command == "run":
+        if not args.output:
+            json.dump(results, sys.stdout, indent=2)
+        return 0
+
+    regressions = compare(baseline, results, threshold=args.threshold)
+    for r in regressions:
+        print(
+            "{scenario}/{phase} {metric}: {baseline:.2f} -> {current:.2f} "
+            "(x{ratio:.2f})".format(**r)
+        )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Benchmark runner and regression gate
+
+Every phase of the assignment service is run on the generated scenarios.
+The wall time is the best of `repeat` runs and the peak memory is traced
+with `tracemalloc` on a separate run, so the tracing does not slow down
+the timed runs.
+"""
+import platform
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+from app.benchmarks.workloads import SCENARIOS, Scenario, generate
+from app.services.parcel_assignment import AssignmentService
+
+Results = Dict[str, Any]
+
+METRICS = ("wall_ms", "peak_kib")
+
+# committed results of the tracked scenarios, the default of `compare`
+BASELINE = Path(__file__).with_name("baseline.json")
+
+
+def measure(fn: Callable[[], Any], repeat: int = 3) -> Dict[str, float]:
+    """Best wall time over `repeat` runs and peak memory of the function"""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    return {"wall_ms": best * 1000, "peak_kib": peak / 1024}
+
+
+def run_scenario(
+    scenario: Scenario, repeat: int = 3, **options: Any
+) -> Dict[str, Dict[str, float]]:
+    """Measure every phase of the assignment service on the scenario
+
+    Parameters
+    ----------
+    scenario: Scenario
+        the generated problem
+    repeat: int
+        number of timed runs of every phase
+    options: Any
+        options of the assignment service, e.g. backend or compact
+
+    Returns
+    -------
+    Dict[str, Dict[str, float]]
+        wall time and peak memory of every phase
+    """
+    trains, parcels = generate(scenario)
+
+    def setup():
+        return AssignmentService(trains, parcels, **options)
+
+    svc = setup()
+    selected = svc._select_trains()
+
+    phases = {
+        "setup": setup,
+        "table_max": lambda: svc.compute_table_for_max(
+            weights=list(svc.parcels.weights),
+            costs=list(svc.parcels.volumes),
+        ),
+        "select_trains": svc._select_trains,
+        "assign_parcels": lambda: svc._assign_parcels(
+            svc.parcels.unassigned(), selected[0]
+        ),
+        "process": svc.process,
+    }
+
+    return {name: measure(fn, repeat) for name, fn in phases.items()}
+
+
+def run(
+    scenarios: Iterable[Scenario] = SCENARIOS,
+    repeat: int = 3,
+    **options: Any,
+) -> Results:
+    """Run the benchmark on the scenarios
+
+    Returns
+    -------
+    Results
+        the results, ready to be saved as JSON
+    """
+    scenarios = list(scenarios)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": repeat,
+            "options": options,
+        },
+        "scenarios": {
+            s.name: {
+                "tracked": s.tracked,
+                "phases": run_scenario(s, repeat, **options),
+            }
+            for s in scenarios
+        },
+    }
+
+
+def compare(
+    baseline: Mapping[str, Any],
+    results: Mapping[str, Any],
+    threshold: float = 0.25,
+    min_wall_ms: float = 1.0,
+) -> List[Dict[str, Any]]:
+    """Find the tracked phases that regressed against the baseline
+
+    Parameters
+    ----------
+    baseline: Mapping[str, Any]
+        stored results
+    results: Mapping[str, Any]
+        new results
+    threshold: float
+        accepted relative increase of a metric, 0.25 for 25%
+    min_wall_ms: float
+        wall times below this are noise and never regress
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        the regressions, empty when the gate passes
+    """
+    regressions = []
+
+    for name, scenario in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None or not before.get("tracked", True):
+            continue
+
+        for phase, metrics in scenario["phases"].items():
+            for metric in METRICS:
+                old = before["phases"].get(phase, {}).get(metric)
+                new = metrics[metric]
+                if old is None:
+                    continue
+                if metric == "wall_ms" and new < min_wall_ms:
+                    continue
+
+                if new > old * (1 + threshold):
+                    regressions.append(
+                        {
+                            "scenario": name,
+                            "phase": phase,
+                            "metric": metric,
+                            "baseline": old,
+                            "current": new,
+                            "ratio": new / old if old else float("inf"),
+                        }
+                    )
+
+    return regressions
+
+
+def select_scenarios(names: Optional[Iterable[str]]) -> List[Scenario]:
+    if not names:
+        return list(SCENARIOS)
+
+    by_name = {s.name: s for s in SCENARIOS}
+    unknown = set(names) - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    return [by_name[name] for name in names]
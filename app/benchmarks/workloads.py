@@ -0,0 +1,101 @@
+"""Synthetic workloads of the assignment service
+
+The parcels and trains are generated from a seed, so a scenario is the
+same problem on every run and its timings can be compared between runs.
+"""
+import random
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from app.services.batches import ParcelItem, TrainItem
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """A generated assignment problem
+
+    Parameters
+    ----------
+    name: str
+        name of the scenario in the results
+    parcels: int
+        number of parcels
+    trains: int
+        number of trains
+    weight_spread: int
+        parcel weights are drawn from 1 to `weight_spread`
+    volume_tightness: float
+        total volume of the trains over the total volume of the parcels,
+        close to 1 the volume constrains the train selection
+    seed: int
+        seed of the generator
+    tracked: bool
+        compared against the baseline by the regression gate
+    """
+
+    name: str
+    parcels: int
+    trains: int
+    weight_spread: int = 20
+    volume_tightness: float = 3.0
+    seed: int = 0
+    tracked: bool = True
+
+
+SCENARIOS = [
+    Scenario("small", parcels=50, trains=8),
+    Scenario("medium", parcels=200, trains=16),
+    Scenario("wide_weights", parcels=100, trains=12, weight_spread=200),
+    Scenario("tight_volume", parcels=100, trains=12, volume_tightness=1.2),
+    Scenario("many_trains", parcels=100, trains=40, tracked=False),
+]
+
+
+def generate_parcels(
+    count: int, weight_spread: int, rng: random.Random
+) -> List[ParcelItem]:
+    return [
+        ParcelItem(
+            id=i + 1,
+            weight=rng.randint(1, weight_spread),
+            volume=rng.randint(1, 10),
+        )
+        for i in range(count)
+    ]
+
+
+def generate_trains(
+    count: int,
+    parcels: List[ParcelItem],
+    volume_tightness: float,
+    rng: random.Random,
+) -> List[TrainItem]:
+    """Trains carrying twice the parcel weight and `volume_tightness` times
+    their volume together, with costs roughly proportional to capacity"""
+    total_weight = sum(p.weight for p in parcels)
+    total_volume = sum(p.volume for p in parcels)
+
+    trains = []
+    for i in range(count):
+        weight = max(int(2 * total_weight / count * rng.uniform(0.5, 1.5)), 1)
+        volume = max(
+            int(
+                volume_tightness * total_volume / count * rng.uniform(0.5, 1.5)
+            ),
+            1,
+        )
+        cost = round(weight * rng.uniform(0.8, 1.2), 2)
+        trains.append(TrainItem(i + 1, weight, volume, cost))
+
+    return trains
+
+
+def generate(scenario: Scenario) -> Tuple[List[TrainItem], List[ParcelItem]]:
+    """Generate the trains and parcels of the scenario"""
+    rng = random.Random(scenario.seed)
+    parcels = generate_parcels(scenario.parcels, scenario.weight_spread, rng)
+    trains = generate_trains(
+        scenario.trains, parcels, scenario.volume_tightness, rng
+    )
+
+    return trains, parcels
@@ -20,6 +20,103 @@ class BaseConfig(BaseSettings):
 class DefaultConfig(BaseConfig):
     DATABASE_URI: Optional[str] = None
 
+    # knapsack backend used by the assignment service: auto, numpy or python
+    KNAPSACK_BACKEND: str = "auto"
+    # rolling row + bit-packed decisions instead of full knapsack tables
+    KNAPSACK_COMPACT: bool = True
+    # quantization steps of the parcel/train weights and volumes,
+    # None scales the posted values exactly
+    WEIGHT_PRECISION: Optional[float] = None
+    VOLUME_PRECISION: Optional[float] = None
+    # the most integer units of the largest weight or volume, the values
+    # are quantized conservatively past it (float noise like
+    # 0.30000000000000004 takes ~10^17 units exactly)
+    SCALE_MAX_UNITS: int = 1_000_000
+    # upper bound of the (weight, volume) states kept by the train selection
+    TRAIN_SELECTION_MAX_STATES: int = 100_000
+    # default strategy of the fill: exact, greedy or fptas
+    FILL_STRATEGY: str = "exact"
+    # accepted relative loss of the fptas strategy
+    FPTAS_EPSILON: float = 0.1
+    # fill the capacity left in the filled but unbooked trains first
+    FILL_INCREMENTAL: bool = False
+    # parcels assigned by one UPDATE statement of the fill, each parcel
+    # takes 3 of the SQLite variables
+    FILL_UPDATE_CHUNK: int = 5000
+    # fills solved again when another worker wrote the parcels or the
+    # trains first, before answering 409
+    FILL_CONFLICT_RETRIES: int = 3
+    # solve one assignment per train line in parallel, the parcels routed
+    # to the lines by the policy: capacity or hash
+    FILL_SHARDED: bool = False
+    FILL_SHARD_POLICY: str = "capacity"
+    # how long a booked train occupies its line
+    LINE_OCCUPANCY_MINUTES: float = 60
+    # leave the trains of the lines occupied at the time of the fill
+    FILL_SKIP_BUSY_LINES: bool = True
+
+    # SQLite storage profile, applied on every connection (None keeps the
+    # SQLite default): write-ahead log so the readers do not block behind
+    # the fill, fsync at the checkpoints only
+    SQLITE_JOURNAL_MODE: Optional[str] = "wal"
+    SQLITE_SYNCHRONOUS: Optional[str] = "normal"
+    # wait this long for a lock instead of failing with "database is locked"
+    SQLITE_BUSY_TIMEOUT_MS: Optional[int] = 5000
+    # page cache and memory map of every connection
+    SQLITE_CACHE_SIZE_KIB: Optional[int] = 64 * 1024
+    SQLITE_MMAP_SIZE: Optional[int] = 256 * 1024 * 1024
+    # temporary tables and indexes: default, file or memory
+    SQLITE_TEMP_STORE: Optional[str] = "memory"
+    # checkpoint the WAL into the database every N pages written
+    SQLITE_WAL_AUTOCHECKPOINT: Optional[int] = 1000
+    # checkpoint mode run at shutdown: passive, full, restart or truncate
+    SQLITE_SHUTDOWN_CHECKPOINT: Optional[str] = "truncate"
+
+    # where the solvers run: process, thread or inline
+    SOLVER_EXECUTOR: str = "process"
+    # size of the solver pool, None for the number of CPUs
+    SOLVER_POOL_SIZE: Optional[int] = None
+    # multiprocessing start method of the process pool
+    SOLVER_START_METHOD: Optional[str] = "spawn"
+    # the most fills solved at the same time
+    SOLVER_MAX_CONCURRENCY: int = 2
+    # the most background fills waiting for the worker, more are refused
+    FILL_JOB_MAX_QUEUED: int = 100
+    # a running job without a heartbeat of its worker for this long is
+    # queued again by the next worker starting
+    FILL_JOB_LEASE_SECONDS: float = 60
+
+    # encode the list and fill responses with orjson, without validating
+    # the rows read from our own tables
+    FAST_JSON: bool = False
+
+    # cached responses of the train and line endpoints, 0 disables the cache
+    READ_CACHE_MAX_ENTRIES: int = 256
+    READ_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+    # the longest a response is served from the cache, for the writes of
+    # the other workers
+    READ_CACHE_TTL_SECONDS: float = 30
+
+    # default and maximum number of rows in a page of the list endpoints
+    PAGE_SIZE: int = 100
+    MAX_PAGE_SIZE: int = 1000
+
+    # the most parcels posted at once to POST /parcels/bulk
+    BULK_MAX_ITEMS: int = 5000
+    # rows inserted by one INSERT statement, under the SQLite variable limit
+    BULK_INSERT_CHUNK: int = 500
+    # rows of a manifest upload inserted in one transaction
+    MANIFEST_CHUNK_ROWS: int = 10_000
+    # Arrow manifests larger than this are spooled to disk
+    MANIFEST_SPOOL_BYTES: int = 64 * 1024 * 1024
+    # the most rejected rows detailed in the upload summary
+    MANIFEST_MAX_REJECTS: int = 100
+
+    # the most fill solutions cached, 0 disables the cache
+    SOLUTION_CACHE_MAX_ENTRIES: int = 128
+    # the most bytes of pickled fill solutions cached
+    SOLUTION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
 
 class DevConfig(DefaultConfig):
     model_config = SettingsConfigDict(env_prefix="DEV_")
@@ -32,6 +129,9 @@ class ProdConfig(DefaultConfig):
 class TestConfig(DefaultConfig):
     DATABASE_URI: Optional[str] = "sqlite:///test.db"
     TESTING: bool = True
+    SOLVER_EXECUTOR: str = "inline"
+    SOLUTION_CACHE_MAX_ENTRIES: int = 0
+    READ_CACHE_MAX_ENTRIES: int = 0
 
     model_config = SettingsConfigDict(env_prefix="TEST_")
 
@@ -1,7 +1,10 @@
+from typing import List
+
 import databases
 import sqlalchemy
 
 from app.config import app_config
+from app.storage import ProfiledConnection, apply_pragmas
 
 metadata = sqlalchemy.MetaData()
 engine = sqlalchemy.create_engine(
@@ -9,6 +12,12 @@ engine = sqlalchemy.create_engine(
     connect_args={"check_same_thread": False},  # only needed for sqlite
 )
 
+
+@sqlalchemy.event.listens_for(engine, "connect")
+def _apply_storage_profile(dbapi_connection, _):
+    apply_pragmas(dbapi_connection)
+
+
 # tables
 TrainLine = sqlalchemy.Table(
     "trainlines",
@@ -29,6 +38,14 @@ Train = sqlalchemy.Table(
     sqlalchemy.Column("line_id", sqlalchemy.ForeignKey("trainlines.id")),
     sqlalchemy.Column("ready_to_book", sqlalchemy.Boolean, default=False),
     sqlalchemy.Column("booked_at", sqlalchemy.DateTime),
+    # bumped by every write of the fill and the booking, which only write
+    # the version they read
+    sqlalchemy.Column(
+        "version",
+        sqlalchemy.Integer,
+        nullable=False,
+        server_default=sqlalchemy.text("0"),
+    ),
 )
 
 Parcel = sqlalchemy.Table(
@@ -38,9 +55,185 @@ Parcel = sqlalchemy.Table(
     sqlalchemy.Column("weight", sqlalchemy.Integer),
     sqlalchemy.Column("volume", sqlalchemy.Integer),
     sqlalchemy.Column("train_id", sqlalchemy.ForeignKey("trains.id")),
+    sqlalchemy.Column(
+        "version",
+        sqlalchemy.Integer,
+        nullable=False,
+        server_default=sqlalchemy.text("0"),
+    ),
+)
+
+# a line is occupied by a booked train, see app/services/occupancy.py
+LineOccupancy = sqlalchemy.Table(
+    "line_occupancy",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column(
+        "line_id", sqlalchemy.ForeignKey("trainlines.id"), nullable=False
+    ),
+    sqlalchemy.Column("train_id", sqlalchemy.ForeignKey("trains.id")),
+    # occupied from start_at, until before end_at
+    sqlalchemy.Column("start_at", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column("end_at", sqlalchemy.DateTime, nullable=False),
+)
+
+# fills run in the background, see app/services/fill_jobs.py
+FillJob = sqlalchemy.Table(
+    "fill_jobs",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    # queued, running, done or failed
+    sqlalchemy.Column("state", sqlalchemy.String, nullable=False),
+    # the phase of the fill running: fetch, solve or update
+    sqlalchemy.Column("phase", sqlalchemy.String),
+    sqlalchemy.Column("progress", sqlalchemy.Float, default=0),
+    # the query parameters of the fill
+    sqlalchemy.Column("params", sqlalchemy.JSON, nullable=False),
+    sqlalchemy.Column("result", sqlalchemy.JSON),
+    sqlalchemy.Column("error", sqlalchemy.String),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime),
+    sqlalchemy.Column("started_at", sqlalchemy.DateTime),
+    sqlalchemy.Column("finished_at", sqlalchemy.DateTime),
+    # the lease of the worker running the job, renewed by its heartbeat
+    sqlalchemy.Column("worker_id", sqlalchemy.String),
+    sqlalchemy.Column("heartbeat_at", sqlalchemy.DateTime),
+)
+# one row of counters bumped in the transactions writing the trains or
+# the lines, the read caches of all the workers compare their responses
+# against it with a primary key lookup
+DataVersion = sqlalchemy.Table(
+    "data_versions",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column(
+        "trains",
+        sqlalchemy.Integer,
+        nullable=False,
+        server_default=sqlalchemy.text("0"),
+    ),
+    sqlalchemy.Column(
+        "trainlines",
+        sqlalchemy.Integer,
+        nullable=False,
+        server_default=sqlalchemy.text("0"),
+    ),
+)
+
+sqlalchemy.Index(
+    "ix_fill_jobs_pending",
+    FillJob.c.id,
+    sqlite_where=FillJob.c.state.in_(["queued", "running"]),
+)
+
+# indexes of the hot queries: the unassigned parcels of the fill, the
+# parcels of a train, the unbooked trains of the fill, the booking and the
+# train list, and the trains of a line
+# covers the fill query, train_id included so SQLite can check the filter
+# without reading the table
+sqlalchemy.Index(
+    "ix_parcels_unassigned",
+    Parcel.c.id,
+    Parcel.c.weight,
+    Parcel.c.volume,
+    Parcel.c.train_id,
+    sqlite_where=Parcel.c.train_id == None,
 )
+# partial too, so the unassigned parcels are read from the index above
+sqlalchemy.Index(
+    "ix_parcels_train_id",
+    Parcel.c.train_id,
+    sqlite_where=Parcel.c.train_id != None,
+)
+sqlalchemy.Index(
+    "ix_trains_unbooked",
+    Train.c.ready_to_book,
+    Train.c.id,
+    sqlite_where=Train.c.booked_at == None,
+)
+sqlalchemy.Index(
+    "ix_trains_unbooked_name",
+    Train.c.name,
+    sqlite_where=Train.c.booked_at == None,
+)
+sqlalchemy.Index("ix_trains_line_id", Train.c.line_id)
+
+
+def create_missing_columns(bind: sqlalchemy.engine.Engine) -> List[str]:
+    """Add the columns missing in the tables of an existing database
+
+    Like the indexes, `create_all` does not add the columns declared since
+    the tables were created. The columns added need a server default or
+    to be nullable.
+
+    Returns
+    -------
+    List[str]
+        names of the columns added, as table.column
+    """
+    inspector = sqlalchemy.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = sqlalchemy.schema.CreateColumn(column).compile(bind)
+                    conn.execute(
+                        sqlalchemy.text(
+                            f"ALTER TABLE {table.name} ADD COLUMN {ddl}"
+                        )
+                    )
+                    added.append(f"{table.name}.{column.name}")
+
+    return added
+
+
+def create_missing_indexes(bind: sqlalchemy.engine.Engine) -> List[str]:
+    """Create the indexes missing in an existing database
+
+    `create_all` only creates the indexes of the tables it creates, this
+    adds the indexes declared since the tables were created. The indexes
+    are matched by name, rename an index when its definition changes.
+
+    Returns
+    -------
+    List[str]
+        names of the indexes created
+    """
+    inspector = sqlalchemy.inspect(bind)
+    created = []
+
+    for table in metadata.sorted_tables:
+        existing = {
+            index["name"] for index in inspector.get_indexes(table.name)
+        }
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind, checkfirst=True)
+                created.append(index.name)
+
+    return created
+
+
+def create_data_version_row(bind: sqlalchemy.engine.Engine) -> None:
+    """Insert the row of the data versions, once"""
+    with bind.begin() as conn:
+        if conn.execute(sqlalchemy.select(DataVersion.c.id)).first() is None:
+            conn.execute(DataVersion.insert().values(id=1))
+
 
 metadata.create_all(engine)
+create_missing_columns(engine)
+create_missing_indexes(engine)
+create_data_version_row(engine)
 database = databases.Database(
-    app_config.DATABASE_URI, force_rollback=app_config.TESTING
+    app_config.DATABASE_URI,
+    force_rollback=app_config.TESTING,
+    # every connection of `databases` applies the storage profile too
+    factory=ProfiledConnection,
 )
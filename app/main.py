@@ -4,12 +4,22 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
 from fastapi.exception_handlers import http_exception_handler
+from fastapi.responses import PlainTextResponse
 
 from app.config import app_config
-from app.db import database
+from app.db import database, engine
+from app.routers.fill_job import router as fill_job_router
 from app.routers.parcel import router as parcel_router
+from app.routers.parcel import run_fill
+from app.routers.read_cache import read_cache
 from app.routers.train import router as train_router
 from app.routers.trainline import router as trainline_router
+from app.services.executor import solver_executor
+from app.services.fill_jobs import fill_job_queue
+from app.services.metrics import metrics
+from app.services.occupancy import line_occupancy
+from app.services.solution_cache import solution_cache
+from app.storage import checkpoint, verify_storage_profile
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +27,17 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     await database.connect()
+    with engine.connect() as conn:
+        verify_storage_profile(conn.connection)
+    await line_occupancy.rebuild()
+    await fill_job_queue.start(run_fill)
     yield
+    await fill_job_queue.stop()
     await database.disconnect()
+    solver_executor.shutdown()
+    # fold the WAL back into the database file
+    with engine.connect() as conn:
+        checkpoint(conn.connection)
 
 
 app = FastAPI(lifespan=lifespan)
@@ -26,6 +45,7 @@ app = FastAPI(lifespan=lifespan)
 app.include_router(parcel_router, tags=["Parcel"])
 app.include_router(train_router, tags=["Train"])
 app.include_router(trainline_router, tags=["Train Line"])
+app.include_router(fill_job_router, tags=["Fill Job"])
 
 
 @app.get("/ping")
@@ -37,6 +57,21 @@ def pong():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Histograms of the fills in the Prometheus text format"""
+    for name, value in solution_cache.stats().items():
+        metrics.set_gauge(
+            f"solution_cache_{name}", value, help="Fill solution cache"
+        )
+    for name, value in read_cache.stats().items():
+        metrics.set_gauge(
+            f"read_cache_{name}", value, help="Train and line read cache"
+        )
+
+    return metrics.render()
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handle_logging(request, exc):
     logger.error(f"HTTPException: {exc.status_code} {exc.detail}")
@@ -0,0 +1,25 @@
+"""Fill Job Schemas"""
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+from app.models.parcel import ParcelFillResponseModel
+
+
+class FillJobResponseModel(BaseModel):
+    id: int
+    # queued, running, done or failed
+    state: str
+    # the phase of the fill running: fetch, solve or update
+    phase: Optional[str] = None
+    # from 0 to 1
+    progress: float = 0
+    # the response of the fill once done
+    result: Optional[ParcelFillResponseModel] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,12 +1,13 @@
 """Parcel Schemas"""
-from typing import Optional
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ParcelInputModel(BaseModel):
-    weight: float
-    volume: float
+    # finite and not negative, the fill scales them to integer units
+    weight: float = Field(ge=0, allow_inf_nan=False)
+    volume: float = Field(ge=0, allow_inf_nan=False)
 
 
 class ParcelResponseModel(ParcelInputModel):
@@ -16,6 +17,48 @@ class ParcelResponseModel(ParcelInputModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ParcelBulkErrorModel(BaseModel):
+    # position of the item in the posted list
+    index: int
+    field: str
+    message: str
+
+
+class ParcelBulkResponseModel(BaseModel):
+    # ids of the inserted parcels in the order of the posted list,
+    # None for the invalid items
+    ids: List[Optional[int]]
+    errors: List[ParcelBulkErrorModel]
+
+
+class ParcelManifestRejectModel(BaseModel):
+    # row number in the manifest, the header excluded
+    line: int
+    message: str
+
+
+class ParcelManifestResponseModel(BaseModel):
+    rows: int
+    inserted: int
+    rejected: int
+    # the first rejected rows, at most MANIFEST_MAX_REJECTS
+    rejects: List[ParcelManifestRejectModel]
+    elapsed_ms: float
+    rows_per_second: float
+
+
+class ParcelFillDebugModel(BaseModel):
+    # milliseconds spent in every phase of the fill
+    timings_ms: Dict[str, float]
+    counters: Dict[str, int]
+
+
 class ParcelFillResponseModel(BaseModel):
     assigned_items: int
     total_cost: float
+    # reported when the fill runs with a deadline
+    optimal: Optional[bool] = None
+    lower_bound: Optional[float] = None
+    gap: Optional[float] = None
+    # reported with debug=true
+    debug: Optional[ParcelFillDebugModel] = None
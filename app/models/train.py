@@ -11,6 +11,8 @@ class TrainInputModel(BaseModel):
     weight: float
     volume: float
     ready_to_book: Optional[bool] = False
+    # the train line the train runs on
+    line_id: Optional[int] = None
 
 
 class TrainResponseModel(TrainInputModel):
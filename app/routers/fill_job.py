@@ -0,0 +1,21 @@
+"""Router for the background fill jobs"""
+import logging
+
+from fastapi import APIRouter, HTTPException
+
+from app.models.fill_job import FillJobResponseModel
+from app.services.fill_jobs import get_job
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.get("/fill-jobs/{job_id}", response_model=FillJobResponseModel)
+async def get_fill_job(job_id: int):
+    logger.info("Getting the state of a fill job")
+
+    job = await get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Fill job not found")
+
+    return job
@@ -0,0 +1,58 @@
+"""Keyset pagination of the list endpoints
+
+The pages are read with `WHERE key > :after ORDER BY key LIMIT :limit`,
+so a page costs the same wherever it is in the table. The body stays the
+list of the rows and the key of the last row is sent in the
+`X-Next-Cursor` header when there are more rows.
+"""
+from typing import Any, List, Optional
+
+import sqlalchemy
+from fastapi import Response
+
+from app.config import app_config
+from app.db import database
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+async def fetch_page(
+    query: sqlalchemy.Select,
+    key: sqlalchemy.Column,
+    response: Response,
+    after: Optional[Any] = None,
+    limit: Optional[int] = None,
+) -> List[Any]:
+    """Fetch the page of the rows after the cursor
+
+    Parameters
+    ----------
+    query: sqlalchemy.Select
+        query of the rows, without order
+    key: sqlalchemy.Column
+        unique column the rows are ordered by
+    response: Response
+        response receiving the next cursor header
+    after: Optional[Any]
+        key of the last row of the previous page
+    limit: Optional[int]
+        size of the page, defaults to `PAGE_SIZE` config
+
+    Returns
+    -------
+    List[Any]
+        the rows of the page
+    """
+    limit = limit or app_config.PAGE_SIZE
+
+    if after is not None:
+        query = query.where(key > after)
+
+    # one more row tells whether there is a next page
+    rows = await database.fetch_all(query.order_by(key).limit(limit + 1))
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(rows[-1][key.name])
+
+    return rows
@@ -1,28 +1,110 @@
 """Routers for parcel management"""
 import logging
-from typing import List
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, List, Optional
 
-from fastapi import APIRouter, HTTPException
+import sqlalchemy
+from fastapi import (
+    APIRouter,
+    Body,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
 
+from app.config import app_config
 from app.db import Parcel, Train, database
+from app.models.fill_job import FillJobResponseModel
 from app.models.parcel import (
+    ParcelBulkResponseModel,
     ParcelFillResponseModel,
     ParcelInputModel,
+    ParcelManifestResponseModel,
     ParcelResponseModel,
 )
-from app.services.parcel_assignment import AssignmentService
+from app.routers.pagination import fetch_page
+from app.routers.read_cache import read_cache
+from app.routers.responses import (
+    fast_list_response,
+    fast_response,
+    use_fast_json,
+)
+from app.routers.streaming import accepts_ndjson, stream_ndjson
+from app.services.batches import UnitOverflow
+from app.services.executor import solver_executor
+from app.services.fill_jobs import FillQueueFull, fill_job_queue
+from app.services.manifest import (
+    ARROW_MEDIA_TYPES,
+    CSV_MEDIA_TYPES,
+    HAS_PYARROW,
+    ManifestError,
+    iter_arrow_rows,
+    iter_csv_rows,
+)
+from app.services.metrics import PhaseStats, metrics
+from app.services.occupancy import line_occupancy
+from app.services.parcel_assignment import (
+    AssignmentProblem,
+    run_assignment,
+    run_residual_assignment,
+)
+from app.services.sharding import (
+    ROUTING_POLICIES,
+    get_routing_policy,
+    partition,
+)
+from app.services.solution_cache import solution_cache, solution_fingerprint
+from app.services.strategies import STRATEGIES
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+ParcelInputList = TypeAdapter(List[ParcelInputModel])
+
 
 @router.get("/parcels", response_model=List[ParcelResponseModel])
-async def list_parcels():
+async def list_parcels(
+    request: Request,
+    response: Response,
+    after_id: Optional[int] = Query(
+        None, description="Id of the last parcel of the previous page"
+    ),
+    limit: Optional[int] = Query(
+        None, ge=1, le=app_config.MAX_PAGE_SIZE, description="Page size"
+    ),
+    unassigned: Optional[bool] = Query(
+        None, description="Only the parcels not filled into a train yet"
+    ),
+    train_id: Optional[int] = Query(
+        None, description="Only the parcels filled into this train"
+    ),
+):
     logger.info("Getting all parcels")
 
-    query = Parcel.select().order_by("id")
+    query = Parcel.select()
+    if unassigned is not None:
+        query = query.where(
+            Parcel.c.train_id == None
+            if unassigned
+            else Parcel.c.train_id != None
+        )
+    if train_id is not None:
+        query = query.where(Parcel.c.train_id == train_id)
+
+    if accepts_ndjson(request):
+        return stream_ndjson(
+            query, Parcel.c.id, ParcelResponseModel, after_id, limit
+        )
 
-    return await database.fetch_all(query)
+    parcels = await fetch_page(query, Parcel.c.id, response, after_id, limit)
+    if use_fast_json():
+        return fast_list_response(parcels, ParcelResponseModel, response)
+
+    return parcels
 
 
 @router.post("/parcels", response_model=ParcelResponseModel, status_code=201)
@@ -36,41 +118,693 @@ async def add_parcel(parcel: ParcelInputModel):
     return {**request_data, "id": new_id}
 
 
+@router.post(
+    "/parcels/bulk", response_model=ParcelBulkResponseModel, status_code=201
+)
+async def add_parcels(items: List[Any] = Body(...)):
+    logger.info("Adding %s parcels", len(items))
+
+    if len(items) > app_config.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {app_config.BULK_MAX_ITEMS} parcels at once",
+        )
+
+    # validate all the items in one pass, then set aside the invalid ones
+    errors = []
+    invalid = set()
+    try:
+        parcels = ParcelInputList.validate_python(items)
+    except ValidationError as e:
+        for error in e.errors(include_url=False):
+            index, *field = error["loc"]
+            invalid.add(index)
+            errors.append(
+                {
+                    "index": index,
+                    "field": ".".join(map(str, field)),
+                    "message": error["msg"],
+                }
+            )
+        parcels = [
+            ParcelInputModel.model_validate(item)
+            for i, item in enumerate(items)
+            if i not in invalid
+        ]
+
+    if not parcels and errors:
+        raise HTTPException(status_code=422, detail=errors)
+
+    async with database.transaction():
+        new_ids = await _insert_parcels([p.model_dump() for p in parcels])
+
+    inserted = iter(new_ids)
+    ids = [None if i in invalid else next(inserted) for i in range(len(items))]
+
+    return {"ids": ids, "errors": errors}
+
+
+async def _insert_parcels(rows: List[dict]) -> List[int]:
+    """Insert the parcels with multi-row INSERT statements
+
+    Returns
+    -------
+    List[int]
+        ids of the new parcels, in the order of the rows
+    """
+    new_ids = []
+    chunk = app_config.BULK_INSERT_CHUNK
+    for start in range(0, len(rows), chunk):
+        query = (
+            Parcel.insert()
+            .values(rows[start : start + chunk])
+            .returning(Parcel.c.id)
+        )
+        result = await database.fetch_all(query)
+        # the order of RETURNING is not guaranteed, but the ids of a
+        # multi-row insert increase in the order of the rows
+        new_ids.extend(sorted(row.id for row in result))
+
+    return new_ids
+
+
+@router.post(
+    "/parcels/manifest",
+    response_model=ParcelManifestResponseModel,
+    status_code=201,
+    summary="Upload a CSV or Arrow manifest of parcels",
+)
+async def upload_manifest(request: Request):
+    content_type = request.headers.get("content-type", "")
+    media_type = content_type.split(";")[0].strip().lower()
+    logger.info("Uploading a %s manifest", media_type)
+
+    if media_type in CSV_MEDIA_TYPES:
+        rows = iter_csv_rows(request.stream())
+    elif media_type in ARROW_MEDIA_TYPES:
+        if not HAS_PYARROW:
+            raise HTTPException(
+                status_code=415, detail="Arrow manifests need pyarrow"
+            )
+        rows = iter_arrow_rows(
+            request.stream(), spool_bytes=app_config.MANIFEST_SPOOL_BYTES
+        )
+    else:
+        raise HTTPException(
+            status_code=415, detail=f"Unsupported manifest: {media_type}"
+        )
+
+    start = time.perf_counter()
+    summary = {"rows": 0, "inserted": 0, "rejected": 0, "rejects": []}
+    chunk = []
+
+    async def flush():
+        # one transaction per chunk keeps the memory and the locks bounded
+        async with database.transaction():
+            summary["inserted"] += len(await _insert_parcels(chunk))
+        chunk.clear()
+
+    try:
+        async for row in rows:
+            summary["rows"] += 1
+            if row.values is None:
+                summary["rejected"] += 1
+                if len(summary["rejects"]) < app_config.MANIFEST_MAX_REJECTS:
+                    summary["rejects"].append(
+                        {"line": row.line, "message": row.error}
+                    )
+                continue
+
+            chunk.append(row.values)
+            if len(chunk) >= app_config.MANIFEST_CHUNK_ROWS:
+                await flush()
+    except ManifestError as e:
+        # the chunks flushed before the error stay committed
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": str(e),
+                "rows": summary["rows"],
+                "inserted": summary["inserted"],
+            },
+        )
+
+    if chunk:
+        await flush()
+
+    elapsed = time.perf_counter() - start
+    summary.update(
+        elapsed_ms=elapsed * 1000,
+        rows_per_second=summary["rows"] / elapsed if elapsed else 0,
+    )
+
+    return summary
+
+
+def _unassigned_parcel_query():
+    """Parcels not filled into a train yet, read from their partial index"""
+    return (
+        sqlalchemy.select(Parcel.c.id, Parcel.c.weight, Parcel.c.volume)
+        .where(Parcel.c.train_id == None)
+        .order_by(Parcel.c.id)
+    )
+
+
+def _available_train_query():
+    """Trains neither filled nor booked yet"""
+    return (
+        Train.select()
+        .where(
+            Train.c.ready_to_book == False,
+            Train.c.booked_at == None,
+        )
+        .order_by(Train.c.id)
+    )
+
+
+def _residual_train_query():
+    """Trains filled but not booked yet, with the weight and volume left"""
+    used_weight = sqlalchemy.func.coalesce(
+        sqlalchemy.func.sum(Parcel.c.weight), 0
+    )
+    used_volume = sqlalchemy.func.coalesce(
+        sqlalchemy.func.sum(Parcel.c.volume), 0
+    )
+
+    weight_left = Train.c.weight - used_weight
+    volume_left = Train.c.volume - used_volume
+
+    return (
+        sqlalchemy.select(
+            Train.c.id,
+            Train.c.cost,
+            Train.c.version,
+            # the scalar max() of two arguments is SQLite only
+            sqlalchemy.case((weight_left > 0, weight_left), else_=0).label(
+                "weight"
+            ),
+            sqlalchemy.case((volume_left > 0, volume_left), else_=0).label(
+                "volume"
+            ),
+        )
+        .select_from(Train.outerjoin(Parcel, Parcel.c.train_id == Train.c.id))
+        .where(
+            Train.c.ready_to_book == True,
+            Train.c.booked_at == None,
+        )
+        .group_by(Train.c.id)
+        .order_by(Train.c.id)
+    )
+
+
 @router.post(
     "/parcels/fill",
     response_model=ParcelFillResponseModel,
+    responses={202: {"model": FillJobResponseModel}},
     summary="Fill parcels to trains (Used by Post Master)",
 )
-async def fill_parcels():
-    logger.info("Adding a new parcel")
+async def fill_parcels(
+    strategy: Optional[str] = Query(
+        None,
+        description="Assignment strategy: exact, greedy or fptas",
+    ),
+    epsilon: Optional[float] = Query(
+        None,
+        gt=0,
+        lt=1,
+        description="Accepted relative loss of the fptas strategy",
+    ),
+    deadline_ms: Optional[float] = Query(
+        None,
+        gt=0,
+        description="Return the best assignment found within this budget",
+    ),
+    incremental: Optional[bool] = Query(
+        None,
+        description="Fill the capacity left in the filled but unbooked "
+        "trains before selecting new trains",
+    ),
+    preview: bool = Query(
+        False,
+        description="Return the assignment without saving it",
+    ),
+    debug: bool = Query(
+        False,
+        description="Return the timings and counters of the fill",
+    ),
+    background: bool = Query(
+        False,
+        description="Queue the fill and return 202 with the job to poll "
+        "at /fill-jobs/{id}",
+    ),
+    sharded: Optional[bool] = Query(
+        None,
+        description="Solve one assignment per train line, in parallel",
+    ),
+    shard_policy: Optional[str] = Query(
+        None,
+        description="How the parcels are routed to the lines of a sharded "
+        "fill: capacity or hash",
+    ),
+):
+    logger.info("Filling the parcels")
+
+    strategy = strategy or app_config.FILL_STRATEGY
+    if strategy not in STRATEGIES:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown strategy: {strategy}"
+        )
+    if shard_policy is not None and shard_policy not in ROUTING_POLICIES:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown shard policy: {shard_policy}"
+        )
+
+    params = dict(
+        strategy=strategy,
+        epsilon=epsilon,
+        deadline_ms=deadline_ms,
+        incremental=incremental,
+        preview=preview,
+        debug=debug,
+        sharded=sharded,
+        shard_policy=shard_policy,
+    )
+    if background:
+        try:
+            job = await fill_job_queue.enqueue(params)
+        except FillQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e)) from e
+
+        return JSONResponse(
+            FillJobResponseModel.model_validate(job).model_dump(mode="json"),
+            status_code=202,
+            headers={"Location": f"/fill-jobs/{job.id}"},
+        )
+
+    result = await run_fill(**params)
+    if use_fast_json():
+        return fast_response(ParcelFillResponseModel(**result))
 
-    parcel_query = (
-        Parcel.select().where(Parcel.c.train_id == None).order_by("id")
+    return result
+
+
+async def _no_progress(phase: str) -> None:
+    pass
+
+
+async def run_fill(
+    strategy: str,
+    epsilon: Optional[float] = None,
+    deadline_ms: Optional[float] = None,
+    incremental: Optional[bool] = None,
+    preview: bool = False,
+    debug: bool = False,
+    sharded: Optional[bool] = None,
+    shard_policy: Optional[str] = None,
+    progress: Callable[[str], Awaitable[None]] = _no_progress,
+) -> dict:
+    """Assign the unassigned parcels to the trains and save the assignment
+
+    Run by `POST /parcels/fill` and by the background fill jobs, see
+    the parameters of the route.
+
+    Parameters
+    ----------
+    progress: Callable[[str], Awaitable[None]]
+        called when a phase of the fill starts: fetch, solve or update
+
+    Returns
+    -------
+    dict
+        the response of the fill
+
+    Raises
+    ------
+    HTTPException
+        409 when other writers kept changing the parcels or the trains
+    """
+    stats = PhaseStats()
+
+    if sharded is None:
+        sharded = app_config.FILL_SHARDED
+    # the routing policy of the sharded fill, None for one global fill
+    shard_policy = (
+        (shard_policy or app_config.FILL_SHARD_POLICY) if sharded else None
+    )
+
+    for attempt in range(app_config.FILL_CONFLICT_RETRIES + 1):
+        try:
+            result = await _fill(
+                strategy,
+                epsilon,
+                deadline_ms,
+                incremental,
+                preview,
+                shard_policy,
+                progress,
+                stats,
+            )
+        except FillConflict as e:
+            logger.warning("Fill conflict on attempt %d: %s", attempt + 1, e)
+            stats.count("conflicts")
+            continue
+        except UnitOverflow as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        return _with_stats(result, stats, debug)
+
+    metrics.record_fill(stats)
+    raise HTTPException(
+        status_code=409,
+        detail="The parcels or the trains were changed by another fill "
+        "or booking, retry the fill",
+    )
+
+
+class FillConflict(Exception):
+    """The parcels or the trains of a fill were written since it read them"""
+
+
+async def _fill(
+    strategy: str,
+    epsilon: Optional[float],
+    deadline_ms: Optional[float],
+    incremental: Optional[bool],
+    preview: bool,
+    shard_policy: Optional[str],
+    progress: Callable[[str], Awaitable[None]],
+    stats: PhaseStats,
+) -> dict:
+    """Read, solve and save the fill once, see `run_fill`
+
+    The writes only apply to the parcels still unassigned and to the
+    trains still at the version read, otherwise the transaction is rolled
+    back with a `FillConflict`.
+    """
+    await progress("fetch")
+    with stats.timer("fetch"):
+        parcels = await database.fetch_all(_unassigned_parcel_query())
+
+    options = dict(
+        backend=app_config.KNAPSACK_BACKEND,
+        compact=app_config.KNAPSACK_COMPACT,
+        weight_precision=app_config.WEIGHT_PRECISION,
+        volume_precision=app_config.VOLUME_PRECISION,
+        max_units=app_config.SCALE_MAX_UNITS,
+        max_selection_states=app_config.TRAIN_SELECTION_MAX_STATES,
+        strategy=strategy,
+        epsilon=epsilon or app_config.FPTAS_EPSILON,
     )
-    parcels = await database.fetch_all(parcel_query)
 
-    train_query = Train.select().where(
-        Train.c.ready_to_book == False,
-        Train.c.booked_at == None,
+    if incremental is None:
+        incremental = app_config.FILL_INCREMENTAL
+
+    with stats.timer("fetch"):
+        residual_trains = []
+        if incremental and parcels:
+            residual_trains = await database.fetch_all(_residual_train_query())
+        trains = await database.fetch_all(_available_train_query())
+        if app_config.FILL_SKIP_BUSY_LINES and trains:
+            trains = await _skip_busy_lines(trains, stats)
+    stats.count("parcels", len(parcels))
+    stats.count("trains", len(trains) + len(residual_trains))
+
+    # the same input gives the same assignment, solve it only once
+    key = solution_fingerprint(
+        [*residual_trains, *trains],
+        parcels,
+        dict(
+            options,
+            deadline_ms=deadline_ms,
+            residual_train_ids=tuple(t.id for t in residual_trains),
+            # the shards depend on the lines of the trains
+            shard_policy=shard_policy,
+            train_lines=(
+                tuple((t.id, t.line_id) for t in trains)
+                if shard_policy
+                else None
+            ),
+        ),
     )
-    trains = await database.fetch_all(train_query)
+    solution = solution_cache.get(key)
+    if solution is None:
+        await progress("solve")
+        with stats.timer("solve"):
+            solution, solver_stats = await _solve_fill(
+                residual_trains,
+                trains,
+                parcels,
+                options,
+                deadline_ms,
+                shard_policy,
+            )
+        stats.merge(solver_stats)
+        # a later fill with the same deadline may find a better assignment
+        if solution[3].get("optimal") is not False:
+            solution_cache.put(key, solution)
+    else:
+        stats.count("solution_cache_hits")
+
+    assigned_info, new_assigned_info, cost, report = solution
+    assigned_items = sum(len(ids) for ids in assigned_info.values())
+
+    result = {"assigned_items": assigned_items, "total_cost": cost, **report}
+    if preview:
+        return result
+
+    await progress("update")
+
+    # the incremental fill keeps the unused trains available, otherwise
+    # all the trains considered are marked as filled
+    if incremental:
+        filled_train_ids = list(new_assigned_info)
+    else:
+        filled_train_ids = [t.id for t in trains]
+
+    # the trains written: the filled ones and the residual ones receiving
+    # parcels, at the version read
+    written = {*assigned_info, *filled_train_ids}
+    versions = {
+        t.id: t.version for t in (*residual_trains, *trains) if t.id in written
+    }
+
+    # all or nothing: a failure or a conflict leaves no half-applied fill
+    with stats.timer("update"):
+        async with database.transaction():
+            await _assign_parcels_to_trains(assigned_info)
+            await _write_trains(versions, filled_train_ids)
+            await read_cache.invalidate("trains")
+    stats.count("rows_updated", assigned_items + len(versions))
+
+    return result
+
+
+async def _skip_busy_lines(trains: List[Any], stats: PhaseStats) -> List[Any]:
+    """The trains whose line is not occupied at the time of the fill"""
+    now = datetime.utcnow()
+    busy_lines = await line_occupancy.busy_lines(
+        now, now + timedelta(microseconds=1)
+    )
+    if not busy_lines:
+        return trains
+
+    available = [t for t in trains if t.line_id not in busy_lines]
+    stats.count("busy_line_trains", len(trains) - len(available))
+    return available
+
 
-    assigned_info, cost = AssignmentService(trains, parcels).process()
-    assigned_items = 0
+async def _assign_parcels_to_trains(assigned_info: dict) -> None:
+    """Set the train of the assigned parcels with CASE-based UPDATEs
 
-    for train_id, parcel_ids in assigned_info.items():
-        q = (
+    The parcels of all the trains are updated by one statement per
+    `FILL_UPDATE_CHUNK` parcels, instead of one statement per train. Only
+    the parcels still unassigned are updated.
+
+    Raises
+    ------
+    FillConflict
+        when another fill assigned some of the parcels first
+    """
+    train_by_parcel = [
+        (parcel_id, train_id)
+        for train_id, parcel_ids in assigned_info.items()
+        for parcel_id in parcel_ids
+    ]
+
+    chunk = app_config.FILL_UPDATE_CHUNK
+    for start in range(0, len(train_by_parcel), chunk):
+        mapping = dict(train_by_parcel[start : start + chunk])
+        updated = await database.fetch_all(
             Parcel.update()
-            .where(Parcel.c.id.in_(parcel_ids))
-            .values(train_id=train_id)
+            .where(Parcel.c.id.in_(list(mapping)), Parcel.c.train_id == None)
+            .values(
+                train_id=sqlalchemy.case(mapping, value=Parcel.c.id),
+                version=Parcel.c.version + 1,
+            )
+            .returning(Parcel.c.id)
         )
-        await database.execute(q)
-        assigned_items += len(parcel_ids)
+        if len(updated) != len(mapping):
+            raise FillConflict(
+                f"{len(mapping) - len(updated)} parcels were assigned "
+                "by another fill"
+            )
+
+
+async def _write_trains(versions: dict, filled_train_ids: List[int]) -> None:
+    """Bump the version of the trains written and mark the filled ones
+
+    Raises
+    ------
+    FillConflict
+        when some of the trains were filled or booked since they were read
+    """
+    if not versions:
+        return
 
-    await database.execute(
+    updated = await database.fetch_all(
         Train.update()
-        .where(Train.c.id.in_([t.id for t in trains]))
-        .values(ready_to_book=True)
+        .where(
+            Train.c.id.in_(list(versions)),
+            Train.c.version == sqlalchemy.case(versions, value=Train.c.id),
+            Train.c.booked_at == None,
+        )
+        .values(
+            version=Train.c.version + 1,
+            ready_to_book=sqlalchemy.case(
+                (Train.c.id.in_(filled_train_ids), True),
+                else_=Train.c.ready_to_book,
+            ),
+        )
+        .returning(Train.c.id)
     )
+    if len(updated) != len(versions):
+        raise FillConflict(
+            f"{len(versions) - len(updated)} trains were filled or booked "
+            "by another writer"
+        )
+
+
+def _with_stats(result: dict, stats: PhaseStats, debug: bool) -> dict:
+    """Record the stats of the fill, and add them to the result in debug"""
+    metrics.record_fill(stats)
+    if debug:
+        result["debug"] = {
+            "timings_ms": stats.timings,
+            "counters": stats.counters,
+        }
+
+    return result
+
+
+async def _solve_fill(
+    residual_trains, trains, parcels, options, deadline_ms, shard_policy=None
+):
+    """Assign the parcels to the residual trains first, then to the trains
+
+    With a shard policy, the assignment to the trains is sharded by line,
+    see `_solve_shards`.
+
+    Returns
+    -------
+    Tuple[tuple, PhaseStats]
+        the solution: the parcel ids assigned to every train, the parcel
+        ids assigned to the new trains, the cost of the new trains and the
+        report of the deadline; and the stats of the solvers
+    """
+    stats = PhaseStats()
+    assigned_info = {}
+    if residual_trains:
+        # the new parcels go into the trains already filled first
+        assigned_info, residual_stats = await solver_executor.run(
+            run_residual_assignment,
+            AssignmentProblem.from_rows(residual_trains, parcels, **options),
+        )
+        stats.merge(residual_stats)
+
+        filled_ids = {i for ids in assigned_info.values() for i in ids}
+        parcels = [p for p in parcels if p.id not in filled_ids]
+
+    if shard_policy is not None:
+        new_assigned_info, cost, report = await _solve_shards(
+            trains, parcels, options, deadline_ms, shard_policy, stats
+        )
+        assigned_info.update(new_assigned_info)
+        return (assigned_info, new_assigned_info, cost, report), stats
+
+    # build and solve outside of the event loop
+    new_assigned_info, cost, solver_stats, report = await solver_executor.run(
+        run_assignment,
+        AssignmentProblem.from_rows(
+            trains, parcels, deadline_ms=deadline_ms, **options
+        ),
+    )
+    assigned_info.update(new_assigned_info)
+    stats.merge(solver_stats)
+
+    return (assigned_info, new_assigned_info, cost, report), stats
+
+
+async def _solve_shards(
+    trains, parcels, options, deadline_ms, shard_policy, stats
+):
+    """Assign the parcels to the trains with one assignment per line
+
+    The shards are solved in parallel on the solver pool, then the parcels
+    their shard could not take are assigned to the trains left unused by
+    all the shards.
+
+    Returns
+    -------
+    Tuple[dict, float, dict]
+        the parcel ids assigned to every train, the cost of the trains and
+        the report of the deadline. The bounds are per shard, so only the
+        optimality of a single shard is reported
+    """
+    shards = partition(trains, parcels, get_routing_policy(shard_policy))
+    shards = [shard for shard in shards if shard.parcels]
+    stats.count("shards", len(shards))
+
+    problems = [
+        AssignmentProblem.from_rows(
+            shard.trains, shard.parcels, deadline_ms=deadline_ms, **options
+        )
+        for shard in shards
+    ]
+    results = await solver_executor.map(run_assignment, problems)
+
+    reports = []
+    assigned_info = {}
+    for shard_assigned_info, _, shard_stats, shard_report in results:
+        assigned_info.update(shard_assigned_info)
+        stats.merge(shard_stats)
+        reports.append(shard_report)
+
+    assigned_ids = {i for ids in assigned_info.values() for i in ids}
+    overflow = [p for p in parcels if p.id not in assigned_ids]
+    spare_trains = [t for t in trains if t.id not in assigned_info]
+    if overflow and spare_trains:
+        stats.count("overflow_parcels", len(overflow))
+        (
+            overflow_assigned_info,
+            _,
+            overflow_stats,
+            overflow_report,
+        ) = await solver_executor.run(
+            run_assignment,
+            AssignmentProblem.from_rows(
+                spare_trains, overflow, deadline_ms=deadline_ms, **options
+            ),
+        )
+        assigned_info.update(overflow_assigned_info)
+        stats.merge(overflow_stats)
+        reports.append(overflow_report)
+
+    cost = sum(t.cost for t in trains if t.id in assigned_info)
+
+    report = {}
+    if deadline_ms is not None and len(reports) == 1:
+        report = reports[0]
+    elif deadline_ms is not None:
+        report = dict(optimal=False)
 
-    return {"assigned_items": assigned_items, "total_cost": cost}
+    return assigned_info, cost, report
@@ -0,0 +1,194 @@
+"""Read cache of the train and train line endpoints
+
+The dashboards poll `GET /trains` and `GET /trainlines`, but the data only
+changes when a train or a line is added, or when trains are filled or
+booked. The serialized responses are cached in process and every write
+path bumps the version of what it changed in the `data_versions` row,
+in its transaction. Every request reads that row by primary key, so the
+writes of all the workers drop the cached responses of the older
+versions. A TTL bounds how long a response is kept, and the cache is
+bounded by entries and bytes.
+
+The responses carry an ETag, a poll sending it back in `If-None-Match`
+gets an empty 304 when nothing changed.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Mapping, NamedTuple
+
+import sqlalchemy
+from fastapi import Request, Response
+
+from app.config import app_config
+from app.db import DataVersion, database
+from app.routers.responses import use_fast_json
+
+
+class CachedResponse(NamedTuple):
+    version: int
+    expires_at: float
+    body: bytes
+    etag: str
+    headers: Mapping[str, str]
+
+
+def _etag(body: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    tags = request.headers.get("if-none-match", "")
+    return etag in (tag.strip() for tag in tags.split(",")) or tags == "*"
+
+
+class ReadCache:
+    """Serialized responses, invalidated by namespace versions
+
+    Parameters
+    ----------
+    max_entries: int
+        the most responses kept, 0 disables the cache
+    max_bytes: int
+        the most bytes of response bodies kept
+    ttl_seconds: float
+        the longest a response is served from the cache
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl_seconds: float = 30,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def invalidate(self, namespace: str) -> None:
+        """Bump the version of the namespace, in the transaction of a write
+
+        Drops the cached responses of the namespace in every worker.
+        """
+        if self.max_entries <= 0:
+            return
+
+        await database.execute(
+            DataVersion.update()
+            .where(DataVersion.c.id == 1)
+            .values({namespace: DataVersion.c[namespace] + 1})
+        )
+
+    async def data_version(self, namespace: str) -> int:
+        """The version of the namespace in the database"""
+        return await database.fetch_val(
+            sqlalchemy.select(DataVersion.c[namespace]).where(
+                DataVersion.c.id == 1
+            )
+        )
+
+    def stats(self) -> Mapping[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _pop(self, key: str) -> None:
+        self.size -= len(self._entries.pop(key).body)
+
+    def _put(self, key: str, entry: CachedResponse) -> None:
+        if key in self._entries:
+            self._pop(key)
+        if len(entry.body) > self.max_bytes:
+            return
+
+        self._entries[key] = entry
+        self.size += len(entry.body)
+        while (
+            len(self._entries) > self.max_entries or self.size > self.max_bytes
+        ):
+            self._pop(next(iter(self._entries)))
+
+    async def respond(
+        self,
+        request: Request,
+        namespace: str,
+        fetch: Callable[[], Awaitable[Any]],
+        encode: Callable[[Any], Response],
+    ) -> Any:
+        """The cached response of the request, or the one fetched now
+
+        Parameters
+        ----------
+        request: Request
+            the request, its path and query are the key of the cache
+        namespace: str
+            data the response depends on, e.g. "trains"
+        fetch: Callable[[], Awaitable[Any]]
+            reads the content of the response when it is not cached
+        encode: Callable[[Any], Response]
+            serializes the content into a JSON response
+
+        Returns
+        -------
+        Any
+            the response with its ETag, or 304 when the ETag matches. The
+            content as it is when the cache is disabled
+        """
+        if self.max_entries <= 0:
+            content = await fetch()
+            return encode(content) if use_fast_json() else content
+
+        key = f"{namespace}:{request.url.path}?{request.url.query}"
+        # taken before building, a write during the build makes it stale
+        version = await self.data_version(namespace)
+
+        entry = self._entries.get(key)
+        if (
+            entry is not None
+            and entry.version == version
+            and entry.expires_at > time.monotonic()
+        ):
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            if entry is not None:
+                self._pop(key)
+            self.misses += 1
+
+            response = encode(await fetch())
+            headers = {
+                k: v
+                for k, v in response.headers.items()
+                if k not in ("content-length", "content-type")
+            }
+            entry = CachedResponse(
+                version=version,
+                expires_at=time.monotonic() + self.ttl_seconds,
+                body=response.body,
+                etag=_etag(response.body),
+                headers=headers,
+            )
+            self._put(key, entry)
+
+        headers = {**entry.headers, "ETag": entry.etag}
+        if _not_modified(request, entry.etag):
+            return Response(status_code=304, headers=headers)
+
+        return Response(
+            entry.body, media_type="application/json", headers=headers
+        )
+
+
+read_cache = ReadCache(
+    max_entries=app_config.READ_CACHE_MAX_ENTRIES,
+    max_bytes=app_config.READ_CACHE_MAX_BYTES,
+    ttl_seconds=app_config.READ_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,122 @@
+"""Fast JSON responses
+
+With the `FAST_JSON` config, the list endpoints skip the validation of
+the response model: their rows come straight from our own tables, so they
+are only restricted to the fields of the model, the integer columns of the
+float fields converted, and encoded with orjson. The routes keep their
+`response_model`, so the OpenAPI schema is the same.
+
+Without orjson, the rows are validated and encoded in one pass by a
+`TypeAdapter` of the list model, built once per model.
+"""
+import logging
+from functools import lru_cache
+from typing import Any, List, Mapping, Optional, Sequence, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from app.config import app_config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+logger = logging.getLogger(__name__)
+
+if app_config.FAST_JSON and not HAS_ORJSON:  # pragma: no cover
+    logger.warning(
+        "FAST_JSON is set but orjson is not installed, the responses are "
+        "encoded by pydantic"
+    )
+
+
+def use_fast_json() -> bool:
+    return app_config.FAST_JSON
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter of a list of the model, built once"""
+    return TypeAdapter(List[model])
+
+
+@lru_cache(maxsize=None)
+def _float_fields(model: Type[BaseModel]) -> frozenset:
+    return frozenset(
+        name
+        for name, field in model.model_fields.items()
+        if field.annotation in (float, Optional[float])
+    )
+
+
+def _row_content(row: Any, fields: List[str], floats: frozenset) -> dict:
+    content = {name: row[name] for name in fields}
+    for name in floats:
+        if content[name] is not None:
+            content[name] = float(content[name])
+
+    return content
+
+
+def _headers(response: Optional[Response]) -> Mapping[str, str]:
+    # the headers set on the injected response, e.g. the next cursor
+    if response is None:
+        return {}
+
+    return {
+        key: value
+        for key, value in response.headers.items()
+        if key != "content-length"
+    }
+
+
+def fast_list_response(
+    rows: Sequence[Any],
+    model: Type[BaseModel],
+    response: Optional[Response] = None,
+) -> Response:
+    """Encode rows of our own tables as a JSON list of the model
+
+    Parameters
+    ----------
+    rows: Sequence[Any]
+        the rows fetched from the database
+    model: Type[BaseModel]
+        response model of a row
+    response: Optional[Response]
+        the response injected in the route, its headers are kept
+
+    Returns
+    -------
+    Response
+        the JSON response
+    """
+    if HAS_ORJSON:
+        fields = list(model.model_fields)
+        floats = _float_fields(model)
+        content = orjson.dumps(
+            [_row_content(row, fields, floats) for row in rows]
+        )
+    else:
+        adapter = list_adapter(model)
+        content = adapter.dump_json(adapter.validate_python(rows))
+
+    return Response(
+        content, media_type="application/json", headers=_headers(response)
+    )
+
+
+def fast_response(content: BaseModel, status_code: int = 200) -> Response:
+    """Encode a validated model as JSON"""
+    if HAS_ORJSON:
+        body = orjson.dumps(content.model_dump())
+    else:
+        body = content.model_dump_json()
+
+    return Response(
+        body, status_code=status_code, media_type="application/json"
+    )
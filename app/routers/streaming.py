@@ -0,0 +1,76 @@
+"""NDJSON streaming of the list endpoints
+
+With `Accept: application/x-ndjson`, the list endpoints iterate their
+query with a cursor and stream one JSON row per line, instead of loading
+and validating all the rows at once. The memory used does not depend on
+the size of the table and the first rows are sent right away.
+"""
+from typing import Any, AsyncIterator, Optional, Type
+
+import sqlalchemy
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.db import database
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# rows serialized into one chunk of the response
+CHUNK_ROWS = 100
+
+
+def accepts_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _iterate_lines(
+    query: sqlalchemy.Select, model: Type[BaseModel]
+) -> AsyncIterator[str]:
+    lines = []
+    async for row in database.iterate(query):
+        lines.append(model.model_validate(row).model_dump_json())
+        if len(lines) >= CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def stream_ndjson(
+    query: sqlalchemy.Select,
+    key: sqlalchemy.Column,
+    model: Type[BaseModel],
+    after: Optional[Any] = None,
+    limit: Optional[int] = None,
+) -> StreamingResponse:
+    """Stream the rows of the query as NDJSON
+
+    Parameters
+    ----------
+    query: sqlalchemy.Select
+        query of the rows, without order
+    key: sqlalchemy.Column
+        unique column the rows are ordered by
+    model: Type[BaseModel]
+        response model of a row
+    after: Optional[Any]
+        only the rows after this key
+    limit: Optional[int]
+        the most rows streamed, all of them by default
+
+    Returns
+    -------
+    StreamingResponse
+        the rows, one JSON object per line
+    """
+    if after is not None:
+        query = query.where(key > after)
+    query = query.order_by(key)
+    if limit is not None:
+        query = query.limit(limit)
+
+    return StreamingResponse(
+        _iterate_lines(query, model), media_type=NDJSON_MEDIA_TYPE
+    )
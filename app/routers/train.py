@@ -1,37 +1,72 @@
 """Routers for train management"""
 import logging
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
-from app.db import Train, database
+from app.config import app_config
+from app.db import Train, TrainLine, database
 from app.models.train import TrainInputModel, TrainResponseModel
+from app.routers.pagination import fetch_page
+from app.routers.read_cache import read_cache
+from app.routers.responses import fast_list_response, fast_response
+from app.routers.streaming import accepts_ndjson, stream_ndjson
+from app.services.occupancy import line_occupancy
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
 @router.get("/trains", response_model=List[TrainResponseModel])
-async def list_trains():
+async def list_trains(
+    request: Request,
+    response: Response,
+    after_name: Optional[str] = Query(
+        None, description="Name of the last train of the previous page"
+    ),
+    limit: Optional[int] = Query(
+        None, ge=1, le=app_config.MAX_PAGE_SIZE, description="Page size"
+    ),
+):
     logger.info("Getting all trains")
 
-    query = Train.select().where(Train.c.booked_at == None).order_by("name")
+    query = Train.select().where(Train.c.booked_at == None)
 
-    return await database.fetch_all(query)
+    if accepts_ndjson(request):
+        return stream_ndjson(
+            query, Train.c.name, TrainResponseModel, after_name, limit
+        )
+
+    return await read_cache.respond(
+        request,
+        "trains",
+        lambda: fetch_page(query, Train.c.name, response, after_name, limit),
+        lambda trains: fast_list_response(
+            trains, TrainResponseModel, response
+        ),
+    )
 
 
 @router.get("/trains/{train_id}", response_model=TrainResponseModel)
-async def get_train(train_id: int):
+async def get_train(request: Request, train_id: int):
     logger.info("Getting train information by id")
 
-    query = Train.select().where(Train.c.id == train_id)
-    train = await database.fetch_one(query)
+    async def fetch_train():
+        query = Train.select().where(Train.c.id == train_id)
+        train = await database.fetch_one(query)
 
-    if not train:
-        raise HTTPException(status_code=404, detail="Train not found")
+        if not train:
+            raise HTTPException(status_code=404, detail="Train not found")
 
-    return train
+        return train
+
+    return await read_cache.respond(
+        request,
+        "trains",
+        fetch_train,
+        lambda train: fast_response(TrainResponseModel.model_validate(train)),
+    )
 
 
 @router.post("/trains", response_model=TrainResponseModel, status_code=201)
@@ -39,8 +74,15 @@ async def add_train(train: TrainInputModel):
     logger.info("Adding a new train")
 
     request_data = train.model_dump()
+    if train.line_id is not None and not await database.fetch_val(
+        TrainLine.select().where(TrainLine.c.id == train.line_id)
+    ):
+        raise HTTPException(status_code=400, detail="Train line not found")
+
     query = Train.insert().values(request_data)
-    new_id = await database.execute(query)
+    async with database.transaction():
+        new_id = await database.execute(query)
+        await read_cache.invalidate("trains")
 
     return {**request_data, "id": new_id}
 
@@ -52,21 +94,53 @@ async def add_train(train: TrainInputModel):
 )
 async def book_train():
     logger.info("Book trains that are ready")
-    query = Train.select().where(
-        Train.c.ready_to_book == True,
-        Train.c.booked_at == None,
-    )
-    ready_to_book_trains = await database.fetch_all(query)
-    train_ids = [t.id for t in ready_to_book_trains]
-
+    booked_at = datetime.utcnow()
+    # one conditional UPDATE: a train filled or booked by another worker
+    # meanwhile is booked once, and a fill in progress is not visible
+    # before its transaction commits
     query = (
         Train.update()
-        .where(Train.c.id.in_(train_ids))
+        .where(
+            Train.c.ready_to_book == True,
+            Train.c.booked_at == None,
+        )
         .values(
-            booked_at=datetime.utcnow(),
+            booked_at=booked_at,
+            version=Train.c.version + 1,
         )
+        .returning(*Train.c)
     )
-    await database.execute(query)
-    return await database.fetch_all(
-        Train.select().where(Train.c.id.in_(train_ids))
-    )
+    # the trains and the occupancy of their lines are saved together
+    async with database.transaction():
+        booked_trains = await database.fetch_all(query)
+
+        # the lines of the booked trains are occupied from now on
+        line_ids = {t.line_id for t in booked_trains if t.line_id is not None}
+        if line_ids:
+            end_at = booked_at + timedelta(
+                minutes=app_config.LINE_OCCUPANCY_MINUTES
+            )
+            await line_occupancy.occupy(
+                [
+                    dict(
+                        line_id=t.line_id,
+                        train_id=t.id,
+                        start_at=booked_at,
+                        end_at=end_at,
+                    )
+                    for t in booked_trains
+                    if t.line_id is not None
+                ]
+            )
+            await database.execute(
+                TrainLine.update()
+                .where(TrainLine.c.id.in_(line_ids))
+                .values(occupied_at=booked_at)
+            )
+            await read_cache.invalidate("trainlines")
+        await read_cache.invalidate("trains")
+
+    if line_ids:
+        await line_occupancy.refresh()
+
+    return sorted(booked_trains, key=lambda t: t.id)
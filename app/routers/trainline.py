@@ -1,23 +1,72 @@
 """Router for trainline management"""
 import logging
+from datetime import datetime, timezone
 from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Request
 
 from app.db import TrainLine, database
 from app.models.trainline import TrainlineInputModel, TrainlineResponseModel
+from app.routers.read_cache import read_cache
+from app.routers.responses import fast_list_response
+from app.routers.streaming import accepts_ndjson, stream_ndjson
+from app.services.occupancy import line_occupancy
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
 @router.get("/trainlines", response_model=List[TrainlineResponseModel])
-async def list_trainlines():
+async def list_trainlines(request: Request):
     logger.info("Getting all availabel train lines")
 
+    if accepts_ndjson(request):
+        return stream_ndjson(
+            TrainLine.select(), TrainLine.c.name, TrainlineResponseModel
+        )
+
     query = TrainLine.select().order_by("name")
 
-    return await database.fetch_all(query)
+    return await read_cache.respond(
+        request,
+        "trainlines",
+        lambda: database.fetch_all(query),
+        lambda trainlines: fast_list_response(
+            trainlines, TrainlineResponseModel
+        ),
+    )
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get(
+    "/trainlines/available", response_model=List[TrainlineResponseModel]
+)
+async def list_available_trainlines(
+    from_: datetime = Query(
+        ..., alias="from", description="Start of the period"
+    ),
+    to: datetime = Query(..., description="End of the period, excluded"),
+):
+    logger.info("Getting the train lines available over a period")
+
+    # the bookings are stored in naive UTC
+    from_, to = _naive_utc(from_), _naive_utc(to)
+    if not from_ < to:
+        raise HTTPException(
+            status_code=400, detail="The period ends before it starts"
+        )
+
+    busy_lines = await line_occupancy.busy_lines(from_, to)
+    trainlines = await database.fetch_all(
+        TrainLine.select().order_by(TrainLine.c.name)
+    )
+
+    return [line for line in trainlines if line.id not in busy_lines]
 
 
 @router.post(
@@ -29,6 +78,8 @@ async def add_trainline(trainline: TrainlineInputModel):
     request_data = trainline.model_dump()
     request_data.update(occupied_at=None)
     query = TrainLine.insert().values(request_data)
-    new_id = await database.execute(query)
+    async with database.transaction():
+        new_id = await database.execute(query)
+        await read_cache.invalidate("trainlines")
 
     return {**request_data, "id": new_id}
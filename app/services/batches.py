@@ -0,0 +1,189 @@
+"""Columnar parcels and trains
+
+The solvers read the parcels and trains column by column. `ParcelBatch` and
+`TrainFleet` store the ids, weights, volumes and costs in typed arrays that
+are loaded once, and the parcels already filled into a train are tracked
+with a mask instead of rebuilding the list of the remaining parcels.
+"""
+import collections.abc
+from array import array
+from typing import Any, Iterable, Iterator, List, NamedTuple, Sequence
+
+
+class UnitOverflow(ValueError):
+    """A scaled weight or volume does not fit the 64-bit integer columns"""
+
+
+def _int_column(name: str, values: Iterable[int]) -> array:
+    try:
+        return array("q", values)
+    except OverflowError:
+        raise UnitOverflow(
+            f"The {name} do not fit 64-bit integer units, set a coarser "
+            "precision"
+        ) from None
+
+
+class TrainItem(NamedTuple):
+    id: int
+    weight: int
+    volume: int
+    cost: float
+
+
+class ParcelItem(NamedTuple):
+    id: int
+    weight: int
+    volume: int
+
+
+class TrainFleet:
+    """Trains stored as columns"""
+
+    __slots__ = ("ids", "weights", "volumes", "costs")
+
+    def __init__(
+        self,
+        ids: Iterable[int] = (),
+        weights: Iterable[int] = (),
+        volumes: Iterable[int] = (),
+        costs: Iterable[float] = (),
+    ) -> None:
+        self.ids = array("q", ids)
+        self.weights = _int_column("train weights", weights)
+        self.volumes = _int_column("train volumes", volumes)
+        self.costs = array("d", costs)
+
+    @classmethod
+    def from_items(cls, trains: Iterable[object]) -> "TrainFleet":
+        fleet = cls()
+        for train in trains:
+            fleet.ids.append(train.id)
+            fleet.weights.append(train.weight)
+            fleet.volumes.append(train.volume)
+            fleet.costs.append(train.cost)
+        return fleet
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i: int) -> TrainItem:
+        return TrainItem(
+            self.ids[i], self.weights[i], self.volumes[i], self.costs[i]
+        )
+
+    def __iter__(self) -> Iterator[TrainItem]:
+        return map(self.__getitem__, range(len(self)))
+
+    def take(self, indexes: Sequence[int]) -> List[TrainItem]:
+        return [self[i] for i in indexes]
+
+
+class Column(collections.abc.Sequence):
+    """The values of a column at the given indexes, without copying them"""
+
+    __slots__ = ("values", "indexes")
+
+    def __init__(self, values: Sequence[Any], indexes: List[int]) -> None:
+        self.values = values
+        self.indexes = indexes
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+    def __getitem__(self, i: int) -> Any:
+        return self.values[self.indexes[i]]
+
+    def __iter__(self) -> Iterator[Any]:
+        return map(self.values.__getitem__, self.indexes)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+
+class ParcelView:
+    """The parcels of a batch at the given indexes, without copying them"""
+
+    __slots__ = ("batch", "indexes")
+
+    def __init__(self, batch: "ParcelBatch", indexes: List[int]) -> None:
+        self.batch = batch
+        self.indexes = indexes
+
+    def __len__(self) -> int:
+        return len(self.indexes)
+
+    def __iter__(self) -> Iterator[ParcelItem]:
+        return map(self.batch.__getitem__, self.indexes)
+
+    @property
+    def ids(self) -> Column:
+        return Column(self.batch.ids, self.indexes)
+
+    @property
+    def weights(self) -> Column:
+        return Column(self.batch.weights, self.indexes)
+
+    @property
+    def volumes(self) -> Column:
+        return Column(self.batch.volumes, self.indexes)
+
+
+class ParcelBatch:
+    """Parcels stored as columns, with a mask of the assigned parcels"""
+
+    __slots__ = ("ids", "weights", "volumes", "assigned")
+
+    def __init__(
+        self,
+        ids: Iterable[int] = (),
+        weights: Iterable[int] = (),
+        volumes: Iterable[int] = (),
+    ) -> None:
+        self.ids = array("q", ids)
+        self.weights = _int_column("parcel weights", weights)
+        self.volumes = _int_column("parcel volumes", volumes)
+        self.assigned = bytearray(len(self.ids))
+
+    @classmethod
+    def from_items(cls, parcels: Iterable[object]) -> "ParcelBatch":
+        batch = cls()
+        for parcel in parcels:
+            batch.ids.append(parcel.id)
+            batch.weights.append(parcel.weight)
+            batch.volumes.append(parcel.volume)
+        batch.assigned = bytearray(len(batch.ids))
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i: int) -> ParcelItem:
+        return ParcelItem(self.ids[i], self.weights[i], self.volumes[i])
+
+    def __iter__(self) -> Iterator[ParcelItem]:
+        return map(self.__getitem__, range(len(self)))
+
+    @property
+    def total_weight(self) -> int:
+        return sum(self.weights)
+
+    @property
+    def total_volume(self) -> int:
+        return sum(self.volumes)
+
+    def view(self, indexes: List[int]) -> ParcelView:
+        return ParcelView(self, indexes)
+
+    def unassigned(self) -> ParcelView:
+        """View of the parcels not assigned yet"""
+        assigned = self.assigned
+        return ParcelView(
+            self, [i for i in range(len(self)) if not assigned[i]]
+        )
+
+    def reset(self) -> None:
+        """Mark all the parcels as unassigned"""
+        self.assigned = bytearray(len(self.ids))
@@ -0,0 +1,34 @@
+"""Wall-clock deadline of the assignment solvers
+
+The solvers check the deadline between two rows of their DP and stop with
+`DeadlineExceeded` once it has passed.
+"""
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """The solver ran out of time"""
+
+
+class Deadline:
+    __slots__ = ("expires_at",)
+
+    def __init__(self, budget_ms: float) -> None:
+        self.expires_at = time.monotonic() + budget_ms / 1000
+
+    def remaining_ms(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0) * 1000
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceeded()
+
+
+def check_deadline(deadline: Optional[Deadline]) -> None:
+    """Raise `DeadlineExceeded` if the optional deadline has passed"""
+    if deadline is not None:
+        deadline.check()
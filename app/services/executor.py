@@ -0,0 +1,118 @@
+"""Solver executor
+
+The assignment solvers are CPU bound, running them inline in a request
+handler blocks the event loop and every other request of the worker. The
+executor runs them in a process pool (or a thread pool, or inline for the
+tests) and limits how many of them run at the same time.
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Any, Callable, List, Optional
+
+from app.config import app_config
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ("process", "thread", "inline")
+
+
+class SolverExecutor:
+    """Run the solvers outside of the event loop
+
+    Parameters
+    ----------
+    kind: str
+        "process" for a process pool, "thread" for a thread pool when the
+        solver releases the GIL, "inline" to run in the event loop
+    max_workers: Optional[int]
+        size of the pool, defaults to the number of CPUs
+    start_method: Optional[str]
+        multiprocessing start method of the process pool: spawn, fork or
+        forkserver
+    max_concurrency: int
+        the most solvers running at the same time, the other calls wait
+    """
+
+    def __init__(
+        self,
+        kind: str = "process",
+        max_workers: Optional[int] = None,
+        start_method: Optional[str] = None,
+        max_concurrency: int = 2,
+    ) -> None:
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown solver executor: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        self.start_method = start_method
+        self.max_concurrency = max_concurrency
+
+        self._pool: Optional[Executor] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                )
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="solver",
+                )
+            logger.info("Started the %s pool of the solvers", self.kind)
+
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run the function in the pool and wait for its result
+
+        With a process pool, the function and its arguments must be
+        picklable.
+        """
+        async with self._semaphore:
+            if self.kind == "inline":
+                return fn(*args)
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+
+    async def map(self, fn: Callable[..., Any], items: List[Any]) -> List[Any]:
+        """Run the function on every item in the pool, in parallel
+
+        The items of one call take one slot of `max_concurrency`, so the
+        shards of a fill use the whole pool.
+        """
+        async with self._semaphore:
+            if self.kind == "inline":
+                return [fn(item) for item in items]
+
+            loop = asyncio.get_running_loop()
+            pool = self._get_pool()
+            return list(
+                await asyncio.gather(
+                    *(loop.run_in_executor(pool, fn, item) for item in items)
+                )
+            )
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+solver_executor = SolverExecutor(
+    kind=app_config.SOLVER_EXECUTOR,
+    max_workers=app_config.SOLVER_POOL_SIZE,
+    start_method=app_config.SOLVER_START_METHOD,
+    max_concurrency=app_config.SOLVER_MAX_CONCURRENCY,
+)
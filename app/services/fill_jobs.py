@@ -0,0 +1,239 @@
+"""Background fill jobs
+
+A fill of many parcels can take longer than the proxies and the clients
+wait for a response. `POST /parcels/fill?background=true` stores a job
+and returns 202 with its id, a worker started in the lifespan of the app
+runs the queued jobs one at a time and stores their state, progress and
+response, polled with `GET /fill-jobs/{id}`.
+
+The worker running a job holds a lease on it: its id is stored with the
+job and a heartbeat renews the lease while the fill runs. At startup, the
+queued jobs and the running jobs whose lease expired, i.e. their worker
+died, are queued again; the jobs running in the other live workers are
+left alone. A fill is saved in one transaction, so an interrupted fill
+saved nothing.
+"""
+import asyncio
+import contextlib
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+import sqlalchemy
+
+from app.config import app_config
+from app.db import FillJob, database
+from app.models.parcel import ParcelFillResponseModel
+
+logger = logging.getLogger(__name__)
+
+# progress of the job when a phase of the fill starts
+PHASE_PROGRESS = {"fetch": 0.0, "solve": 0.1, "update": 0.9}
+
+# runs a fill with the stored params and reports its phases
+FillRunner = Callable[..., Awaitable[dict]]
+
+
+class FillQueueFull(Exception):
+    """Too many fills are queued already"""
+
+
+class FillJobQueue:
+    """Fill jobs stored in the database and run by one worker
+
+    Parameters
+    ----------
+    max_queued: int
+        the most jobs waiting for the worker
+    lease_seconds: float
+        how long a running job is owned by its worker without a heartbeat
+    """
+
+    def __init__(
+        self, max_queued: int = 100, lease_seconds: float = 60
+    ) -> None:
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        # the owner of the jobs run by this worker
+        self.worker_id = uuid.uuid4().hex
+
+        self._runner: Optional[FillRunner] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self, runner: FillRunner) -> None:
+        """Queue the pending jobs again and start the worker"""
+        self._runner = runner
+        self._queue = asyncio.Queue()
+
+        expired = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        # conditional, a job claimed or renewed meanwhile is left alone
+        rows = await database.fetch_all(
+            FillJob.update()
+            .where(
+                sqlalchemy.or_(
+                    FillJob.c.state == "queued",
+                    sqlalchemy.and_(
+                        FillJob.c.state == "running",
+                        sqlalchemy.or_(
+                            FillJob.c.heartbeat_at == None,
+                            FillJob.c.heartbeat_at < expired,
+                        ),
+                    ),
+                )
+            )
+            .values(state="queued", phase=None, progress=0, worker_id=None)
+            .returning(FillJob.c.id)
+        )
+        job_ids = sorted(row.id for row in rows)
+        if job_ids:
+            logger.info("Queueing %d fill jobs again", len(job_ids))
+        for job_id in job_ids:
+            self._queue.put_nowait(job_id)
+
+        self._worker = asyncio.create_task(self._work(), name="fill-jobs")
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._worker
+            self._worker = None
+
+    async def join(self) -> None:
+        """Wait until the worker ran all the queued jobs"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def enqueue(self, params: dict) -> Any:
+        """Store a job of the fill and queue it
+
+        Parameters
+        ----------
+        params: dict
+            the query parameters of the fill
+
+        Returns
+        -------
+        Any
+            the row of the job
+        """
+        queued = await database.fetch_val(
+            sqlalchemy.select(sqlalchemy.func.count()).where(
+                FillJob.c.state == "queued"
+            )
+        )
+        if queued >= self.max_queued:
+            raise FillQueueFull(f"{queued} fills are queued already")
+
+        job_id = await database.execute(
+            FillJob.insert().values(
+                state="queued",
+                progress=0,
+                params=params,
+                created_at=datetime.utcnow(),
+            )
+        )
+        # without a worker, the job runs when the next one starts
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+
+        return await get_job(job_id)
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: int) -> None:
+        job = await get_job(job_id)
+        # claimed with a conditional update, a job queued again by the
+        # startup of another worker runs once
+        now = datetime.utcnow()
+        claimed = await database.fetch_val(
+            FillJob.update()
+            .where(FillJob.c.id == job_id, FillJob.c.state == "queued")
+            .values(
+                state="running",
+                started_at=now,
+                worker_id=self.worker_id,
+                heartbeat_at=now,
+            )
+            .returning(FillJob.c.id)
+        )
+        if job is None or claimed is None:
+            return
+
+        async def report(phase: str) -> None:
+            await _update(job_id, phase=phase, progress=PHASE_PROGRESS[phase])
+
+        heartbeat = asyncio.create_task(
+            self._heartbeat(job_id), name=f"fill-job-{job_id}-heartbeat"
+        )
+        try:
+            result = await self._runner(progress=report, **job.params)
+            result = ParcelFillResponseModel(**result).model_dump(mode="json")
+        except Exception as e:
+            logger.exception("Fill job %s failed", job_id)
+            await _update(
+                job_id,
+                state="failed",
+                error=getattr(e, "detail", None) or str(e) or repr(e),
+                finished_at=datetime.utcnow(),
+            )
+        else:
+            await _update(
+                job_id,
+                state="done",
+                phase=None,
+                progress=1,
+                result=result,
+                finished_at=datetime.utcnow(),
+            )
+        finally:
+            heartbeat.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await heartbeat
+
+    async def _heartbeat(self, job_id: int) -> None:
+        """Renew the lease of the running job until cancelled"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            # a missed beat is retried at the next one, within the lease
+            try:
+                await database.execute(
+                    FillJob.update()
+                    .where(
+                        FillJob.c.id == job_id,
+                        FillJob.c.worker_id == self.worker_id,
+                    )
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+            except Exception:
+                logger.warning(
+                    "Could not renew the lease of fill job %s",
+                    job_id,
+                    exc_info=True,
+                )
+
+
+async def get_job(job_id: int) -> Any:
+    return await database.fetch_one(
+        FillJob.select().where(FillJob.c.id == job_id)
+    )
+
+
+async def _update(job_id: int, **values: Any) -> None:
+    await database.execute(
+        FillJob.update().where(FillJob.c.id == job_id).values(**values)
+    )
+
+
+fill_job_queue = FillJobQueue(
+    max_queued=app_config.FILL_JOB_MAX_QUEUED,
+    lease_seconds=app_config.FILL_JOB_LEASE_SECONDS,
+)
@@ -0,0 +1,264 @@
+"""Knapsack engines
+
+NumPy implementations of the knapsack tables used by the parcel assignment
+service. Each DP row is computed from the previous one with whole-array
+operations instead of filling the cells one by one.
+
+The compact engines keep a single rolling row of values capped at the
+target capacity and record the include/exclude decisions in a bit-packed
+`ChoiceMatrix`, so the memory is O(n * capacity / 8) bytes instead of a
+full table of Python objects.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+from app.services.deadline import Deadline, check_deadline
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+
+HAS_NUMPY = np is not None
+
+
+def _require_numpy() -> None:
+    if not HAS_NUMPY:
+        raise RuntimeError("numpy is required for the vectorized backend")
+
+
+def _value_dtype(values: Sequence[float]):
+    """Keep integer tables integral so the results compare exactly with the
+    pure Python tables, fall back to float64 otherwise."""
+    if all(float(v).is_integer() for v in values):
+        return np.int64
+    return np.float64
+
+
+def compute_knapsack_table_for_max_np(
+    weights: List[int],
+    costs: List[float],
+    deadline: Optional[Deadline] = None,
+) -> "np.ndarray":
+    """Vectorized version of `compute_knapsack_table_for_max`
+
+    Parameters
+    ----------
+    weights: List[int]
+        list of weights used for the computation
+    costs: List[float]
+        list of costs corresponding to the weights
+    deadline: Optional[Deadline]
+        stop with `DeadlineExceeded` once it has passed
+
+    Returns
+    -------
+    np.ndarray
+        (n + 1) x (sum(weights) + 1) array containing the maximum cumulative
+        costs that fit in each weight
+    """
+    _require_numpy()
+
+    max_weight = int(sum(weights))
+    n = len(weights)
+
+    K = np.zeros((n + 1, max_weight + 1), dtype=_value_dtype(costs))
+
+    for i in range(1, n + 1):
+        check_deadline(deadline)
+        weight = int(weights[i - 1])
+        cost = costs[i - 1]
+        prev = K[i - 1]
+
+        K[i] = prev
+        # column 0 always stays empty
+        start = max(weight, 1)
+        np.maximum(
+            prev[start:],
+            prev[start - weight : max_weight + 1 - weight] + cost,
+            out=K[i, start:],
+        )
+
+    return K
+
+
+class ChoiceMatrix:
+    """Bit-packed matrix of the include/exclude decisions of a knapsack DP
+
+    Bit (i, w) is set when item i improves the best value for capacity w,
+    which is exactly when the full table has `K[i + 1][w] != K[i][w]`.
+    """
+
+    __slots__ = ("rows", "cols", "row_bytes", "data")
+
+    def __init__(self, rows: int, cols: int) -> None:
+        self.rows = rows
+        self.cols = cols
+        self.row_bytes = (cols + 7) // 8
+        self.data = bytearray(rows * self.row_bytes)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data)
+
+    def set(self, row: int, col: int) -> None:
+        self.data[row * self.row_bytes + (col >> 3)] |= 1 << (col & 7)
+
+    def get(self, row: int, col: int) -> bool:
+        byte = self.data[row * self.row_bytes + (col >> 3)]
+        return bool(byte >> (col & 7) & 1)
+
+    def set_row(self, row: int, packed: bytes) -> None:
+        """Store a row packed in little bit order"""
+        start = row * self.row_bytes
+        self.data[start : start + self.row_bytes] = packed
+
+
+def compute_knapsack_choices_for_max(
+    weights: List[int],
+    costs: List[float],
+    capacity: int,
+    use_numpy: bool = False,
+    deadline: Optional[Deadline] = None,
+) -> Tuple[List[float], ChoiceMatrix]:
+    """Compact version of `compute_knapsack_table_for_max`
+
+    Only the columns up to `capacity` are computed, the rest of the table is
+    never read by the backtrack.
+
+    Parameters
+    ----------
+    weights: List[int]
+        list of weights used for the computation
+    costs: List[float]
+        list of costs corresponding to the weights
+    capacity: int
+        the largest weight that will be looked up
+    use_numpy: bool
+        compute the rows with numpy instead of pure Python
+    deadline: Optional[Deadline]
+        stop with `DeadlineExceeded` once it has passed
+
+    Returns
+    -------
+    Tuple[List[float], ChoiceMatrix]
+        the last row of the table and the decisions of every item
+    """
+    max_weight = int(min(capacity, sum(weights)))
+    n = len(weights)
+    choices = ChoiceMatrix(n, max_weight + 1)
+
+    if use_numpy:
+        _require_numpy()
+        row = np.zeros(max_weight + 1, dtype=_value_dtype(costs))
+
+        for i in range(n):
+            check_deadline(deadline)
+            weight = int(weights[i])
+            start = max(weight, 1)
+            if start > max_weight:
+                continue
+
+            candidates = (
+                row[start - weight : max_weight + 1 - weight] + costs[i]
+            )
+            improved = np.zeros(max_weight + 1, dtype=bool)
+            improved[start:] = candidates > row[start:]
+            choices.set_row(
+                i, np.packbits(improved, bitorder="little").tobytes()
+            )
+            np.maximum(row[start:], candidates, out=row[start:])
+
+        return row.tolist(), choices
+
+    row = [0] * (max_weight + 1)
+
+    for i in range(n):
+        check_deadline(deadline)
+        weight = weights[i]
+        cost = costs[i]
+
+        # going right to left only reads the cells of the previous item
+        for w in range(max_weight, max(weight, 1) - 1, -1):
+            value = row[w - weight] + cost
+            if value > row[w]:
+                row[w] = value
+                choices.set(i, w)
+
+    return row, choices
+
+
+def knapsack_fptas(
+    weights: List[int],
+    values: List[float],
+    capacity: int,
+    epsilon: float,
+    deadline: Optional[Deadline] = None,
+) -> List[int]:
+    """Approximate the items with the highest total value fitting in the
+    capacity, within a factor (1 - epsilon) of the optimum
+
+    The values are scaled down by `epsilon * max(values) / n` and the DP
+    finds the lowest weight reaching every scaled value, so the work is
+    O(n^2 / epsilon) cells whatever the capacity.
+
+    Parameters
+    ----------
+    weights: List[int]
+        list of weights of the items
+    values: List[float]
+        list of values of the items
+    capacity: int
+        the total weight the selected items must not exceed
+    epsilon: float
+        the accepted relative loss of value, between 0 and 1
+    deadline: Optional[Deadline]
+        stop with `DeadlineExceeded` once it has passed
+
+    Returns
+    -------
+    List[int]
+        indexes of the selected items in descending order
+    """
+    if not 0 < epsilon < 1:
+        raise ValueError("epsilon must be between 0 and 1")
+
+    n = len(weights)
+    max_value = max(values, default=0)
+    if max_value <= 0:
+        return []
+
+    # integer values smaller than the factor are already exact
+    factor = max(epsilon * max_value / n, 1)
+    scaled = [int(v // factor) for v in values]
+    max_profit = sum(scaled)
+
+    # lowest weight reaching each profit
+    row = [float("inf")] * (max_profit + 1)
+    row[0] = 0
+    choices = ChoiceMatrix(n, max_profit + 1)
+
+    for i in range(n):
+        check_deadline(deadline)
+        weight = weights[i]
+        profit = scaled[i]
+        if profit == 0:
+            continue
+
+        for p in range(max_profit, profit - 1, -1):
+            value = row[p - profit] + weight
+            if value < row[p]:
+                row[p] = value
+                choices.set(i, p)
+
+    p = max(p for p in range(max_profit + 1) if row[p] <= capacity)
+
+    indexes = []
+    for i in range(n - 1, -1, -1):
+        if p <= 0:
+            break
+
+        if choices.get(i, p):
+            indexes.append(i)
+            p -= scaled[i]
+
+    return indexes
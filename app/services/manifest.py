@@ -0,0 +1,147 @@
+"""Parcel manifests
+
+A manifest is a file of parcels (one row per parcel, with `weight` and
+`volume` columns) uploaded as the raw request body. The rows are parsed
+while the body is received, so a manifest of any size is read with
+bounded memory:
+
+- CSV (`text/csv`): the chunks are decoded and split into lines, quoted
+  fields spanning several lines are not supported
+- Arrow IPC stream (`application/vnd.apache.arrow.stream`): needs pyarrow,
+  the body is spooled to a temporary file and read batch by batch
+"""
+import codecs
+import csv
+import tempfile
+from typing import AsyncIterator, List, NamedTuple, Optional
+
+from pydantic import ValidationError
+
+from app.models.parcel import ParcelInputModel
+
+try:
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pyarrow = None
+
+HAS_PYARROW = pyarrow is not None
+
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+ARROW_MEDIA_TYPES = ("application/vnd.apache.arrow.stream",)
+COLUMNS = ("weight", "volume")
+
+
+class ManifestError(ValueError):
+    """The manifest cannot be read, e.g. a required column is missing"""
+
+
+class ManifestRow(NamedTuple):
+    # 1-based row number in the manifest, the header excluded
+    line: int
+    # weight and volume of the parcel, None when the row is rejected
+    values: Optional[dict]
+    error: Optional[str] = None
+
+
+def _parse(line: int, weight: object, volume: object) -> ManifestRow:
+    # validated like the posted parcels: finite, not negative
+    try:
+        parcel = ParcelInputModel(weight=weight, volume=volume)
+    except ValidationError as e:
+        error = e.errors(include_url=False)[0]
+        return ManifestRow(line, None, f"{error['loc'][0]}: {error['msg']}")
+
+    return ManifestRow(line, parcel.model_dump())
+
+
+def _column_indexes(header: List[str]) -> List[int]:
+    names = [name.strip().lower() for name in header]
+    missing = [c for c in COLUMNS if c not in names]
+    if missing:
+        raise ManifestError(f"Missing columns: {', '.join(missing)}")
+
+    return [names.index(c) for c in COLUMNS]
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+
+    async for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_csv_rows(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[ManifestRow]:
+    """Parse the rows of a CSV manifest"""
+    indexes = None
+    line = 0
+
+    async for text in _iter_lines(chunks):
+        if not text.strip():
+            continue
+
+        fields = next(csv.reader([text]))
+        if indexes is None:
+            indexes = _column_indexes(fields)
+            continue
+
+        line += 1
+        try:
+            weight, volume = (fields[i] for i in indexes)
+        except IndexError:
+            yield ManifestRow(line, None, "missing fields")
+            continue
+
+        yield _parse(line, weight, volume)
+
+    if indexes is None:
+        raise ManifestError("Empty manifest")
+
+
+async def iter_arrow_rows(
+    chunks: AsyncIterator[bytes],
+    spool_bytes: int = 64 * 1024 * 1024,
+) -> AsyncIterator[ManifestRow]:
+    """Parse the rows of an Arrow IPC stream manifest"""
+    if not HAS_PYARROW:
+        raise ManifestError("Arrow manifests need pyarrow")
+
+    with tempfile.SpooledTemporaryFile(max_size=spool_bytes) as body:
+        async for chunk in chunks:
+            body.write(chunk)
+        body.seek(0)
+
+        try:
+            reader = pyarrow.ipc.open_stream(body)
+        except pyarrow.ArrowException as e:
+            raise ManifestError(f"Invalid Arrow stream: {e}") from e
+
+        names = [name.lower() for name in reader.schema.names]
+        _column_indexes(names)
+
+        line = 0
+        batches = iter(reader)
+        while True:
+            # a truncated or corrupt batch only fails when it is read
+            try:
+                batch = next(batches)
+            except StopIteration:
+                break
+            except pyarrow.ArrowException as e:
+                raise ManifestError(f"Invalid Arrow stream: {e}") from e
+
+            weights, volumes = (
+                batch.column(names.index(c)).to_pylist() for c in COLUMNS
+            )
+            for weight, volume in zip(weights, volumes):
+                line += 1
+                yield _parse(line, weight, volume)
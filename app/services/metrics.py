@@ -0,0 +1,175 @@
+"""Instrumentation of the fill
+
+`PhaseStats` collects the time spent in every phase of a fill and size
+counters (table cells, rows updated...). It is a plain object, so the stats
+of a solver running in a process pool are returned with its service.
+
+The stats of every fill are recorded as histograms in the `metrics`
+registry, exposed in the Prometheus text format on `GET /metrics`.
+"""
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Mapping, Sequence, Tuple
+
+# seconds
+TIME_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+)
+# counts of cells, rows, states...
+SIZE_BUCKETS = tuple(10**i for i in range(9))
+
+
+class PhaseStats:
+    """Wall time of the phases and counters of a fill"""
+
+    __slots__ = ("timings", "counters")
+
+    def __init__(self) -> None:
+        # milliseconds spent in every phase
+        self.timings: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[phase] = self.timings.get(phase, 0) + elapsed
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other: "PhaseStats") -> None:
+        for phase, elapsed in other.timings.items():
+            self.timings[phase] = self.timings.get(phase, 0) + elapsed
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus format"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join(f'{k}="{v}"' for k, v in pairs)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Histograms and gauges, rendered in the Prometheus text format"""
+
+    def __init__(self) -> None:
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Sequence[float] = TIME_BUCKETS,
+        help: str = "",
+        **labels: str,
+    ) -> None:
+        self._help.setdefault(name, ("histogram", help))
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def set_gauge(
+        self, name: str, value: float, help: str = "", **labels: str
+    ) -> None:
+        self._help.setdefault(name, ("gauge", help))
+        self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def record_fill(self, stats: PhaseStats) -> None:
+        """Record the stats of a fill in the histograms"""
+        for phase, elapsed in stats.timings.items():
+            self.observe(
+                "fill_phase_seconds",
+                elapsed / 1000,
+                help="Wall time of the phases of the fill",
+                phase=phase,
+            )
+        for name, value in stats.counters.items():
+            self.observe(
+                "fill_size",
+                value,
+                buckets=SIZE_BUCKETS,
+                help="Size counters of the fill",
+                counter=name,
+            )
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name, (kind, help) in sorted(self._help.items()):
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+
+            for (metric, labels), histogram in sorted(
+                self._histograms.items()
+            ):
+                if metric != name:
+                    continue
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    le = _format_labels(labels, le=_format_value(bound))
+                    lines.append(f"{name}_bucket{le} {count}")
+                lines.append(
+                    f"{name}_sum{_format_labels(labels)} {histogram.sum}"
+                )
+                lines.append(
+                    f"{name}_count{_format_labels(labels)} {histogram.count}"
+                )
+
+            for (metric, labels), value in sorted(self._gauges.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def histograms(self) -> Mapping[Tuple[str, Labels], Histogram]:
+        return self._histograms
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,196 @@
+"""Train line occupancy
+
+A booked train occupies its line for `LINE_OCCUPANCY_MINUTES` from its
+booking, stored as an interval of the `line_occupancy` table. The
+intervals are kept in memory in an interval tree, so finding the lines
+busy over a period visits only the intervals overlapping it (and their
+path from the root) instead of scanning every booking:
+
+- `GET /trainlines/available?from=&to=` lists the lines free over a period
+- the fill skips the trains of the lines busy at the time of the fill
+
+The index is loaded at startup and reads the intervals stored since its
+last read before every query, so the bookings of the other workers are
+seen too. Only the intervals not ended yet are loaded, and the index is
+loaded again every `LINE_OCCUPANCY_MINUTES` to drop the intervals ended
+since, so the past periods are not reported.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Any, Iterator, List, Optional, Set, Tuple
+
+from app.config import app_config
+from app.db import LineOccupancy, database
+
+
+class _Node:
+    __slots__ = ("key", "end", "value", "priority", "max_end", "left", "right")
+
+    def __init__(self, key: Tuple, end: Any, value: Any) -> None:
+        self.key = key
+        self.end = end
+        self.value = value
+        self.priority = random.random()
+        # the latest end of the subtree, skips the subtrees ending before
+        # the period queried
+        self.max_end = end
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+
+    def update(self) -> None:
+        self.max_end = self.end
+        for child in (self.left, self.right):
+            if child is not None and child.max_end > self.max_end:
+                self.max_end = child.max_end
+
+
+def _rotate_right(node: _Node) -> _Node:
+    left = node.left
+    node.left, left.right = left.right, node
+    node.update()
+    left.update()
+    return left
+
+
+def _rotate_left(node: _Node) -> _Node:
+    right = node.right
+    node.right, right.left = right.left, node
+    node.update()
+    right.update()
+    return right
+
+
+def _insert(node: Optional[_Node], new: _Node) -> _Node:
+    if node is None:
+        return new
+
+    if new.key < node.key:
+        node.left = _insert(node.left, new)
+        if node.left.priority > node.priority:
+            node = _rotate_right(node)
+    else:
+        node.right = _insert(node.right, new)
+        if node.right.priority > node.priority:
+            node = _rotate_left(node)
+
+    node.update()
+    return node
+
+
+class IntervalTree:
+    """Half-open intervals [start, end) in a treap augmented with the
+    latest end of every subtree
+
+    The inserts take O(log n) and the overlap queries O(log n) per
+    overlapping interval, expected.
+    """
+
+    def __init__(self) -> None:
+        self._root: Optional[_Node] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, start: Any, end: Any, value: Any = None) -> None:
+        if not start < end:
+            raise ValueError("The interval ends before it starts")
+
+        # the size breaks the ties of the intervals with the same bounds
+        node = _Node((start, end, self._size), end, value)
+        self._root = _insert(self._root, node)
+        self._size += 1
+
+    def overlapping(
+        self, start: Any, end: Any
+    ) -> Iterator[Tuple[Any, Any, Any]]:
+        """The (start, end, value) of the intervals overlapping [start, end)"""
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            # nothing in the subtree ends after the start
+            if node is None or node.max_end <= start:
+                continue
+
+            stack.append(node.left)
+            # the right subtree starts after the node
+            if node.key[0] < end:
+                if node.end > start:
+                    yield node.key[0], node.end, node.value
+                stack.append(node.right)
+
+
+class LineOccupancyIndex:
+    """The occupancy intervals of the train lines, in an interval tree
+
+    Parameters
+    ----------
+    prune_every: timedelta
+        how often the index is loaded again without the ended intervals
+    """
+
+    def __init__(self, prune_every: timedelta = timedelta(hours=1)) -> None:
+        self.prune_every = prune_every
+        self.reset()
+
+    def reset(self) -> None:
+        self.tree = IntervalTree()
+        # the last row of the table read
+        self.last_id = 0
+        self.pruned_at = datetime.utcnow()
+
+    async def refresh(self) -> int:
+        """Add the intervals stored since the last read and not ended yet
+
+        Returns
+        -------
+        int
+            the number of intervals added
+        """
+        now = datetime.utcnow()
+        # the tree has no removal, drop the ended intervals by loading it
+        # again
+        if now - self.pruned_at >= self.prune_every:
+            self.reset()
+
+        rows = await database.fetch_all(
+            LineOccupancy.select()
+            .where(
+                LineOccupancy.c.id > self.last_id, LineOccupancy.c.end_at > now
+            )
+            .order_by(LineOccupancy.c.id)
+        )
+        for row in rows:
+            self.tree.add(row.start_at, row.end_at, row.line_id)
+            self.last_id = row.id
+
+        return len(rows)
+
+    async def rebuild(self) -> None:
+        """Load all the intervals not ended yet again, at startup"""
+        self.reset()
+        await self.refresh()
+
+    async def busy_lines(self, start: datetime, end: datetime) -> Set[int]:
+        """The lines occupied at some point of [start, end)"""
+        await self.refresh()
+        return {line_id for _, _, line_id in self.tree.overlapping(start, end)}
+
+    async def occupy(self, occupancies: List[dict]) -> None:
+        """Store the occupancy intervals of booked trains
+
+        The index reads them at its next refresh, once the transaction of
+        the booking is committed.
+
+        Parameters
+        ----------
+        occupancies: List[dict]
+            line_id, train_id, start_at and end_at of every interval
+        """
+        if occupancies:
+            await database.execute(LineOccupancy.insert().values(occupancies))
+
+
+line_occupancy = LineOccupancyIndex(
+    prune_every=timedelta(minutes=app_config.LINE_OCCUPANCY_MINUTES)
+)
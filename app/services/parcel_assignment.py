@@ -2,17 +2,48 @@
 
 This service is to compute the train with lowest cost for the parcels
 """
-from typing import Any, List, Mapping, Tuple
+import logging
+import math
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from app.services.batches import ParcelItem, ParcelView, TrainItem
+from app.services.deadline import Deadline, check_deadline
+from app.services.knapsack import (
+    HAS_NUMPY,
+    compute_knapsack_choices_for_max,
+    compute_knapsack_table_for_max_np,
+)
+from app.services.metrics import PhaseStats
+from app.services.scaling import DEFAULT_MAX_UNITS, scale_problem
+from app.services.strategies import (
+    AnytimeStrategy,
+    get_strategy,
+    is_proven_optimal,
+)
+from app.services.train_selection import (
+    DEFAULT_MAX_STATES,
+    select_min_cost_cover,
+)
+
+logger = logging.getLogger(__name__)
 
-MAX_INT = float("inf")
 
-
-def compute_knapsack_table_for_min(
+def compute_knapsack_table_for_max(
     weights: List[int],
     costs: List[int],
+    deadline: Optional[Deadline] = None,
 ) -> List[List[int]]:
     """Build the knapsack table to find the possible items that can have total cost reach
-    the minimum cost
+    the maximum cost
 
     Parameters
     ----------
@@ -20,6 +51,8 @@ def compute_knapsack_table_for_min(
         list of weights used for the computation
     costs: List[int]
         list of costs corresponding to the weights
+    deadline: Optional[Deadline]
+        stop with `DeadlineExceeded` once it has passed
 
     Returns
     -------
@@ -31,98 +64,121 @@ def compute_knapsack_table_for_min(
     n = len(weights)
 
     # table to store costs by weights
-    K = [
-        [0 if col > 0 else MAX_INT for col in range(max_weight + 1)]
-        if row > 0
-        else [MAX_INT] * (max_weight + 1)
-        for row in range(n + 1)
-    ]
+    K = [[0 for _ in range(max_weight + 1)] for _ in range(n + 1)]
 
     for i in range(1, n + 1):
+        check_deadline(deadline)
+        weight = weights[i - 1]
+        cost = costs[i - 1]
         for w in range(1, max_weight + 1):
-            if w > weights[i - 1]:
-                K[i][w] = min(
-                    K[i - 1][w], K[i - 1][w - weights[i - 1]] + costs[i - 1]
-                )
+            if i == 0 or w == 0:
+                K[i][w] = 0
+            elif w >= weight:
+                K[i][w] = max(K[i - 1][w], K[i - 1][w - weight] + cost)
             else:
-                K[i][w] = min(K[i - 1][w], costs[i - 1])
+                K[i][w] = K[i - 1][w]
 
     return K
 
 
-def compute_knapsack_table_for_max(
-    weights: List[int],
-    costs: List[int],
-) -> List[List[int]]:
-    """Build the knapsack table to find the possible items that can have total cost reach
-    the maximum cost
+KNAPSACK_BACKENDS = {
+    "python": compute_knapsack_table_for_max,
+    "numpy": compute_knapsack_table_for_max_np,
+}
+
+
+def get_knapsack_backend(name: str = "auto") -> str:
+    """Resolve the name of the knapsack backend to use
 
     Parameters
     ----------
-    weights: List[int]
-        list of weights used for the computation
-    costs: List[int]
-        list of costs corresponding to the weights
+    name: str
+        one of the `KNAPSACK_BACKENDS` names, or "auto" to use numpy when it
+        is installed and the pure Python tables otherwise
 
     Returns
     -------
-    List[List[int]]
-        2-D array containing the weights with corresponding cumulative costs
+    str
+        name of the resolved backend
     """
+    if name == "auto":
+        return "numpy" if HAS_NUMPY else "python"
 
-    max_weight = sum(weights)
-    n = len(weights)
-
-    # table to store costs by weights
-    K = [[0 for _ in range(max_weight + 1)] for _ in range(n + 1)]
+    if name not in KNAPSACK_BACKENDS:
+        raise ValueError(f"Unknown knapsack backend: {name}")
 
-    for i in range(1, n + 1):
-        for w in range(1, max_weight + 1):
-            if i == 0 or w == 0:
-                K[i][w] = 0
-            elif w >= weights[i - 1]:
-                K[i][w] = max(
-                    K[i - 1][w], K[i - 1][w - weights[i - 1]] + costs[i - 1]
-                )
-            else:
-                K[i][w] = K[i - 1][w]
+    if name == "numpy" and not HAS_NUMPY:
+        raise ValueError("numpy backend requested but numpy is not installed")
 
-    return K
+    return name
 
 
 class AssignmentService:
     """Assignment service that will assign the parcel to approriate train"""
 
-    def __init__(self, trains: List[object], parcels: List[object]) -> None:
-        self.available_trains = trains
-        self.parcels = parcels
-
-        self.trains_data = {
-            "ids": [],
-            "weights": [],
-            "volumes": [],
-            "costs": [],
-        }
-
-        for train in trains:
-            self.trains_data["ids"].append(train.id)
-            self.trains_data["weights"].append(train.weight)
-            self.trains_data["volumes"].append(train.volume)
-            self.trains_data["costs"].append(train.cost)
-
-        self.parcels_data = {
-            "ids": [],
-            "weights": [],
-            "volumes": [],
-        }
-
-        for parcel in parcels:
-            self.parcels_data["ids"].append(parcel.id)
-            self.parcels_data["weights"].append(parcel.weight)
-            self.parcels_data["volumes"].append(parcel.volume)
-
-        self.total_parcel_weight = sum(self.parcels_data["weights"])
-        self.total_parcel_volume = sum(self.parcels_data["volumes"])
+    def __init__(
+        self,
+        trains: List[object],
+        parcels: List[object],
+        backend: str = "auto",
+        compact: bool = False,
+        weight_precision: Optional[float] = None,
+        volume_precision: Optional[float] = None,
+        max_units: Optional[int] = DEFAULT_MAX_UNITS,
+        max_selection_states: int = DEFAULT_MAX_STATES,
+        strategy: str = "exact",
+        epsilon: float = 0.1,
+        deadline_ms: Optional[float] = None,
+    ) -> None:
+        # the knapsack tables are indexed by weight, so work on the
+        # integer units of the problem instead of the posted values
+        self.problem = scale_problem(
+            trains,
+            parcels,
+            weight_precision=weight_precision,
+            volume_precision=volume_precision,
+            max_units=max_units,
+        )
+        dimensions = self.problem.table_dimensions()
+        logger.debug("Knapsack table dimensions: %s", dimensions)
+
+        # timings and size counters of the phases, see app.services.metrics
+        self.stats = PhaseStats()
+        for table, (rows, columns) in dimensions.items():
+            self.stats.count(f"{table}_table_rows", rows)
+            self.stats.count(f"{table}_table_columns", columns)
+
+        # columns of the trains and parcels, see app.services.batches
+        self.available_trains = self.problem.trains
+        self.parcels = self.problem.parcels
+
+        self.backend = get_knapsack_backend(backend)
+        # keep only a rolling row and a bit-packed choice matrix
+        # instead of the full knapsack tables
+        self.compact = compact
+        # bound of the work done by the train selection
+        self.max_selection_states = max_selection_states
+        # how the trains are selected and filled, see app.services.strategies
+        self.strategy = get_strategy(strategy, epsilon=epsilon)
+
+        # with a budget, return the best assignment found before it passes
+        self.deadline_ms = deadline_ms
+        self.deadline = None
+        if deadline_ms is not None:
+            self.strategy = AnytimeStrategy(self.strategy)
+
+        # the volume of the trains bounds their parcels, only for the
+        # residual fill as the partly filled trains have no slack
+        self.bound_volume = False
+
+        # quality of the assignment, reported by the anytime strategy
+        self.lower_bound = None
+        self.optimal = None
+        self.gap = None
+        self.compute_table_for_max = KNAPSACK_BACKENDS[self.backend]
+
+        self.total_parcel_weight = self.parcels.total_weight
+        self.total_parcel_volume = self.parcels.total_volume
 
     def _select_trains(self) -> List[object]:
         """Find the trains that can handle the required weight and volume
@@ -138,58 +194,42 @@ class AssignmentService:
 
         # if total weights of all trains is less than or equal total weight of packages,
         # utilize all the available trains
-        if sum(self.trains_data["weights"]) <= W:
-            return self.available_trains
-
-        # costs by weights table
-        Kw = compute_knapsack_table_for_min(
-            weights=self.trains_data["weights"],
-            costs=self.trains_data["costs"],
+        if sum(self.available_trains.weights) <= W:
+            return list(self.available_trains)
+
+        # cheapest trains covering both the weight and the volume
+        cover = select_min_cost_cover(
+            weights=self.available_trains.weights,
+            volumes=self.available_trains.volumes,
+            costs=self.available_trains.costs,
+            min_weight=W,
+            min_volume=V,
+            max_states=self.max_selection_states,
+            deadline=self.deadline,
         )
 
-        n = len(self.available_trains)
-        min_cost = total_volumes = 0
-        w = W
-
-        checked_costs = set()
-
-        while total_volumes < V:
-            total_volumes = 0
-            min_cost = cost = Kw[n][w]
-            train_indexes = []
-
-            if cost in checked_costs:
-                w += 1
-                continue
-
-            for i in range(n, 0, -1):
-                if cost <= 0:
-                    break
-
-                if cost == Kw[i - 1][w]:
-                    continue
-                else:
-                    # This item is included.
-                    train_indexes.append(i - 1)
-                    total_volumes += self.trains_data["volumes"][i - 1]
-
-                    # Since this weight is included
-                    # its value is deducted
-                    cost -= self.trains_data["costs"][i - 1]
-                    w -= self.trains_data["weights"][i - 1]
-
-            w = W + 1
-            checked_costs.add(min_cost)
+        # not enough volume in all the trains together, utilize them all
+        if cover is None:
+            return list(self.available_trains)
+
+        self.stats.count("selection_states", cover.states)
+        if not cover.exact:
+            self.stats.count("selection_thinned")
+            logger.warning(
+                "Train selection hit the limit of %s states, "
+                "the selected trains may not be the cheapest",
+                self.max_selection_states,
+            )
 
-        return [self.available_trains[i] for i in train_indexes]
+        return self.available_trains.take(cover.indexes)
 
-    def _assign_parcels(self, parcels: List[object], train: Any) -> List[int]:
+    def _assign_parcels(self, parcels: ParcelView, train: Any) -> List[int]:
         """Assign a list of parcels to the specific train
 
         Parameters
         ----------
-        parcels : List[object]
-            list of parcels
+        parcels : ParcelView
+            view of the parcels
         train: object
             assigned train that the parcels are filled int
 
@@ -199,81 +239,165 @@ class AssignmentService:
             list of the parcel ids that are filled into the train
         """
         parcels_data = {
-            "ids": [],
-            "weights": [],
-            "volumes": [],
+            "ids": parcels.ids,
+            "weights": parcels.weights,
+            "volumes": parcels.volumes,
         }
 
-        for parcel in parcels:
-            parcels_data["ids"].append(parcel.id)
-            parcels_data["weights"].append(parcel.weight)
-            parcels_data["volumes"].append(parcel.volume)
         # if total weight less than or equal train capacity
         # and total volume less than or equal train's volume, assign all
         if (
             sum(parcels_data["weights"]) <= train.weight
             and sum(parcels_data["volumes"]) <= train.volume
         ):
-            return parcels_data["ids"]
-
-        # costs by weights table
-        Kw = compute_knapsack_table_for_max(
-            weights=parcels_data["weights"],
-            costs=parcels_data["volumes"],
-        )
+            return list(parcels_data["ids"])
 
         n = len(parcels)
-        w = train.weight
-        min_volume = Kw[n][w]
+        choices = None
+
+        with self.stats.timer("tables"):
+            if self.compact:
+                # the backtrack never reads beyond the train capacity
+                last_row, choices = compute_knapsack_choices_for_max(
+                    weights=parcels_data["weights"],
+                    costs=parcels_data["volumes"],
+                    capacity=train.weight,
+                    use_numpy=self.backend == "numpy",
+                    deadline=self.deadline,
+                )
+                w = min(train.weight, len(last_row) - 1)
+            else:
+                # costs by weights table
+                Kw = self.compute_table_for_max(
+                    weights=parcels_data["weights"],
+                    costs=parcels_data["volumes"],
+                    deadline=self.deadline,
+                )
+                last_row = Kw[n]
+                w = min(train.weight, len(last_row) - 1)
+        self.stats.count("table_cells", (n + 1) * len(last_row))
 
-        parcel_indexes = []
-        for i in range(n, 0, -1):
-            if min_volume <= 0:
-                break
+        with self.stats.timer("backtrack"):
+            min_volume = last_row[w]
+            # the table only bounds the weight, the parcels overflowing the
+            # volume left in the train are skipped
+            volume_left = train.volume if self.bound_volume else math.inf
 
-            if min_volume == Kw[i - 1][w]:
-                continue
-            else:
-                # This item is included.
-                parcel_indexes.append(i - 1)
+            parcel_indexes = []
+            for i in range(n, 0, -1):
+                if min_volume <= 0:
+                    break
 
-                # Since this weight is included
-                # its value is deducted
-                min_volume -= parcels_data["volumes"][i - 1]
-                w -= parcels_data["weights"][i - 1]
+                if choices is not None:
+                    excluded = not choices.get(i - 1, w)
+                else:
+                    excluded = min_volume == Kw[i - 1][w]
 
-        return [parcels_data["ids"][i] for i in parcel_indexes]
+                if excluded:
+                    continue
+                elif parcels_data["volumes"][i - 1] > volume_left:
+                    # the best of the items before at the same weight
+                    if choices is None:
+                        min_volume = Kw[i - 1][w]
+                    continue
+                else:
+                    # This item is included.
+                    parcel_indexes.append(i - 1)
 
-    def process(self) -> Tuple[Mapping[int, List[int]], float]:
-        """Start the assignment process."""
+                    # Since this weight is included
+                    # its value is deducted
+                    min_volume -= parcels_data["volumes"][i - 1]
+                    volume_left -= parcels_data["volumes"][i - 1]
+                    w -= parcels_data["weights"][i - 1]
+
+        return [parcels_data["ids"][i] for i in parcel_indexes]
 
-        selected_trains = []
+    def _fill_trains(
+        self,
+        selected_trains: List[object],
+        assign: Callable[[ParcelView, Any], List[int]],
+    ) -> Mapping[int, List[int]]:
+        """Fill the selected trains one by one with the unassigned parcels
 
-        # if there is only 1 train available, book it anyway
-        if len(self.available_trains) == 1:
-            selected_trains = self.available_trains
-        else:
-            # select approriate trains
-            selected_trains = self._select_trains()
+        Parameters
+        ----------
+        selected_trains: List[object]
+            trains to fill, in order
+        assign: Callable[[ParcelView, Any], List[int]]
+            picks the ids of the parcels filled into a train
 
-        unassigned_ids = set(self.parcels_data["ids"])
-        unassigned_parcels = self.parcels
+        Returns
+        -------
+        Mapping[int, List[int]]
+            the parcel ids assigned to each train id
+        """
+        self.parcels.reset()
+        # one list of the indexes left, compacted in place after each train
+        remaining = self.parcels.unassigned().indexes
+        unassigned_parcels = self.parcels.view(remaining)
+        index_by_id = dict(zip(self.parcels.ids, range(len(self.parcels))))
+        assigned = self.parcels.assigned
+        volumes = self.parcels.volumes
         i = 0
 
         assigned_by_train = {}
 
-        while i < len(selected_trains) and unassigned_ids:
+        while i < len(selected_trains) and remaining:
+            check_deadline(self.deadline)
             train = selected_trains[i]
-            assigned_parcel_ids = self._assign_parcels(
-                unassigned_parcels, train
-            )
+            parcels = unassigned_parcels
+            if self.bound_volume:
+                # skip the parcels too large for the train alone
+                parcels = self.parcels.view(
+                    [j for j in remaining if volumes[j] <= train.volume]
+                )
+            assigned_parcel_ids = assign(parcels, train)
             assigned_by_train[train.id] = assigned_parcel_ids
-            unassigned_ids = unassigned_ids - set(assigned_parcel_ids)
-            unassigned_parcels = [
-                p for p in self.parcels if p.id in unassigned_ids
-            ]
+
+            if assigned_parcel_ids:
+                for parcel_id in assigned_parcel_ids:
+                    assigned[index_by_id[parcel_id]] = 1
+                k = 0
+                for j in remaining:
+                    if not assigned[j]:
+                        remaining[k] = j
+                        k += 1
+                del remaining[k:]
             i += 1
 
+        return assigned_by_train
+
+    def process_residual(self) -> Mapping[int, List[int]]:
+        """Fill the parcels into all the trains, in order, without selecting
+        them. Used to pack new parcels into the capacity left in the trains
+        that are already filled but not booked yet.
+
+        Returns
+        -------
+        Mapping[int, List[int]]
+            the parcel ids assigned to each train id
+        """
+        self.bound_volume = True
+        with self.stats.timer("residual"):
+            assigned_by_train = self.strategy.fill_trains(
+                self, list(self.available_trains)
+            )
+
+        return {
+            train_id: parcel_ids
+            for (train_id, parcel_ids) in assigned_by_train.items()
+            if parcel_ids
+        }
+
+    def process(self) -> Tuple[Mapping[int, List[int]], float]:
+        """Start the assignment process."""
+
+        if self.deadline_ms is not None:
+            self.deadline = Deadline(self.deadline_ms)
+
+        with self.stats.timer("solve"):
+            assigned_by_train = self.strategy.solve(self)
+
         # cleaning the train that does not have any parcels
         assigned_by_train = {
             train_id: parcel_ids
@@ -288,4 +412,88 @@ class AssignmentService:
 
         total_costs = sum([t.cost for t in assigned_train])
 
+        if self.lower_bound is not None:
+            self.optimal = is_proven_optimal(self, assigned_by_train)
+            all_assigned = sum(map(len, assigned_by_train.values())) == len(
+                self.parcels
+            )
+            if all_assigned:
+                self.gap = (
+                    max(total_costs - self.lower_bound, 0) / total_costs
+                    if total_costs
+                    else 0
+                )
+
         return assigned_by_train, total_costs
+
+
+class AssignmentProblem(NamedTuple):
+    """The input of an assignment solved in the solver pool
+
+    Plain tuples, so building and scaling the service happens in the pool
+    instead of the event loop, and the input pickles cheaply.
+    """
+
+    trains: List[TrainItem]
+    parcels: List[ParcelItem]
+    # keyword arguments of `AssignmentService`
+    options: Mapping[str, Any]
+
+    @classmethod
+    def from_rows(
+        cls,
+        trains: Iterable[object],
+        parcels: Iterable[object],
+        **options: Any,
+    ) -> "AssignmentProblem":
+        """The problem of the train and parcel rows"""
+        return cls(
+            [TrainItem(t.id, t.weight, t.volume, t.cost) for t in trains],
+            [ParcelItem(p.id, p.weight, p.volume) for p in parcels],
+            options,
+        )
+
+
+def run_assignment(
+    problem: AssignmentProblem,
+) -> Tuple[Mapping[int, List[int]], float, PhaseStats, dict]:
+    """Build and process the assignment service of the problem
+
+    Returns
+    -------
+    Tuple[Mapping[int, List[int]], float, PhaseStats, dict]
+        the parcel ids assigned to each train id, the cost of the trains,
+        the stats of the solver and, with a deadline, the quality report
+        of the assignment (optimal, lower bound, gap)
+    """
+    service = AssignmentService(
+        problem.trains, problem.parcels, **problem.options
+    )
+    assigned_by_train, cost = service.process()
+
+    report = {}
+    if problem.options.get("deadline_ms") is not None:
+        report = dict(
+            optimal=service.optimal,
+            lower_bound=service.lower_bound,
+            gap=service.gap,
+        )
+
+    return assigned_by_train, cost, service.stats, report
+
+
+def run_residual_assignment(
+    problem: AssignmentProblem,
+) -> Tuple[Mapping[int, List[int]], PhaseStats]:
+    """Fill the residual capacity of the trains of the problem
+
+    Returns
+    -------
+    Tuple[Mapping[int, List[int]], PhaseStats]
+        the parcel ids assigned to each train id and the stats of the
+        solver
+    """
+    service = AssignmentService(
+        problem.trains, problem.parcels, **problem.options
+    )
+    return service.process_residual(), service.stats
@@ -0,0 +1,203 @@
+"""Weight and volume scaling
+
+This module converts the trains and parcels into the integer units used by
+the knapsack tables of the assignment service. The weights and volumes are
+divided by their greatest common divisor, so the size of the tables depends
+on the resolution of the problem instead of the unit they are posted in.
+
+With a precision, the values are first quantized to multiples of it. The
+parcels are rounded up and the train capacities are rounded down, so a
+scaled assignment never exceeds the real capacity of a train.
+
+The exact units of values like 0.30000000000000004 are tiny, the largest
+value would take ~10^17 columns of the tables. When the largest value
+takes more than `max_units` units, the values are quantized the same
+conservative way to `max_units` steps of the largest value.
+"""
+import math
+from dataclasses import dataclass
+from fractions import Fraction
+from functools import reduce
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+from app.services.batches import ParcelBatch, TrainFleet
+
+# the most units of the largest value, i.e. columns of the tables
+DEFAULT_MAX_UNITS = 1_000_000
+
+
+@dataclass
+class Scale:
+    """Integer units of one dimension (weight or volume)
+
+    A scaled value of `x` stands for `x * unit` in the original units.
+    """
+
+    unit: Fraction
+    parcels: List[int]
+    trains: List[int]
+
+
+@dataclass
+class ScaledProblem:
+    trains: TrainFleet
+    parcels: ParcelBatch
+    weight_unit: Fraction
+    volume_unit: Fraction
+
+    def table_dimensions(self) -> Mapping[str, Tuple[int, int]]:
+        """Size of the knapsack tables built for this problem
+
+        Returns
+        -------
+        Mapping[str, Tuple[int, int]]
+            (rows, columns) of the train selection table and the largest
+            parcel assignment table
+        """
+        total_parcel_weight = self.parcels.total_weight
+        max_train_weight = max(self.trains.weights, default=0)
+
+        return {
+            "select_trains": (
+                len(self.trains) + 1,
+                sum(self.trains.weights) + 1,
+            ),
+            "assign_parcels": (
+                len(self.parcels) + 1,
+                min(max_train_weight, total_parcel_weight) + 1,
+            ),
+        }
+
+
+def _to_fraction(value: float) -> Fraction:
+    # go through the decimal representation, 0.1 must stay 1/10
+    return Fraction(str(value))
+
+
+def _gcd(values: Iterable[int]) -> int:
+    return reduce(math.gcd, values, 0) or 1
+
+
+def scale_values(
+    parcel_values: List[float],
+    train_values: List[float],
+    precision: Optional[float] = None,
+    max_units: Optional[int] = DEFAULT_MAX_UNITS,
+) -> Scale:
+    """Convert one dimension of the parcels and trains to integer units
+
+    Parameters
+    ----------
+    parcel_values: List[float]
+        weights or volumes of the parcels
+    train_values: List[float]
+        capacities of the trains in the same dimension
+    precision: Optional[float]
+        quantization step. Parcels are rounded up and train capacities
+        are rounded down to a multiple of it. Without a precision, the
+        values are scaled exactly.
+    max_units: Optional[int]
+        the most units of the largest value, a coarser step is taken past
+        it. None never quantizes beyond the precision
+
+    Returns
+    -------
+    Scale
+        the integer values and the unit they are expressed in
+    """
+    parcel_fractions = [_to_fraction(v) for v in parcel_values]
+    train_fractions = [_to_fraction(v) for v in train_values]
+
+    if precision is not None:
+        if precision <= 0:
+            raise ValueError("precision must be greater than 0")
+
+        step = _to_fraction(precision)
+        exact = False
+    else:
+        step = Fraction(
+            1,
+            reduce(
+                math.lcm,
+                (v.denominator for v in parcel_fractions + train_fractions),
+                1,
+            ),
+        )
+        exact = True
+
+    largest = max(parcel_fractions + train_fractions, default=0)
+    if max_units is not None and largest / step > max_units:
+        step = largest / max_units
+        exact = False
+
+    if exact:
+        parcels = [int(v / step) for v in parcel_fractions]
+        trains = [int(v / step) for v in train_fractions]
+    else:
+        parcels = [math.ceil(v / step) for v in parcel_fractions]
+        trains = [math.floor(v / step) for v in train_fractions]
+
+    divisor = _gcd(parcels + trains)
+
+    return Scale(
+        unit=step * divisor,
+        parcels=[v // divisor for v in parcels],
+        trains=[v // divisor for v in trains],
+    )
+
+
+def scale_problem(
+    trains: List[object],
+    parcels: List[object],
+    weight_precision: Optional[float] = None,
+    volume_precision: Optional[float] = None,
+    max_units: Optional[int] = DEFAULT_MAX_UNITS,
+) -> ScaledProblem:
+    """Scale the trains and parcels to the integer units of the knapsack
+
+    Parameters
+    ----------
+    trains: List[object]
+        trains with id, weight, volume and cost
+    parcels: List[object]
+        parcels with id, weight and volume
+    weight_precision: Optional[float]
+        quantization step of the weights
+    volume_precision: Optional[float]
+        quantization step of the volumes
+    max_units: Optional[int]
+        the most units of the largest weight and of the largest volume
+
+    Returns
+    -------
+    ScaledProblem
+        the scaled trains and parcels, loaded as columns
+    """
+    weights = scale_values(
+        [p.weight for p in parcels],
+        [t.weight for t in trains],
+        precision=weight_precision,
+        max_units=max_units,
+    )
+    volumes = scale_values(
+        [p.volume for p in parcels],
+        [t.volume for t in trains],
+        precision=volume_precision,
+        max_units=max_units,
+    )
+
+    return ScaledProblem(
+        trains=TrainFleet(
+            ids=[t.id for t in trains],
+            weights=weights.trains,
+            volumes=volumes.trains,
+            costs=[t.cost for t in trains],
+        ),
+        parcels=ParcelBatch(
+            ids=[p.id for p in parcels],
+            weights=weights.parcels,
+            volumes=volumes.parcels,
+        ),
+        weight_unit=weights.unit,
+        volume_unit=volumes.unit,
+    )
@@ -0,0 +1,149 @@
+"""Sharded fill
+
+The trains of different lines never share parcels, so instead of one
+assignment over every available train, the sharded fill solves one
+assignment per train line: the trains are partitioned by `line_id` and
+the parcels, which have no line, are routed to the lines by a routing
+policy. The shards are solved in parallel and their assignments merged,
+the latency of the fill follows the largest shard instead of the whole
+network.
+
+New routing policies are added to the registry with
+`register_routing_policy`.
+"""
+import abc
+import heapq
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Type
+
+ROUTING_POLICIES: Dict[str, Type["RoutingPolicy"]] = {}
+
+
+def register_routing_policy(
+    name: str,
+) -> Callable[[Type["RoutingPolicy"]], Type["RoutingPolicy"]]:
+    """Register a routing policy class under the given name"""
+
+    def decorator(cls: Type["RoutingPolicy"]):
+        cls.name = name
+        ROUTING_POLICIES[name] = cls
+        return cls
+
+    return decorator
+
+
+def get_routing_policy(name: str) -> "RoutingPolicy":
+    """Create the routing policy registered under the given name"""
+    if name not in ROUTING_POLICIES:
+        raise ValueError(f"Unknown routing policy: {name}")
+
+    return ROUTING_POLICIES[name]()
+
+
+class Shard(NamedTuple):
+    # None for the trains without a line
+    line_id: Any
+    trains: List[object]
+    parcels: List[object]
+
+
+class RoutingPolicy(abc.ABC):
+    """Routes the parcels to the train lines"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def route(
+        self, parcels: List[object], lines: Mapping[Any, List[object]]
+    ) -> Mapping[Any, List[object]]:
+        """The parcels of every line
+
+        Parameters
+        ----------
+        parcels: List[object]
+            parcels with id, weight and volume
+        lines: Mapping[Any, List[object]]
+            the trains of every line, at least one line
+
+        Returns
+        -------
+        Mapping[Any, List[object]]
+            the parcels routed to every line
+        """
+
+
+@register_routing_policy("capacity")
+class CapacityRouting(RoutingPolicy):
+    """Heaviest parcels first, each to the line with the most weight left
+
+    The shards get parcels in proportion to the capacity of their trains,
+    so as few parcels as possible overflow their shard.
+    """
+
+    def route(
+        self, parcels: List[object], lines: Mapping[Any, List[object]]
+    ) -> Mapping[Any, List[object]]:
+        routed = {line_id: [] for line_id in lines}
+        # (-weight left, order, line), the order breaks the ties
+        heap = [
+            (-sum(t.weight for t in trains), i, line_id)
+            for i, (line_id, trains) in enumerate(lines.items())
+        ]
+        heapq.heapify(heap)
+
+        for parcel in sorted(parcels, key=lambda p: (-p.weight, p.id)):
+            left, i, line_id = heapq.heappop(heap)
+            routed[line_id].append(parcel)
+            heapq.heappush(heap, (left + parcel.weight, i, line_id))
+
+        return routed
+
+
+@register_routing_policy("hash")
+class HashRouting(RoutingPolicy):
+    """Parcel id modulo the number of lines
+
+    Cheap and stable: a parcel goes to the same line in every fill while
+    the lines do not change.
+    """
+
+    def route(
+        self, parcels: List[object], lines: Mapping[Any, List[object]]
+    ) -> Mapping[Any, List[object]]:
+        line_ids = list(lines)
+        routed = {line_id: [] for line_id in line_ids}
+        for parcel in parcels:
+            routed[line_ids[parcel.id % len(line_ids)]].append(parcel)
+
+        return routed
+
+
+def partition(
+    trains: List[object], parcels: List[object], policy: RoutingPolicy
+) -> List[Shard]:
+    """Partition the trains by line and route the parcels to the lines
+
+    Returns
+    -------
+    List[Shard]
+        one shard per line with trains, the trains without a line last
+    """
+    lines: Dict[Any, List[object]] = {}
+    for train in trains:
+        lines.setdefault(train.line_id, []).append(train)
+    if not lines:
+        return []
+
+    lines = {
+        line_id: lines[line_id]
+        for line_id in sorted(lines, key=lambda k: (k is None, k or 0))
+    }
+    routed = policy.route(parcels, lines)
+
+    return [
+        Shard(
+            line_id,
+            line_trains,
+            sorted(routed.get(line_id, []), key=lambda p: p.id),
+        )
+        for line_id, line_trains in lines.items()
+    ]
@@ -0,0 +1,125 @@
+"""Solution cache
+
+The fill is often called again on the same parcels and trains, e.g. a
+retry after a timeout or a preview followed by the actual fill. The
+solutions are cached under a fingerprint of the solver input, so solving
+the same input again is a lookup.
+"""
+import hashlib
+import pickle
+from collections import OrderedDict
+from typing import Any, Iterable, Mapping, Optional, Tuple
+
+from app.config import app_config
+
+
+def solution_fingerprint(
+    trains: Iterable[object],
+    parcels: Iterable[object],
+    options: Optional[Mapping[str, Any]] = None,
+) -> str:
+    """Canonical fingerprint of the input of a fill
+
+    Parameters
+    ----------
+    trains: Iterable[object]
+        trains with id, weight, volume and cost
+    parcels: Iterable[object]
+        parcels with id, weight and volume
+    options: Optional[Mapping[str, Any]]
+        options of the solver changing its result
+
+    Returns
+    -------
+    str
+        hex digest, the same for the same sets of trains and parcels
+    """
+    digest = hashlib.sha256()
+
+    for train in sorted((t.id, t.weight, t.volume, t.cost) for t in trains):
+        digest.update(b"T%r" % (train,))
+
+    for parcel in sorted((p.id, p.weight, p.volume) for p in parcels):
+        digest.update(b"P%r" % (parcel,))
+
+    for option in sorted((options or {}).items()):
+        digest.update(b"O%r" % (option,))
+
+    return digest.hexdigest()
+
+
+class SolutionCache:
+    """LRU cache of the fill solutions, bounded by entries and bytes
+
+    Parameters
+    ----------
+    max_entries: int
+        the most solutions kept, 0 disables the cache
+    max_bytes: int
+        the most bytes kept, measured on the pickled solutions
+    """
+
+    def __init__(
+        self, max_entries: int = 128, max_bytes: int = 64 * 1024 * 1024
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+
+        size = len(pickle.dumps(value))
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self.size -= self._entries.pop(key)[1]
+
+        self._entries[key] = (value, size)
+        self.size += size
+
+        while (
+            len(self._entries) > self.max_entries or self.size > self.max_bytes
+        ):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Mapping[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+solution_cache = SolutionCache(
+    max_entries=app_config.SOLUTION_CACHE_MAX_ENTRIES,
+    max_bytes=app_config.SOLUTION_CACHE_MAX_BYTES,
+)
@@ -0,0 +1,367 @@
+"""Assignment strategies
+
+The strategies decide how the assignment service selects the trains and
+fills them with parcels:
+
+- exact: the pseudo-polynomial knapsack DP, lowest cost
+- greedy: first-fit-decreasing packing, fastest
+- fptas: knapsack DP on rounded values, the cost is within a factor of
+  `epsilon` and the work does not depend on the capacities
+
+New strategies are added to the registry with `register_strategy`.
+
+With a deadline, the service wraps its strategy in an `AnytimeStrategy`
+that returns the best assignment found before the deadline.
+"""
+import math
+from functools import partial
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Type
+
+from app.services.batches import ParcelView
+from app.services.deadline import DeadlineExceeded
+from app.services.knapsack import knapsack_fptas
+from app.services.train_selection import select_min_cost_cover
+
+STRATEGIES: Dict[str, Type["AssignmentStrategy"]] = {}
+
+
+def register_strategy(
+    name: str,
+) -> Callable[[Type["AssignmentStrategy"]], Type["AssignmentStrategy"]]:
+    """Register an assignment strategy class under the given name"""
+
+    def decorator(cls: Type["AssignmentStrategy"]):
+        cls.name = name
+        STRATEGIES[name] = cls
+        return cls
+
+    return decorator
+
+
+def get_strategy(name: str, **options: Any) -> "AssignmentStrategy":
+    """Create the assignment strategy registered under the given name
+
+    Parameters
+    ----------
+    name: str
+        name of the registered strategy
+    options: Any
+        options of the strategy, e.g. epsilon
+
+    Returns
+    -------
+    AssignmentStrategy
+        the strategy
+    """
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown assignment strategy: {name}")
+
+    return STRATEGIES[name](**options)
+
+
+class AssignmentStrategy:
+    """Base strategy: select the trains, then fill them one by one"""
+
+    name: str = ""
+
+    def __init__(self, epsilon: float = 0.1) -> None:
+        # accepted relative loss of the approximate strategies
+        self.epsilon = epsilon
+
+    def select_trains(self, service: Any) -> List[object]:
+        return service._select_trains()
+
+    def assign_parcels(
+        self, service: Any, parcels: ParcelView, train: Any
+    ) -> List[int]:
+        return service._assign_parcels(parcels, train)
+
+    def solve(self, service: Any) -> Mapping[int, List[int]]:
+        """Assign the parcels of the service to its trains
+
+        Returns
+        -------
+        Mapping[int, List[int]]
+            the parcel ids assigned to each train id
+        """
+        return self.fill_trains(service, self._trains_to_fill(service))
+
+    def fill_trains(
+        self, service: Any, trains: List[object]
+    ) -> Mapping[int, List[int]]:
+        """Fill the given trains with the parcels of the service, in order
+
+        Returns
+        -------
+        Mapping[int, List[int]]
+            the parcel ids assigned to each train id
+        """
+        return service._fill_trains(
+            trains, partial(self.assign_parcels, service)
+        )
+
+    def _trains_to_fill(self, service: Any) -> List[object]:
+        # if there is only 1 train available, book it anyway
+        if len(service.available_trains) == 1:
+            return list(service.available_trains)
+
+        # select approriate trains
+        with service.stats.timer("select_trains"):
+            return self.select_trains(service)
+
+
+@register_strategy("exact")
+class ExactStrategy(AssignmentStrategy):
+    """Lowest cost cover of the trains and knapsack DP for every train"""
+
+
+@register_strategy("greedy")
+class GreedyStrategy(AssignmentStrategy):
+    """Cheapest trains per capacity first, then first-fit-decreasing"""
+
+    def select_trains(self, service: Any) -> List[object]:
+        W = service.total_parcel_weight
+        V = service.total_parcel_volume
+        trains = service.available_trains
+
+        def cost_per_capacity(train):
+            # share of the parcels the train can carry
+            capacity = train.weight / max(W, 1) + train.volume / max(V, 1)
+            return train.cost / capacity if capacity else math.inf
+
+        selected = []
+        weight = volume = 0
+        for train in sorted(trains, key=cost_per_capacity):
+            if weight >= W and volume >= V:
+                break
+            selected.append(train)
+            weight += train.weight
+            volume += train.volume
+
+        return selected
+
+    def fill_trains(
+        self, service: Any, trains: List[object]
+    ) -> Mapping[int, List[int]]:
+        residual = [[t.weight, t.volume] for t in trains]
+        assigned_by_train = {t.id: [] for t in trains}
+
+        parcels = sorted(
+            service.parcels, key=lambda p: (p.weight, p.volume), reverse=True
+        )
+        for parcel in parcels:
+            for train, capacity in zip(trains, residual):
+                if (
+                    parcel.weight <= capacity[0]
+                    and parcel.volume <= capacity[1]
+                ):
+                    assigned_by_train[train.id].append(parcel.id)
+                    capacity[0] -= parcel.weight
+                    capacity[1] -= parcel.volume
+                    break
+
+        return assigned_by_train
+
+
+@register_strategy("fptas")
+class FptasStrategy(AssignmentStrategy):
+    """Knapsack DP on values rounded by `epsilon`
+
+    The train selection rounds the train capacities down to a grid of
+    `epsilon * required / n`, so the selected trains still cover the
+    parcels. Every train is then filled with the FPTAS knapsack on the
+    parcel volumes and topped up with the parcels that still fit.
+    """
+
+    def select_trains(self, service: Any) -> List[object]:
+        W = service.total_parcel_weight
+        V = service.total_parcel_volume
+        trains = service.available_trains
+
+        if sum(trains.weights) <= W:
+            return list(trains)
+
+        n = len(trains)
+        weight_step = max(int(self.epsilon * W / n), 1)
+        volume_step = max(int(self.epsilon * V / n), 1)
+
+        cover = select_min_cost_cover(
+            weights=[w // weight_step for w in trains.weights],
+            volumes=[v // volume_step for v in trains.volumes],
+            costs=trains.costs,
+            min_weight=math.ceil(W / weight_step),
+            min_volume=math.ceil(V / volume_step),
+            max_states=service.max_selection_states,
+            deadline=service.deadline,
+        )
+
+        if cover is None:
+            return list(trains)
+
+        return trains.take(cover.indexes)
+
+    def assign_parcels(
+        self, service: Any, parcels: ParcelView, train: Any
+    ) -> List[int]:
+        ids = parcels.ids
+        weights = parcels.weights
+        volumes = parcels.volumes
+
+        if sum(weights) <= train.weight and sum(volumes) <= train.volume:
+            return list(ids)
+
+        indexes = knapsack_fptas(
+            weights=weights,
+            values=volumes,
+            capacity=train.weight,
+            epsilon=self.epsilon,
+            deadline=service.deadline,
+        )
+
+        # the knapsack only bounds the weight, drop the parcels overflowing
+        # the volume of the train
+        volume_left = train.volume if service.bound_volume else math.inf
+        fitting = []
+        for i in indexes:
+            if volumes[i] <= volume_left:
+                fitting.append(i)
+                volume_left -= volumes[i]
+        indexes = fitting
+
+        # top up with the parcels rounded away or left by the approximation
+        residual = train.weight - sum(weights[i] for i in indexes)
+        selected = set(indexes)
+        for i, weight in enumerate(weights):
+            if (
+                i not in selected
+                and weight <= residual
+                and volumes[i] <= volume_left
+            ):
+                indexes.append(i)
+                residual -= weight
+                volume_left -= volumes[i]
+
+        return [ids[i] for i in indexes]
+
+
+class AnytimeStrategy(AssignmentStrategy):
+    """Improve the assignment until the deadline of the service passes
+
+    The greedy assignment is computed first, then the fptas strategy with a
+    decreasing epsilon and finally the target strategy. Every stage stops
+    when the deadline passes and the best assignment found is returned.
+    The stages also stop once the assignment reaches the lower bound of
+    the cost.
+    """
+
+    def __init__(self, target: AssignmentStrategy) -> None:
+        super().__init__(epsilon=target.epsilon)
+        self.target = target
+
+    def stages(self) -> List[AssignmentStrategy]:
+        if isinstance(self.target, GreedyStrategy):
+            return [self.target]
+
+        stages = [GreedyStrategy()]
+        for epsilon in (0.5, 0.2):
+            if epsilon > self.epsilon:
+                stages.append(FptasStrategy(epsilon=epsilon))
+        stages.append(self.target)
+
+        return stages
+
+    def solve(self, service: Any) -> Mapping[int, List[int]]:
+        best = None
+        service.lower_bound = fractional_lower_bound(service)
+
+        for i, stage in enumerate(self.stages()):
+            try:
+                result = stage.solve(service)
+            except DeadlineExceeded:
+                break
+
+            if best is None or _score(service, result) < _score(service, best):
+                best = result
+
+            if i == 0:
+                service.lower_bound = max(
+                    service.lower_bound, cover_lower_bound(service)
+                )
+
+            if is_proven_optimal(service, best):
+                break
+
+        return best or {}
+
+
+def _score(
+    service: Any, assigned_by_train: Mapping[int, List[int]]
+) -> Tuple[int, float]:
+    """Lower is better: most parcels assigned first, then lowest cost"""
+    trains = service.available_trains
+    costs = dict(zip(trains.ids, trains.costs))
+    assigned = 0
+    cost = 0
+    for train_id, parcel_ids in assigned_by_train.items():
+        if parcel_ids:
+            assigned += len(parcel_ids)
+            cost += costs[train_id]
+
+    return -assigned, cost
+
+
+def is_proven_optimal(
+    service: Any, assigned_by_train: Mapping[int, List[int]]
+) -> bool:
+    """All the parcels are assigned at the lower bound of the cost"""
+    negative_assigned, cost = _score(service, assigned_by_train)
+    return (
+        -negative_assigned == len(service.parcels)
+        and service.lower_bound is not None
+        and cost <= service.lower_bound + 1e-9
+    )
+
+
+def fractional_lower_bound(service: Any) -> float:
+    """Lowest cost of carrying all the parcels when the trains can be
+    booked partially, which bounds the cost of any full assignment
+
+    Only the weight is used as every strategy respects the train weights.
+    """
+    required = service.total_parcel_weight
+    bound = 0
+    trains = sorted(
+        (t for t in service.available_trains if t.weight > 0),
+        key=lambda t: t.cost / t.weight,
+    )
+    for train in trains:
+        if required <= 0:
+            break
+        share = min(train.weight, required)
+        bound += train.cost * share / train.weight
+        required -= share
+
+    return bound
+
+
+def cover_lower_bound(service: Any) -> float:
+    """Lowest cost of the trains that can carry the weight of all the
+    parcels, or 0 when it cannot be computed before the deadline"""
+    trains = service.available_trains
+    try:
+        cover = select_min_cost_cover(
+            weights=trains.weights,
+            volumes=[0] * len(trains),
+            costs=trains.costs,
+            min_weight=service.total_parcel_weight,
+            min_volume=0,
+            max_states=service.max_selection_states,
+            deadline=service.deadline,
+        )
+    except DeadlineExceeded:
+        return 0
+
+    if cover is None or not cover.exact:
+        return 0
+
+    return cover.cost
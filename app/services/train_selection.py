@@ -0,0 +1,186 @@
+"""Train selection
+
+This module finds the set of trains with the lowest total cost whose total
+weight and total volume both cover the parcels, in a single pass.
+
+The DP walks through the trains and keeps, for every reachable
+(weight, volume) state, the cheapest way to reach it. Weights and volumes
+are capped at the required totals and the states that are dominated by a
+cheaper state covering at least as much are dropped, so only the Pareto
+front is carried from one train to the next.
+"""
+import math
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.services.deadline import Deadline, check_deadline
+
+DEFAULT_MAX_STATES = 100_000
+
+# (train index, parent label) linked list of the selected trains
+Label = Optional[Tuple[int, "Label"]]
+States = Dict[Tuple[int, int], Tuple[float, Label]]
+
+
+class CoverResult(NamedTuple):
+    indexes: List[int]
+    cost: float
+    # False when the frontier had to be thinned to respect max_states
+    exact: bool
+    # largest frontier carried from one train to the next
+    states: int = 0
+
+
+def _prune(
+    states: States,
+    max_states: int,
+) -> Tuple[States, bool]:
+    """Keep the Pareto front of the states
+
+    Returns
+    -------
+    Tuple[States, bool]
+        the kept states and whether the front was thinned
+    """
+    ordered = sorted(
+        states.items(),
+        key=lambda item: (item[1][0], -item[0][0], -item[0][1]),
+    )
+
+    kept = {}
+    # staircase of the kept states: weights ascending, volumes descending
+    stair_w = []
+    stair_v = []
+
+    for (w, v), value in ordered:
+        j = bisect_left(stair_w, w)
+        # a cheaper state already covers at least as much
+        if j < len(stair_w) and stair_v[j] >= v:
+            continue
+
+        kept[(w, v)] = value
+
+        start = j
+        while start > 0 and stair_v[start - 1] <= v:
+            start -= 1
+        end = j + 1 if j < len(stair_w) and stair_w[j] == w else j
+        stair_w[start:end] = [w]
+        stair_v[start:end] = [v]
+
+    if len(kept) <= max_states:
+        return kept, False
+
+    # too many states, keep the cheapest state of every cell of a grid
+    # laid over the (weight, volume) plane
+    grid = max(math.isqrt(max_states), 1)
+    max_w = max(w for w, _ in kept) + 1
+    max_v = max(v for _, v in kept) + 1
+
+    # the state covering the most always stays, so a cover is still found
+    # whenever all the trains together can carry the parcels
+    widest = max(kept, key=lambda state: state[0] * max_v + state[1] * max_w)
+    thinned = {widest: kept[widest]}
+    buckets = {(widest[0] * grid // max_w, widest[1] * grid // max_v)}
+
+    for (w, v), value in kept.items():
+        bucket = (w * grid // max_w, v * grid // max_v)
+        if bucket in buckets:
+            continue
+        buckets.add(bucket)
+        thinned[(w, v)] = value
+
+    return thinned, True
+
+
+def select_min_cost_cover(
+    weights: List[int],
+    volumes: List[int],
+    costs: List[float],
+    min_weight: int,
+    min_volume: int,
+    max_states: int = DEFAULT_MAX_STATES,
+    deadline: Optional[Deadline] = None,
+) -> Optional[CoverResult]:
+    """Find the cheapest trains covering the required weight and volume
+
+    Parameters
+    ----------
+    weights: List[int]
+        weights of the trains
+    volumes: List[int]
+        volumes of the trains
+    costs: List[float]
+        costs of the trains
+    min_weight: int
+        the total weight the selected trains must reach
+    min_volume: int
+        the total volume the selected trains must reach
+    max_states: int
+        upper bound of the states kept between two trains. The work is
+        bounded by O(n * max_states * log(max_states)); when the bound is
+        hit, the result is feasible but may not be the cheapest.
+    deadline: Optional[Deadline]
+        stop with `DeadlineExceeded` once it has passed
+
+    Returns
+    -------
+    Optional[CoverResult]
+        the indexes of the selected trains in descending order, or None
+        when all the trains together cannot cover the parcels
+    """
+    if min_weight <= 0 and min_volume <= 0:
+        return CoverResult(indexes=[], cost=0, exact=True)
+
+    min_weight = max(min_weight, 0)
+    min_volume = max(min_volume, 0)
+
+    frontier: States = {(0, 0): (0, None)}
+    best: Optional[Tuple[float, Label]] = None
+    exact = True
+    peak_states = 1
+
+    for i in range(len(weights)):
+        check_deadline(deadline)
+        states = dict(frontier)
+
+        for (w, v), (cost, label) in frontier.items():
+            new_cost = cost + costs[i]
+            # cannot beat the best cover found so far
+            if best is not None and new_cost >= best[0]:
+                continue
+
+            new_w = min(w + weights[i], min_weight)
+            new_v = min(v + volumes[i], min_volume)
+            new_label = (i, label)
+
+            if new_w >= min_weight and new_v >= min_volume:
+                best = (new_cost, new_label)
+                continue
+
+            current = states.get((new_w, new_v))
+            if current is None or new_cost < current[0]:
+                states[(new_w, new_v)] = (new_cost, new_label)
+
+        if best is not None:
+            states = {
+                key: value
+                for key, value in states.items()
+                if value[0] < best[0]
+            }
+
+        frontier, thinned = _prune(states, max_states)
+        exact = exact and not thinned
+        peak_states = max(peak_states, len(frontier))
+
+    if best is None:
+        return None
+
+    cost, label = best
+    indexes = []
+    while label is not None:
+        index, label = label
+        indexes.append(index)
+
+    return CoverResult(
+        indexes=indexes, cost=cost, exact=exact, states=peak_states
+    )
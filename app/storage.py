@@ -0,0 +1,124 @@
+"""SQLite storage profile
+
+The pragmas of the `SQLITE_*` configs are applied on every connection,
+the ones of the sync engine through its connect event and the ones of
+`databases` through the connection factory of sqlite3.
+"""
+import logging
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import app_config
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_MODES = ("passive", "full", "restart", "truncate")
+
+
+def storage_pragmas() -> List[Tuple[str, Any]]:
+    """The pragmas of the configured profile, in the order they are set"""
+    cache_size = app_config.SQLITE_CACHE_SIZE_KIB
+    pragmas = [
+        # first, so the other pragmas wait for the locks
+        ("busy_timeout", app_config.SQLITE_BUSY_TIMEOUT_MS),
+        ("journal_mode", app_config.SQLITE_JOURNAL_MODE),
+        ("synchronous", app_config.SQLITE_SYNCHRONOUS),
+        # a negative cache size is in KiB instead of pages
+        ("cache_size", -cache_size if cache_size is not None else None),
+        ("mmap_size", app_config.SQLITE_MMAP_SIZE),
+        ("temp_store", app_config.SQLITE_TEMP_STORE),
+        ("wal_autocheckpoint", app_config.SQLITE_WAL_AUTOCHECKPOINT),
+    ]
+
+    return [(name, value) for name, value in pragmas if value is not None]
+
+
+def apply_pragmas(connection: Any) -> None:
+    cursor = connection.cursor()
+    try:
+        for name, value in storage_pragmas():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3 connection applying the storage profile when it opens"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        apply_pragmas(self)
+
+
+# what SQLite reports for the values set by name
+_REPORTED = {
+    "synchronous": {"off": 0, "normal": 1, "full": 2, "extra": 3},
+    "temp_store": {"default": 0, "file": 1, "memory": 2},
+}
+
+
+def verify_storage_profile(
+    connection: Any,
+) -> Dict[str, Dict[str, Any]]:
+    """Read the effective settings back and warn about the ignored ones
+
+    e.g. an in-memory database cannot use the WAL and the memory map can
+    be capped by the SQLite build.
+
+    Returns
+    -------
+    Dict[str, Dict[str, Any]]
+        the configured and effective value of every pragma
+    """
+    report = {}
+    for name, value in storage_pragmas():
+        # no value at all when the pragma does not apply to the database
+        row = _pragma(connection, f"PRAGMA {name}")
+        effective = row[0] if row else None
+        if isinstance(effective, str):
+            effective, expected = effective.lower(), str(value).lower()
+        else:
+            expected = _REPORTED.get(name, {}).get(str(value).lower(), value)
+
+        report[name] = {"configured": value, "effective": effective}
+        if effective != expected:
+            logger.warning(
+                "SQLite %s is %s instead of %s", name, effective, value
+            )
+
+    logger.info(
+        "SQLite storage profile: %s",
+        ", ".join(f"{k}={v['effective']}" for k, v in report.items()),
+    )
+    return report
+
+
+def checkpoint(
+    connection: Any, mode: Optional[str] = None
+) -> Optional[Tuple[int, int, int]]:
+    """Checkpoint the WAL into the database
+
+    Returns
+    -------
+    Optional[Tuple[int, int, int]]
+        busy flag, pages in the WAL and pages checkpointed, None without a
+        checkpoint mode
+    """
+    mode = mode or app_config.SQLITE_SHUTDOWN_CHECKPOINT
+    if mode is None:
+        return None
+
+    if mode.lower() not in CHECKPOINT_MODES:
+        raise ValueError(f"Unknown checkpoint mode: {mode}")
+
+    sql = f"PRAGMA wal_checkpoint({mode.upper()})"
+    return tuple(_pragma(connection, sql))
+
+
+def _pragma(connection: Any, sql: str) -> tuple:
+    # through a cursor, so a pooled connection of the engine works too
+    cursor = connection.cursor()
+    try:
+        return cursor.execute(sql).fetchone()
+    finally:
+        cursor.close()
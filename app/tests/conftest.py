@@ -7,6 +7,7 @@ from httpx import AsyncClient
 
 from app.db import Parcel, Train, TrainLine, database
 from app.main import app
+from app.services.occupancy import line_occupancy
 
 
 @pytest.fixture(scope="session")
@@ -22,6 +23,8 @@ def client() -> Generator:
 @pytest.fixture(autouse=True)
 async def db() -> AsyncGenerator:
     await database.connect()
+    # the bookings of the other tests are rolled back
+    line_occupancy.reset()
     yield
     await database.disconnect()
 
@@ -0,0 +1,221 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Callable
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+
+from app.db import FillJob, Parcel, Train, database
+from app.routers.parcel import run_fill
+from app.services.fill_jobs import FillJobQueue
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def queue():
+    queue = FillJobQueue(max_queued=2)
+    with patch("app.routers.parcel.fill_job_queue", queue):
+        yield queue
+    await queue.stop()
+
+
+@pytest.fixture
+async def parcels(sample_train: Callable, sample_parcel: Callable):
+    await sample_train(
+        {
+            "name": "Percy",
+            "cost": 120.0,
+            "weight": 500.0,
+            "volume": 20.0,
+            "ready_to_book": False,
+        }
+    )
+    for weight in (200.0, 250.0):
+        await sample_parcel({"weight": weight, "volume": 5.0})
+
+
+async def test_background_fill(
+    async_client: AsyncClient, queue: FillJobQueue, parcels
+):
+    await queue.start(run_fill)
+
+    resp = await async_client.post(
+        "/parcels/fill", params={"background": True}
+    )
+    job = resp.json()
+
+    assert resp.status_code == 202
+    assert resp.headers["location"] == f"/fill-jobs/{job['id']}"
+    assert job["state"] == "queued"
+
+    await queue.join()
+    resp = await async_client.get(f"/fill-jobs/{job['id']}")
+    job = resp.json()
+
+    assert resp.status_code == 200
+    assert job["state"] == "done"
+    assert job["progress"] == 1
+    assert job["result"]["assigned_items"] == 2
+    assert job["result"]["total_cost"] == 120.0
+    assert job["started_at"] is not None
+    assert job["finished_at"] is not None
+
+    assigned = await database.fetch_all(
+        Parcel.select().where(Parcel.c.train_id != None)
+    )
+    train = await database.fetch_one(Train.select())
+    assert len(assigned) == 2
+    assert train.ready_to_book is True
+
+
+async def test_background_fill__params(
+    async_client: AsyncClient, queue: FillJobQueue, parcels
+):
+    await queue.start(run_fill)
+
+    resp = await async_client.post(
+        "/parcels/fill",
+        params={"background": True, "preview": True, "debug": True},
+    )
+    await queue.join()
+    job = (await async_client.get(f"/fill-jobs/{resp.json()['id']}")).json()
+
+    assert job["result"]["assigned_items"] == 2
+    assert "solve" in job["result"]["debug"]["timings_ms"]
+    # a preview saves nothing
+    assigned = await database.fetch_all(
+        Parcel.select().where(Parcel.c.train_id != None)
+    )
+    assert assigned == []
+
+
+async def test_background_fill__progress(queue: FillJobQueue, parcels):
+    phases = []
+
+    async def runner(progress, **params):
+        result = await run_fill(progress=progress, **params)
+        job = await database.fetch_one(FillJob.select())
+        phases.append((job.state, job.phase, job.progress))
+        return result
+
+    await queue.start(runner)
+    await queue.enqueue(dict(strategy="exact"))
+    await queue.join()
+
+    assert phases == [("running", "update", 0.9)]
+
+
+async def test_background_fill__failed(
+    async_client: AsyncClient, queue: FillJobQueue
+):
+    async def runner(progress, **params):
+        raise ValueError("no trains")
+
+    await queue.start(runner)
+    job = await queue.enqueue(dict(strategy="exact"))
+    await queue.join()
+
+    job = (await async_client.get(f"/fill-jobs/{job.id}")).json()
+    assert job["state"] == "failed"
+    assert job["error"] == "no trains"
+    assert job["result"] is None
+
+
+async def test_background_fill__queue_full(
+    async_client: AsyncClient, queue: FillJobQueue
+):
+    # no worker, the jobs stay queued
+    for _ in range(2):
+        resp = await async_client.post(
+            "/parcels/fill", params={"background": True}
+        )
+        assert resp.status_code == 202
+
+    resp = await async_client.post(
+        "/parcels/fill", params={"background": True}
+    )
+    assert resp.status_code == 503
+
+
+async def test_pending_jobs_run_at_start(queue: FillJobQueue, parcels):
+    job = await queue.enqueue(dict(strategy="exact"))
+
+    await queue.start(run_fill)
+    await queue.join()
+
+    job = await database.fetch_one(
+        FillJob.select().where(FillJob.c.id == job.id)
+    )
+    assert job.state == "done"
+
+
+async def test_running_jobs_of_live_workers_not_queued_again(parcels):
+    first = FillJobQueue()
+    second = FillJobQueue()
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def runner(progress, **params):
+        started.set()
+        await release.wait()
+        return dict(assigned_items=0, total_cost=0)
+
+    await first.start(runner)
+    live = await first.enqueue(dict(strategy="exact"))
+    await started.wait()
+    # left running by a worker which died
+    dead = await database.execute(
+        FillJob.insert().values(
+            state="running",
+            progress=0.1,
+            params=dict(strategy="exact"),
+            created_at=datetime.utcnow(),
+            worker_id="dead",
+            heartbeat_at=datetime.utcnow() - timedelta(minutes=5),
+        )
+    )
+
+    await second.start(run_fill)
+    await second.join()
+    jobs = {job.id: job for job in await database.fetch_all(FillJob.select())}
+
+    assert jobs[live.id].state == "running"
+    assert jobs[live.id].worker_id == first.worker_id
+    assert jobs[dead].state == "done"
+    assert jobs[dead].worker_id == second.worker_id
+
+    release.set()
+    await first.join()
+    await first.stop()
+    await second.stop()
+
+    job = await database.fetch_one(
+        FillJob.select().where(FillJob.c.id == live.id)
+    )
+    assert job.state == "done"
+
+
+async def test_heartbeat_renews_the_lease(parcels):
+    queue = FillJobQueue(lease_seconds=0.03)
+    heartbeats = []
+
+    async def runner(progress, **params):
+        for _ in range(3):
+            await asyncio.sleep(0.02)
+            job = await database.fetch_one(FillJob.select())
+            heartbeats.append(job.heartbeat_at)
+        return dict(assigned_items=0, total_cost=0)
+
+    await queue.start(runner)
+    await queue.enqueue(dict(strategy="exact"))
+    await queue.join()
+    await queue.stop()
+
+    assert heartbeats[-1] > heartbeats[0]
+
+
+async def test_fill_job_not_found(async_client: AsyncClient):
+    resp = await async_client.get("/fill-jobs/999")
+
+    assert resp.status_code == 404
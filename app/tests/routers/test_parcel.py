@@ -1,4 +1,6 @@
-from datetime import datetime
+import json
+import threading
+from datetime import datetime, timedelta
 from typing import Callable
 from unittest.mock import Mock, patch
 
@@ -6,6 +8,17 @@ import pytest
 from httpx import AsyncClient
 
 from app.db import Parcel, Train, database
+from app.routers import parcel as parcel_router
+from app.services.executor import SolverExecutor
+from app.services.manifest import ManifestError, ManifestRow
+from app.services.metrics import PhaseStats
+from app.services.occupancy import line_occupancy
+from app.services.parcel_assignment import (
+    AssignmentService,
+    run_assignment,
+)
+from app.services.sharding import ROUTING_POLICIES, RoutingPolicy
+from app.services.solution_cache import SolutionCache
 
 
 @pytest.mark.anyio
@@ -59,7 +72,7 @@ async def test_get_all_parcels(
 
 
 @pytest.mark.anyio
-@patch("app.routers.parcel.AssignmentService")
+@patch("app.services.parcel_assignment.AssignmentService")
 async def test_fill_all_parcels(
     mock_svc: Mock,
     async_client: AsyncClient,
@@ -107,6 +120,7 @@ async def test_fill_all_parcels(
     )
 
     # mock_svc.configure_mock(**{'process.return_value': ({train2.id: [parcel1.id, parcel2.id]}, 100.0)})
+    mock_svc().stats = PhaseStats()
     mock_svc().process.return_value = {
         train2.id: [parcel1.id, parcel2.id]
     }, 100.0
@@ -125,3 +139,926 @@ async def test_fill_all_parcels(
     assert len(parcels) == 2
 
     assert updated_train.ready_to_book is True
+
+
+@pytest.mark.anyio
+@patch("app.services.parcel_assignment.AssignmentService")
+async def test_fill_parcels__strategy(
+    mock_svc: Mock,
+    async_client: AsyncClient,
+):
+    mock_svc().stats = PhaseStats()
+    mock_svc().process.return_value = {}, 0.0
+    resp = await async_client.post(
+        "/parcels/fill", params={"strategy": "fptas", "epsilon": 0.25}
+    )
+
+    assert resp.status_code == 200
+    assert mock_svc.call_args.kwargs["strategy"] == "fptas"
+    assert mock_svc.call_args.kwargs["epsilon"] == 0.25
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__service_built_in_pool(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+):
+    await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 100.00,
+            "weight": 20.00,
+            "volume": 5.00,
+            "ready_to_book": False,
+        }
+    )
+    await sample_parcel({"weight": 5.00, "volume": 2.00})
+    threads = []
+
+    def build(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return AssignmentService(*args, **kwargs)
+
+    executor = SolverExecutor(kind="thread", max_workers=1)
+    with patch("app.routers.parcel.solver_executor", executor), patch(
+        "app.services.parcel_assignment.AssignmentService", side_effect=build
+    ):
+        resp = await async_client.post("/parcels/fill")
+    executor.shutdown()
+
+    assert resp.json()["assigned_items"] == 1
+    # scaled in the pool, not in the event loop
+    assert threads and threading.main_thread() not in threads
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__unknown_strategy(async_client: AsyncClient):
+    resp = await async_client.post(
+        "/parcels/fill", params={"strategy": "random"}
+    )
+
+    assert resp.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__deadline(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+):
+    await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 100.00,
+            "weight": 20.00,
+            "volume": 5.00,
+            "ready_to_book": False,
+        }
+    )
+    await sample_parcel({"weight": 5.00, "volume": 2.00})
+    await sample_parcel({"weight": 10.00, "volume": 2.00})
+
+    resp = await async_client.post(
+        "/parcels/fill", params={"deadline_ms": 5000}
+    )
+    data = resp.json()
+
+    assert resp.status_code == 200
+    assert data["assigned_items"] == 2
+    assert data["total_cost"] == 100.00
+    assert data["optimal"] is True
+    assert data["gap"] == 0
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__incremental(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+):
+    filled_train = await sample_train(
+        {
+            "name": "Percy",
+            "cost": 120.00,
+            "weight": 20.00,
+            "volume": 10.00,
+            "ready_to_book": True,
+            "booked_at": None,
+        }
+    )
+    new_train = await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 50.00,
+            "weight": 10.00,
+            "volume": 10.00,
+            "ready_to_book": False,
+            "booked_at": None,
+        }
+    )
+    unused_train = await sample_train(
+        {
+            "name": "Gordon",
+            "cost": 500.00,
+            "weight": 100.00,
+            "volume": 100.00,
+            "ready_to_book": False,
+            "booked_at": None,
+        }
+    )
+    await sample_parcel(
+        {"weight": 10.00, "volume": 2.00, "train_id": filled_train.id}
+    )
+    parcel1 = await sample_parcel({"weight": 5.00, "volume": 1.00})
+    parcel2 = await sample_parcel({"weight": 8.00, "volume": 2.00})
+
+    resp = await async_client.post(
+        "/parcels/fill", params={"incremental": True}
+    )
+    data = resp.json()
+
+    assert resp.status_code == 200
+    assert data["assigned_items"] == 2
+    assert data["total_cost"] == 50.00
+
+    parcels = {
+        p.id: p.train_id
+        for p in await database.fetch_all(
+            Parcel.select().where(Parcel.c.id.in_([parcel1.id, parcel2.id]))
+        )
+    }
+    assert parcels == {parcel1.id: new_train.id, parcel2.id: filled_train.id}
+
+    trains = {
+        t.id: t.ready_to_book for t in await database.fetch_all(Train.select())
+    }
+    assert trains[new_train.id] is True
+    assert trains[unused_train.id] is False
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__incremental_volume_left(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+):
+    # weight left but no volume left
+    filled_train = await sample_train(
+        {
+            "name": "Percy",
+            "cost": 120.00,
+            "weight": 100.00,
+            "volume": 2.00,
+            "ready_to_book": True,
+            "booked_at": None,
+        }
+    )
+    new_train = await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 50.00,
+            "weight": 10.00,
+            "volume": 10.00,
+            "ready_to_book": False,
+            "booked_at": None,
+        }
+    )
+    await sample_parcel(
+        {"weight": 10.00, "volume": 2.00, "train_id": filled_train.id}
+    )
+    parcel = await sample_parcel({"weight": 5.00, "volume": 1.00})
+
+    resp = await async_client.post(
+        "/parcels/fill", params={"incremental": True}
+    )
+
+    assert resp.status_code == 200
+    assert resp.json()["assigned_items"] == 1
+    stored = await database.fetch_one(
+        Parcel.select().where(Parcel.c.id == parcel.id)
+    )
+    assert stored.train_id == new_train.id
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__float_noise(
+    async_client: AsyncClient, sample_train: Callable
+):
+    await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 100.00,
+            "weight": 1000.00,
+            "volume": 1000.00,
+            "ready_to_book": False,
+        }
+    )
+    for weight in (0.30000000000000004, 5):
+        resp = await async_client.post(
+            "/parcels", json={"weight": weight, "volume": 0.1 + 0.2}
+        )
+        assert resp.status_code == 201
+
+    resp = await async_client.post("/parcels/fill")
+
+    assert resp.status_code == 200
+    assert resp.json()["assigned_items"] == 2
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__unit_overflow(
+    async_client: AsyncClient, sample_parcel: Callable, sample_train: Callable
+):
+    await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 100.00,
+            "weight": 1000.00,
+            "volume": 1.00,
+            "ready_to_book": False,
+        }
+    )
+    await sample_parcel({"weight": 0.30000000000000004, "volume": 1.00})
+    await sample_parcel({"weight": 5.00, "volume": 1.00})
+
+    # without the bound of the units
+    with patch.object(parcel_router.app_config, "SCALE_MAX_UNITS", None):
+        resp = await async_client.post("/parcels/fill")
+
+    assert resp.status_code == 422
+    assert "64-bit" in resp.json()["detail"]
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__preview_cached(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+):
+    train = await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 100.00,
+            "weight": 20.00,
+            "volume": 5.00,
+            "ready_to_book": False,
+        }
+    )
+    parcel = await sample_parcel({"weight": 5.00, "volume": 2.00})
+
+    with patch(
+        "app.routers.parcel.solution_cache", SolutionCache(max_entries=8)
+    ) as cache, patch(
+        "app.routers.parcel.run_assignment", wraps=run_assignment
+    ) as mock_run:
+        preview = await async_client.post(
+            "/parcels/fill", params={"preview": True}
+        )
+        stored = await database.fetch_one(
+            Parcel.select().where(Parcel.c.id == parcel.id)
+        )
+        assert stored.train_id is None
+
+        resp = await async_client.post("/parcels/fill")
+
+    assert preview.json() == resp.json()
+    assert resp.json()["assigned_items"] == 1
+    assert mock_run.call_count == 1
+    assert cache.hits == 1
+
+    stored = await database.fetch_one(
+        Parcel.select().where(Parcel.c.id == parcel.id)
+    )
+    assert stored.train_id == train.id
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__not_optimal_not_cached(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+):
+    for name, cost in (("Thomas", 100.00), ("Percy", 50.00)):
+        await sample_train(
+            {
+                "name": name,
+                "cost": cost,
+                "weight": 20.00,
+                "volume": 5.00,
+                "ready_to_book": False,
+            }
+        )
+    for weight in (5.00, 10.00, 12.00):
+        await sample_parcel({"weight": weight, "volume": 2.00})
+
+    with patch(
+        "app.routers.parcel.solution_cache", SolutionCache(max_entries=8)
+    ) as cache, patch(
+        "app.routers.parcel.run_assignment", wraps=run_assignment
+    ) as mock_run:
+        for _ in range(2):
+            resp = await async_client.post(
+                "/parcels/fill",
+                params={"deadline_ms": 1e-6, "preview": True},
+            )
+            assert resp.json()["optimal"] is False
+
+    assert mock_run.call_count == 2
+    assert cache.hits == 0
+    assert len(cache) == 0
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__debug(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+):
+    await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 100.00,
+            "weight": 10.00,
+            "volume": 5.00,
+            "ready_to_book": False,
+        }
+    )
+    await sample_train(
+        {
+            "name": "Percy",
+            "cost": 50.00,
+            "weight": 8.00,
+            "volume": 5.00,
+            "ready_to_book": False,
+        }
+    )
+    await sample_parcel({"weight": 5.00, "volume": 2.00})
+    await sample_parcel({"weight": 4.00, "volume": 2.00})
+
+    resp = await async_client.post("/parcels/fill", params={"debug": True})
+    debug = resp.json()["debug"]
+
+    assert {"fetch", "solve", "select_trains", "update"} <= set(
+        debug["timings_ms"]
+    )
+    assert debug["counters"]["parcels"] == 2
+    assert debug["counters"]["trains"] == 2
+    # 2 parcels and 2 trains marked as ready to book
+    assert debug["counters"]["rows_updated"] == 4
+
+    resp = await async_client.post("/parcels/fill")
+    assert resp.json()["debug"] is None
+
+
+@pytest.mark.anyio
+async def test_get_parcels__pagination(
+    async_client: AsyncClient, sample_parcel: Callable
+):
+    parcels = [
+        await sample_parcel({"weight": 1.00 + i, "volume": 1.00})
+        for i in range(5)
+    ]
+
+    resp = await async_client.get("/parcels", params={"limit": 2})
+    assert [p["id"] for p in resp.json()] == [p.id for p in parcels[:2]]
+    cursor = resp.headers["X-Next-Cursor"]
+    assert cursor == str(parcels[1].id)
+
+    resp = await async_client.get(
+        "/parcels", params={"limit": 2, "after_id": cursor}
+    )
+    assert [p["id"] for p in resp.json()] == [p.id for p in parcels[2:4]]
+
+    resp = await async_client.get(
+        "/parcels", params={"limit": 2, "after_id": parcels[3].id}
+    )
+    assert [p["id"] for p in resp.json()] == [parcels[4].id]
+    assert "X-Next-Cursor" not in resp.headers
+
+
+@pytest.mark.anyio
+async def test_get_parcels__filters(
+    async_client: AsyncClient, sample_parcel: Callable, sample_train: Callable
+):
+    train = await sample_train(
+        {"name": "Thomas", "cost": 1.00, "weight": 10.00, "volume": 10.00}
+    )
+    assigned = await sample_parcel(
+        {"weight": 1.00, "volume": 1.00, "train_id": train.id}
+    )
+    unassigned = await sample_parcel({"weight": 1.00, "volume": 1.00})
+
+    resp = await async_client.get("/parcels", params={"unassigned": True})
+    assert [p["id"] for p in resp.json()] == [unassigned.id]
+
+    resp = await async_client.get("/parcels", params={"unassigned": False})
+    assert [p["id"] for p in resp.json()] == [assigned.id]
+
+    resp = await async_client.get("/parcels", params={"train_id": train.id})
+    assert [p["id"] for p in resp.json()] == [assigned.id]
+
+
+@pytest.mark.anyio
+async def test_get_parcels__limit_bounded(async_client: AsyncClient):
+    resp = await async_client.get("/parcels", params={"limit": 100_000})
+
+    assert resp.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_get_parcels__ndjson(
+    async_client: AsyncClient, sample_parcel: Callable
+):
+    parcels = [
+        await sample_parcel({"weight": 1.00 + i, "volume": 1.00})
+        for i in range(3)
+    ]
+
+    resp = await async_client.get(
+        "/parcels",
+        params={"unassigned": True},
+        headers={"Accept": "application/x-ndjson"},
+    )
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in resp.text.splitlines()] == [
+        {"id": p.id, "weight": p.weight, "volume": 1.0, "train_id": None}
+        for p in parcels
+    ]
+
+
+@pytest.mark.anyio
+async def test_create_parcels__bulk(async_client: AsyncClient):
+    items = [{"weight": 1.00 + i, "volume": 2.00} for i in range(3)]
+
+    resp = await async_client.post("/parcels/bulk", json=items)
+    data = resp.json()
+
+    assert resp.status_code == 201
+    assert data["errors"] == []
+
+    parcels = await database.fetch_all(
+        Parcel.select().where(Parcel.c.id.in_(data["ids"]))
+    )
+    weights = {p.id: p.weight for p in parcels}
+    assert [weights[i] for i in data["ids"]] == [1, 2, 3]
+
+
+@pytest.mark.anyio
+async def test_create_parcels__bulk_errors(async_client: AsyncClient):
+    items = [
+        {"weight": 1.00, "volume": 2.00},
+        {"weight": "heavy", "volume": 2.00},
+        {"weight": 3.00, "volume": 2.00},
+        "parcel",
+    ]
+
+    resp = await async_client.post("/parcels/bulk", json=items)
+    data = resp.json()
+
+    assert resp.status_code == 201
+    assert data["ids"][1] is None
+    assert data["ids"][3] is None
+    assert data["ids"][0] < data["ids"][2]
+    assert [(e["index"], e["field"]) for e in data["errors"]] == [
+        (1, "weight"),
+        (3, ""),
+    ]
+
+    resp = await async_client.post("/parcels/bulk", json=items[1:2])
+    assert resp.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_create_parcels__bulk_too_large(async_client: AsyncClient):
+    with patch("app.routers.parcel.app_config.BULK_MAX_ITEMS", 2):
+        resp = await async_client.post(
+            "/parcels/bulk", json=[{"weight": 1.00, "volume": 1.00}] * 3
+        )
+
+    assert resp.status_code == 413
+
+
+@pytest.mark.anyio
+async def test_create_parcels__bulk_chunks(async_client: AsyncClient):
+    items = [{"weight": 1.00 + i, "volume": 1.00} for i in range(7)]
+
+    with patch("app.routers.parcel.app_config.BULK_INSERT_CHUNK", 3):
+        resp = await async_client.post("/parcels/bulk", json=items)
+    ids = resp.json()["ids"]
+
+    assert resp.status_code == 201
+    assert ids == sorted(ids)
+    assert len(set(ids)) == 7
+
+
+@pytest.mark.anyio
+async def test_upload_manifest__csv(async_client: AsyncClient):
+    lines = ["weight,volume"] + [f"{i + 1},1" for i in range(5)]
+    lines += ["x,1", "nan,1", "1,-1"]
+
+    with patch("app.routers.parcel.app_config.MANIFEST_CHUNK_ROWS", 2):
+        resp = await async_client.post(
+            "/parcels/manifest",
+            content="\n".join(lines).encode(),
+            headers={"Content-Type": "text/csv; charset=utf-8"},
+        )
+    data = resp.json()
+
+    assert resp.status_code == 201
+    assert data["rows"] == 8
+    assert data["inserted"] == 5
+    assert data["rejected"] == 3
+    assert [r["line"] for r in data["rejects"]] == [6, 7, 8]
+    assert [r["message"].split(":")[0] for r in data["rejects"]] == [
+        "weight",
+        "weight",
+        "volume",
+    ]
+
+    parcels = await database.fetch_all(Parcel.select().order_by("id"))
+    assert [p.weight for p in parcels] == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.anyio
+async def test_upload_manifest__invalid(async_client: AsyncClient):
+    resp = await async_client.post(
+        "/parcels/manifest",
+        content=b"weight\n1\n",
+        headers={"Content-Type": "text/csv"},
+    )
+    assert resp.status_code == 400
+
+    resp = await async_client.post(
+        "/parcels/manifest",
+        content=b"{}",
+        headers={"Content-Type": "application/json"},
+    )
+    assert resp.status_code == 415
+
+    with patch("app.routers.parcel.HAS_PYARROW", False):
+        resp = await async_client.post(
+            "/parcels/manifest",
+            content=b"",
+            headers={"Content-Type": "application/vnd.apache.arrow.stream"},
+        )
+    assert resp.status_code == 415
+
+
+@pytest.mark.anyio
+async def test_upload_manifest__error_after_flush(async_client: AsyncClient):
+    async def rows(chunks):
+        for line in range(1, 4):
+            yield ManifestRow(line, {"weight": 1.00, "volume": 1.00}, None)
+        raise ManifestError("Invalid Arrow stream: truncated")
+
+    with patch("app.routers.parcel.app_config.MANIFEST_CHUNK_ROWS", 2), patch(
+        "app.routers.parcel.iter_csv_rows", rows
+    ):
+        resp = await async_client.post(
+            "/parcels/manifest",
+            content=b"weight,volume\n",
+            headers={"Content-Type": "text/csv"},
+        )
+
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == {
+        "message": "Invalid Arrow stream: truncated",
+        "rows": 3,
+        "inserted": 2,
+    }
+    parcels = await database.fetch_all(Parcel.select())
+    assert len(parcels) == 2
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__atomic(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+):
+    train = await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 100.00,
+            "weight": 20.00,
+            "volume": 5.00,
+            "ready_to_book": False,
+        }
+    )
+    parcels = [
+        await sample_parcel({"weight": 5.00, "volume": 1.00}) for _ in range(3)
+    ]
+
+    # the train update fails after the parcels are assigned
+    with patch("app.routers.parcel.Train.update", side_effect=RuntimeError):
+        with pytest.raises(RuntimeError):
+            await async_client.post("/parcels/fill")
+
+    stored = await database.fetch_all(
+        Parcel.select().where(Parcel.c.id.in_([p.id for p in parcels]))
+    )
+    assert [p.train_id for p in stored] == [None] * 3
+
+    with patch("app.routers.parcel.app_config.FILL_UPDATE_CHUNK", 2):
+        resp = await async_client.post("/parcels/fill")
+
+    assert resp.json()["assigned_items"] == 3
+    stored = await database.fetch_all(
+        Parcel.select().where(Parcel.c.id.in_([p.id for p in parcels]))
+    )
+    assert [p.train_id for p in stored] == [train.id] * 3
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__conflict_retried(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+):
+    thomas = await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 100.00,
+            "weight": 20.00,
+            "volume": 5.00,
+            "ready_to_book": False,
+        }
+    )
+    percy = await sample_train(
+        {
+            "name": "Percy",
+            "cost": 100.00,
+            "weight": 20.00,
+            "volume": 5.00,
+            "ready_to_book": True,
+        }
+    )
+    parcels = [
+        await sample_parcel({"weight": 5.00, "volume": 1.00}) for _ in range(3)
+    ]
+
+    solve_fill = parcel_router._solve_fill
+    calls = []
+
+    async def concurrent_fill(*args):
+        # another worker assigns a parcel while the first solve runs
+        if not calls:
+            await database.execute(
+                Parcel.update()
+                .where(Parcel.c.id == parcels[0].id)
+                .values(train_id=percy.id)
+            )
+        calls.append(args)
+        return await solve_fill(*args)
+
+    with patch("app.routers.parcel._solve_fill", concurrent_fill):
+        resp = await async_client.post("/parcels/fill", params={"debug": 1})
+    data = resp.json()
+
+    assert resp.status_code == 200
+    assert len(calls) == 2
+    assert data["assigned_items"] == 2
+    assert data["debug"]["counters"]["conflicts"] == 1
+    stored = await database.fetch_all(
+        Parcel.select().where(Parcel.c.id.in_([p.id for p in parcels]))
+    )
+    assert [p.train_id for p in stored] == [percy.id, thomas.id, thomas.id]
+    assert [p.version for p in stored] == [0, 1, 1]
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__conflict_rejected(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+):
+    train = await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 100.00,
+            "weight": 20.00,
+            "volume": 5.00,
+            "ready_to_book": False,
+        }
+    )
+    parcel = await sample_parcel({"weight": 5.00, "volume": 1.00})
+
+    solve_fill = parcel_router._solve_fill
+
+    async def concurrent_write(*args):
+        # the train is written by another worker during every solve
+        await database.execute(
+            Train.update()
+            .where(Train.c.id == train.id)
+            .values(version=Train.c.version + 1)
+        )
+        return await solve_fill(*args)
+
+    with patch("app.routers.parcel._solve_fill", concurrent_write), patch(
+        "app.routers.parcel.app_config.FILL_CONFLICT_RETRIES", 1
+    ):
+        resp = await async_client.post("/parcels/fill")
+
+    assert resp.status_code == 409
+    stored = await database.fetch_one(
+        Parcel.select().where(Parcel.c.id == parcel.id)
+    )
+    stored_train = await database.fetch_one(
+        Train.select().where(Train.c.id == train.id)
+    )
+    assert stored.train_id is None
+    assert stored_train.ready_to_book is False
+    assert stored_train.version == 2
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__sharded(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+    sample_trainline: Callable,
+):
+    green = await sample_trainline({"name": "Green"})
+    blue = await sample_trainline({"name": "Blue"})
+    trains = [
+        await sample_train(
+            {
+                "name": name,
+                "cost": cost,
+                "weight": 10.00,
+                "volume": 10.00,
+                "line_id": line.id,
+                "ready_to_book": False,
+            }
+        )
+        for name, cost, line in [
+            ("Percy", 10.0, green),
+            ("Thomas", 20.0, blue),
+        ]
+    ]
+    parcels = [
+        await sample_parcel({"weight": 5.00, "volume": 1.00}) for _ in range(4)
+    ]
+
+    resp = await async_client.post(
+        "/parcels/fill", params={"sharded": True, "debug": True}
+    )
+    data = resp.json()
+
+    assert resp.status_code == 200
+    assert data["assigned_items"] == 4
+    assert data["total_cost"] == 30.0
+    assert data["debug"]["counters"]["shards"] == 2
+    stored = await database.fetch_all(
+        Parcel.select().where(Parcel.c.id.in_([p.id for p in parcels]))
+    )
+    assert sorted(p.train_id for p in stored) == sorted(
+        [trains[0].id, trains[0].id, trains[1].id, trains[1].id]
+    )
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__sharded_through_api(async_client: AsyncClient):
+    lines = [
+        (await async_client.post("/trainlines", json={"name": name})).json()
+        for name in ("Green", "Blue")
+    ]
+    for name, line in zip(("Percy", "Thomas"), lines):
+        resp = await async_client.post(
+            "/trains",
+            json={
+                "name": name,
+                "cost": 10.00,
+                "weight": 10.00,
+                "volume": 10.00,
+                "line_id": line["id"],
+            },
+        )
+        assert resp.json()["line_id"] == line["id"]
+    for _ in range(4):
+        await async_client.post("/parcels", json={"weight": 5, "volume": 1})
+
+    resp = await async_client.post(
+        "/parcels/fill", params={"sharded": True, "debug": True}
+    )
+    assert resp.json()["assigned_items"] == 4
+    assert resp.json()["debug"]["counters"]["shards"] == 2
+
+    booked = (await async_client.post("/trains/book")).json()
+    assert sorted(t["line_id"] for t in booked) == sorted(
+        line["id"] for line in lines
+    )
+    now = datetime.utcnow()
+    resp = await async_client.get(
+        "/trainlines/available",
+        params={
+            "from": now.isoformat(),
+            "to": (now + timedelta(minutes=1)).isoformat(),
+        },
+    )
+    assert resp.json() == []
+
+
+class FirstLineRouting(RoutingPolicy):
+    def route(self, parcels, lines):
+        return {next(iter(lines)): parcels}
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__sharded_overflow(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+    sample_trainline: Callable,
+):
+    for name, cost in [("Percy", 10.0), ("Thomas", 20.0)]:
+        line = await sample_trainline({"name": name})
+        await sample_train(
+            {
+                "name": name,
+                "cost": cost,
+                "weight": 10.00,
+                "volume": 10.00,
+                "line_id": line.id,
+                "ready_to_book": False,
+            }
+        )
+    for _ in range(2):
+        await sample_parcel({"weight": 6.00, "volume": 1.00})
+
+    # both parcels are routed to the first line, which takes one
+    with patch.dict(ROUTING_POLICIES, first=FirstLineRouting):
+        resp = await async_client.post(
+            "/parcels/fill",
+            params={"sharded": True, "shard_policy": "first", "debug": True},
+        )
+    data = resp.json()
+
+    assert data["assigned_items"] == 2
+    assert data["total_cost"] == 30.0
+    assert data["debug"]["counters"]["shards"] == 1
+    assert data["debug"]["counters"]["overflow_parcels"] == 1
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__unknown_shard_policy(async_client: AsyncClient):
+    resp = await async_client.post(
+        "/parcels/fill", params={"sharded": True, "shard_policy": "random"}
+    )
+
+    assert resp.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_fill_parcels__skip_busy_lines(
+    async_client: AsyncClient,
+    sample_parcel: Callable,
+    sample_train: Callable,
+    sample_trainline: Callable,
+):
+    trains = {}
+    for name, cost in [("Percy", 10.0), ("Thomas", 20.0)]:
+        line = await sample_trainline({"name": name})
+        trains[name] = await sample_train(
+            {
+                "name": name,
+                "cost": cost,
+                "weight": 10.00,
+                "volume": 10.00,
+                "line_id": line.id,
+                "ready_to_book": False,
+            }
+        )
+    parcel = await sample_parcel({"weight": 5.00, "volume": 1.00})
+    # the line of the cheapest train is occupied
+    now = datetime.utcnow()
+    await line_occupancy.occupy(
+        [
+            dict(
+                line_id=trains["Percy"].line_id,
+                start_at=now - timedelta(minutes=1),
+                end_at=now + timedelta(hours=1),
+            )
+        ]
+    )
+
+    resp = await async_client.post("/parcels/fill", params={"debug": True})
+    data = resp.json()
+
+    assert data["total_cost"] == 20.0
+    assert data["debug"]["counters"]["busy_line_trains"] == 1
+    stored = await database.fetch_one(
+        Parcel.select().where(Parcel.c.id == parcel.id)
+    )
+    assert stored.train_id == trains["Thomas"].id
+
+
+@pytest.mark.anyio
+async def test_create_parcel__invalid_values(async_client: AsyncClient):
+    for data in [{"weight": -1, "volume": 1}, {"weight": 1, "volume": "inf"}]:
+        resp = await async_client.post("/parcels", json=data)
+
+        assert resp.status_code == 422
@@ -0,0 +1,187 @@
+from datetime import datetime
+from typing import Callable
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+
+from app.db import Train, TrainLine, database
+from app.routers.read_cache import CachedResponse, ReadCache
+
+pytestmark = pytest.mark.anyio
+
+TRAIN = {"name": "Percy", "cost": 120.0, "weight": 500.0, "volume": 20.0}
+
+
+@pytest.fixture
+def read_cache():
+    cache = ReadCache(max_entries=8)
+    with patch("app.routers.train.read_cache", cache), patch(
+        "app.routers.trainline.read_cache", cache
+    ), patch("app.routers.parcel.read_cache", cache):
+        yield cache
+
+
+async def test_list_trains_cached(
+    async_client: AsyncClient, sample_train: Callable, read_cache: ReadCache
+):
+    await sample_train(TRAIN)
+
+    first = await async_client.get("/trains")
+    second = await async_client.get("/trains")
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert [t["name"] for t in first.json()] == ["Percy"]
+    assert second.headers["etag"] == first.headers["etag"]
+    assert (read_cache.hits, read_cache.misses) == (1, 1)
+
+
+async def test_not_modified(
+    async_client: AsyncClient, sample_train: Callable, read_cache: ReadCache
+):
+    train = await sample_train(TRAIN)
+
+    for url in ("/trains", f"/trains/{train.id}", "/trainlines"):
+        etag = (await async_client.get(url)).headers["etag"]
+        resp = await async_client.get(url, headers={"If-None-Match": etag})
+
+        assert resp.status_code == 304
+        assert resp.headers["etag"] == etag
+        assert resp.content == b""
+
+
+async def test_cached_train_matches_response_model(
+    async_client: AsyncClient, sample_train: Callable, read_cache: ReadCache
+):
+    train = await sample_train(TRAIN)
+
+    cached = await async_client.get(f"/trains/{train.id}")
+    with patch("app.routers.train.read_cache", ReadCache(max_entries=0)):
+        uncached = await async_client.get(f"/trains/{train.id}")
+
+    assert cached.json() == uncached.json()
+    assert cached.json()["name"] == "Percy"
+
+
+async def test_missing_train_not_cached(
+    async_client: AsyncClient, read_cache: ReadCache
+):
+    resp = await async_client.get("/trains/999")
+
+    assert resp.status_code == 404
+    assert read_cache.size == 0
+
+
+async def test_pages_cached_with_cursor(
+    async_client: AsyncClient, sample_train: Callable, read_cache: ReadCache
+):
+    for name in ("A", "B", "C"):
+        await sample_train({**TRAIN, "name": name})
+
+    first = await async_client.get("/trains", params={"limit": 2})
+    cached = await async_client.get("/trains", params={"limit": 2})
+    after = await async_client.get(
+        "/trains", params={"limit": 2, "after_name": "B"}
+    )
+
+    assert cached.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+    assert [t["name"] for t in cached.json()] == ["A", "B"]
+    assert [t["name"] for t in after.json()] == ["C"]
+
+
+async def test_invalidated_by_writes(
+    async_client: AsyncClient, read_cache: ReadCache
+):
+    etag = (await async_client.get("/trains")).headers["etag"]
+
+    await async_client.post("/trains", json=TRAIN)
+    resp = await async_client.get("/trains", headers={"If-None-Match": etag})
+
+    assert resp.status_code == 200
+    assert [t["name"] for t in resp.json()] == ["Percy"]
+
+    await async_client.get("/trainlines")
+    await async_client.post("/trainlines", json={"name": "Green"})
+    resp = await async_client.get("/trainlines")
+
+    assert [t["name"] for t in resp.json()] == ["Green"]
+
+
+async def test_invalidated_by_booking(
+    async_client: AsyncClient, sample_train: Callable, read_cache: ReadCache
+):
+    await sample_train({**TRAIN, "ready_to_book": True})
+    assert len((await async_client.get("/trains")).json()) == 1
+
+    await async_client.post("/trains/book")
+
+    assert (await async_client.get("/trains")).json() == []
+
+
+async def test_invalidated_by_other_workers(
+    async_client: AsyncClient,
+    sample_train: Callable,
+    sample_trainline: Callable,
+    read_cache: ReadCache,
+):
+    train = await sample_train({**TRAIN, "ready_to_book": False})
+    line = await sample_trainline({"name": "Green"})
+    await async_client.get("/trains")
+    await async_client.get("/trainlines")
+
+    # written by another worker, with its own cache
+    other_worker = ReadCache(max_entries=8)
+    async with database.transaction():
+        await database.execute(
+            Train.update()
+            .where(Train.c.id == train.id)
+            .values(ready_to_book=True)
+        )
+        await other_worker.invalidate("trains")
+    async with database.transaction():
+        await database.execute(
+            TrainLine.update()
+            .where(TrainLine.c.id == line.id)
+            .values(occupied_at=datetime(2024, 1, 1))
+        )
+        await other_worker.invalidate("trainlines")
+    trains = (await async_client.get("/trains")).json()
+    trainlines = (await async_client.get("/trainlines")).json()
+
+    assert [t["ready_to_book"] for t in trains] == [True]
+    assert [t["occupied_at"] for t in trainlines] == ["2024-01-01T00:00:00"]
+    assert read_cache.hits == 0
+
+    # the other rows are not read again
+    await async_client.get("/trains")
+    assert read_cache.hits == 1
+
+
+async def test_ttl(async_client: AsyncClient, read_cache: ReadCache):
+    read_cache.ttl_seconds = 0
+
+    await async_client.get("/trains")
+    await async_client.get("/trains")
+
+    assert read_cache.hits == 0
+
+
+async def test_bounded():
+    cache = ReadCache(max_entries=2, max_bytes=10)
+    version = 0
+
+    def entry(body: bytes):
+        return CachedResponse(version, float("inf"), body, "", {})
+
+    cache._put("a", entry(b"1234"))
+    cache._put("b", entry(b"1234"))
+    cache._put("c", entry(b"1234"))
+    assert list(cache._entries) == ["b", "c"]
+
+    cache._put("d", entry(b"12345678"))
+    assert list(cache._entries) == ["d"]
+    assert cache.size == 8
+
+    cache._put("e", entry(b"12345678901"))
+    assert "e" not in cache._entries
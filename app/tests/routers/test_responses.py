@@ -0,0 +1,107 @@
+from datetime import datetime
+from typing import Callable
+from unittest.mock import patch
+
+import pytest
+from httpx import AsyncClient
+
+from app.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def sample_data(sample_trainline, sample_train, sample_parcel):
+    line = await sample_trainline({"name": "A", "occupied_at": None})
+    train = await sample_train(
+        {
+            "name": "Thomas",
+            "cost": 100.50,
+            "weight": 20.00,
+            "volume": 5.00,
+            "line_id": line.id,
+            "ready_to_book": False,
+        }
+    )
+    await sample_train(
+        {
+            "name": "Percy",
+            "cost": 10.00,
+            "weight": 2.00,
+            "volume": 1.00,
+            "ready_to_book": True,
+            "booked_at": None,
+        }
+    )
+    await sample_trainline(
+        {"name": "B", "occupied_at": datetime(2024, 1, 2, 3, 4, 5, 6)}
+    )
+    for i in range(3):
+        await sample_parcel({"weight": 1.00 + i, "volume": 1.00})
+    await sample_parcel({"weight": 4.00, "volume": 1.00, "train_id": train.id})
+
+
+async def _get_both(async_client, *args, **kwargs):
+    slow = await async_client.request(*args, **kwargs)
+    with patch("app.routers.responses.app_config.FAST_JSON", True):
+        fast = await async_client.request(*args, **kwargs)
+
+    return slow, fast
+
+
+@pytest.mark.parametrize(
+    "url, params",
+    [
+        ("/parcels", {}),
+        ("/parcels", {"limit": 2}),
+        ("/trains", {}),
+        ("/trainlines", {}),
+    ],
+)
+async def test_fast_json__same_content(
+    async_client: AsyncClient, sample_data: None, url: str, params: dict
+):
+    slow, fast = await _get_both(async_client, "GET", url, params=params)
+
+    assert fast.status_code == slow.status_code == 200
+    assert fast.headers["content-type"] == "application/json"
+    assert fast.content == slow.content
+    assert fast.json() == slow.json()
+    assert fast.headers.get("X-Next-Cursor") == slow.headers.get(
+        "X-Next-Cursor"
+    )
+
+
+async def test_fast_json__fill(async_client: AsyncClient, sample_data: None):
+    with patch("app.routers.responses.app_config.FAST_JSON", True):
+        resp = await async_client.post(
+            "/parcels/fill", params={"preview": True}
+        )
+
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "assigned_items": 3,
+        "total_cost": 100.5,
+        "optimal": None,
+        "lower_bound": None,
+        "gap": None,
+        "debug": None,
+    }
+
+
+async def test_fast_json__without_orjson(
+    async_client: AsyncClient, sample_data: None
+):
+    with patch("app.routers.responses.HAS_ORJSON", False):
+        slow, fast = await _get_both(async_client, "GET", "/trains")
+
+    assert fast.json() == slow.json()
+
+
+async def test_fast_json__same_openapi(async_client: AsyncClient):
+    schema = app.openapi()
+    parcels = schema["paths"]["/parcels"]["get"]["responses"]["200"]
+
+    assert parcels["content"]["application/json"]["schema"]["items"] == {
+        "$ref": "#/components/schemas/ParcelResponseModel"
+    }
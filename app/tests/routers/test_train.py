@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 from typing import Callable
 from unittest.mock import Mock, patch
@@ -5,6 +6,8 @@ from unittest.mock import Mock, patch
 import pytest
 from httpx import AsyncClient
 
+from app.db import Train, database
+
 
 @pytest.mark.anyio
 async def test_create_train(async_client: AsyncClient):
@@ -24,6 +27,30 @@ async def test_create_train(async_client: AsyncClient):
     assert new_train["volume"] == data["volume"]
 
 
+@pytest.mark.anyio
+async def test_create_train__line(
+    async_client: AsyncClient, sample_trainline: Callable
+):
+    line = await sample_trainline({"name": "Green"})
+    data = {
+        "name": "Thomas",
+        "cost": 100.00,
+        "weight": 200.00,
+        "volume": 10.00,
+        "line_id": line.id,
+    }
+    resp = await async_client.post("/trains", json=data)
+    train = resp.json()
+
+    assert resp.status_code == 201
+    assert train["line_id"] == line.id
+    resp = await async_client.get(f"/trains/{train['id']}")
+    assert resp.json()["line_id"] == line.id
+
+    resp = await async_client.post("/trains", json={**data, "line_id": 999})
+    assert resp.status_code == 400
+
+
 @pytest.mark.anyio
 async def test_retrieve_train(
     async_client: AsyncClient, sample_train: Callable
@@ -82,6 +109,7 @@ async def test_get_all_available_trains(
         "volume": 20.00,
         "booked_at": None,
         "ready_to_book": False,
+        "line_id": None,
     } in data
     assert {
         "id": train2.id,
@@ -91,6 +119,7 @@ async def test_get_all_available_trains(
         "volume": 10.00,
         "booked_at": None,
         "ready_to_book": False,
+        "line_id": None,
     } in data
 
 
@@ -134,4 +163,99 @@ async def test_book_train(
         "volume": 10.00,
         "ready_to_book": True,
         "booked_at": booked_at.isoformat(),
+        "line_id": None,
     } in data
+
+
+@pytest.mark.anyio
+async def test_book_train__once(
+    async_client: AsyncClient, sample_train: Callable
+):
+    train = await sample_train(
+        {
+            "name": "Percy",
+            "cost": 120.00,
+            "weight": 500.00,
+            "volume": 20.00,
+            "ready_to_book": True,
+        }
+    )
+
+    first = await async_client.post("/trains/book")
+    second = await async_client.post("/trains/book")
+
+    assert [t["id"] for t in first.json()] == [train.id]
+    assert second.json() == []
+    stored = await database.fetch_one(
+        Train.select().where(Train.c.id == train.id)
+    )
+    assert stored.version == train.version + 1
+
+
+@pytest.mark.anyio
+async def test_book_train__rolled_back(
+    async_client: AsyncClient,
+    sample_train: Callable,
+    sample_trainline: Callable,
+):
+    line = await sample_trainline({"name": "Green"})
+    train = await sample_train(
+        {
+            "name": "Percy",
+            "cost": 120.00,
+            "weight": 500.00,
+            "volume": 20.00,
+            "line_id": line.id,
+            "ready_to_book": True,
+        }
+    )
+
+    with patch(
+        "app.routers.train.line_occupancy.occupy",
+        side_effect=RuntimeError("disk full"),
+    ), pytest.raises(RuntimeError):
+        await async_client.post("/trains/book")
+
+    stored = await database.fetch_one(
+        Train.select().where(Train.c.id == train.id)
+    )
+    assert stored.booked_at is None
+    assert stored.version == train.version
+
+
+@pytest.mark.anyio
+async def test_get_trains__pagination(
+    async_client: AsyncClient, sample_train: Callable
+):
+    for name in ("Percy", "Gordon", "Thomas"):
+        await sample_train(
+            {"name": name, "cost": 1.00, "weight": 1.00, "volume": 1.00}
+        )
+
+    resp = await async_client.get("/trains", params={"limit": 2})
+    assert [t["name"] for t in resp.json()] == ["Gordon", "Percy"]
+    assert resp.headers["X-Next-Cursor"] == "Percy"
+
+    resp = await async_client.get(
+        "/trains", params={"limit": 2, "after_name": "Percy"}
+    )
+    assert [t["name"] for t in resp.json()] == ["Thomas"]
+    assert "X-Next-Cursor" not in resp.headers
+
+
+@pytest.mark.anyio
+async def test_get_trains__ndjson(
+    async_client: AsyncClient, sample_train: Callable
+):
+    for name in ("Percy", "Gordon"):
+        await sample_train(
+            {"name": name, "cost": 1.00, "weight": 1.00, "volume": 1.00}
+        )
+
+    resp = await async_client.get(
+        "/trains", headers={"Accept": "application/x-ndjson"}
+    )
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+
+    assert resp.status_code == 200
+    assert [line["name"] for line in lines] == ["Gordon", "Percy"]
@@ -1,8 +1,12 @@
+import json
+from datetime import datetime, timedelta, timezone
 from typing import Callable
 
 import pytest
 from httpx import AsyncClient
 
+from app.config import app_config
+
 
 @pytest.mark.anyio
 async def test_create_trainline(async_client: AsyncClient):
@@ -37,3 +41,93 @@ async def test_get_all_trainlines(
         "name": "B",
         "occupied_at": None,
     } in data
+
+
+@pytest.mark.anyio
+async def test_get_trainlines__ndjson(
+    async_client: AsyncClient, sample_trainline: Callable
+):
+    await sample_trainline({"name": "B"})
+    await sample_trainline({"name": "A"})
+
+    resp = await async_client.get(
+        "/trainlines", headers={"Accept": "application/x-ndjson"}
+    )
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+
+    assert resp.status_code == 200
+    assert [line["name"] for line in lines] == ["A", "B"]
+
+
+@pytest.mark.anyio
+async def test_get_available_trainlines(
+    async_client: AsyncClient,
+    sample_trainline: Callable,
+    sample_train: Callable,
+):
+    green = await sample_trainline({"name": "Green"})
+    await sample_trainline({"name": "Blue"})
+    await sample_train(
+        {
+            "name": "Percy",
+            "cost": 1.00,
+            "weight": 1.00,
+            "volume": 1.00,
+            "line_id": green.id,
+            "ready_to_book": True,
+        }
+    )
+
+    await async_client.post("/trains/book")
+    booked_at = (await async_client.get("/trainlines")).json()
+    booked_at = datetime.fromisoformat(
+        next(t["occupied_at"] for t in booked_at if t["name"] == "Green")
+    )
+    occupied_until = booked_at + timedelta(
+        minutes=app_config.LINE_OCCUPANCY_MINUTES
+    )
+
+    resp = await async_client.get(
+        "/trainlines/available",
+        params={
+            "from": booked_at.isoformat(),
+            "to": occupied_until.isoformat(),
+        },
+    )
+    assert resp.status_code == 200
+    assert [t["name"] for t in resp.json()] == ["Blue"]
+
+    resp = await async_client.get(
+        "/trainlines/available",
+        params={
+            "from": occupied_until.isoformat(),
+            "to": (occupied_until + timedelta(hours=1)).isoformat(),
+        },
+    )
+    assert [t["name"] for t in resp.json()] == ["Blue", "Green"]
+
+    # the same period with an offset
+    offset = timezone(timedelta(hours=2))
+    resp = await async_client.get(
+        "/trainlines/available",
+        params={
+            "from": booked_at.replace(tzinfo=timezone.utc)
+            .astimezone(offset)
+            .isoformat(),
+            "to": occupied_until.isoformat() + "Z",
+        },
+    )
+    assert resp.status_code == 200
+    assert [t["name"] for t in resp.json()] == ["Blue"]
+
+
+@pytest.mark.anyio
+async def test_get_available_trainlines__invalid_period(
+    async_client: AsyncClient,
+):
+    resp = await async_client.get(
+        "/trainlines/available",
+        params={"from": "2024-01-01T10:00:00", "to": "2024-01-01T09:00:00"},
+    )
+
+    assert resp.status_code == 400
@@ -0,0 +1,80 @@
+import pickle
+
+import pytest
+
+from app.services.batches import (
+    ParcelBatch,
+    ParcelItem,
+    TrainFleet,
+    TrainItem,
+    UnitOverflow,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_parcel_batch():
+    batch = ParcelBatch.from_items(
+        [ParcelItem(3, 5, 1), ParcelItem(4, 2, 2), ParcelItem(9, 1, 7)]
+    )
+
+    assert len(batch) == 3
+    assert batch[1] == ParcelItem(4, 2, 2)
+    assert batch.total_weight == 8
+    assert batch.total_volume == 10
+
+    batch.assigned[1] = 1
+    view = batch.unassigned()
+
+    assert view.indexes == [0, 2]
+    assert view.ids == [3, 9]
+    assert view.weights == [5, 1]
+    assert view.volumes == [1, 7]
+    assert list(view) == [ParcelItem(3, 5, 1), ParcelItem(9, 1, 7)]
+
+    batch.reset()
+    assert len(batch.unassigned()) == 3
+
+
+async def test_parcel_view__not_copied():
+    batch = ParcelBatch([3, 4, 9], [5, 2, 1], [1, 2, 7])
+    indexes = [0, 2]
+    weights = batch.view(indexes).weights
+
+    assert weights.values is batch.weights
+    assert list(weights) == [5, 1]
+
+    # compacted in place by the fill
+    del indexes[0]
+    assert list(weights) == [1]
+    assert weights[0] == 1
+
+
+async def test_unit_overflow():
+    with pytest.raises(UnitOverflow):
+        ParcelBatch([1], [2**63], [1])
+    with pytest.raises(UnitOverflow):
+        TrainFleet([1], [1], [2**63], [1.0])
+
+
+async def test_train_fleet():
+    trains = [TrainItem(1, 10, 5, 9.5), TrainItem(2, 20, 8, 12.0)]
+    fleet = TrainFleet.from_items(trains)
+
+    assert len(fleet) == 2
+    assert list(fleet) == trains
+    assert fleet.take([1]) == [trains[1]]
+    assert list(fleet.costs) == [9.5, 12.0]
+
+
+async def test_pickle():
+    batch = ParcelBatch([1, 2], [3, 4], [5, 6])
+    batch.assigned[0] = 1
+    fleet = TrainFleet([1], [2], [3], [4.5])
+
+    batch_copy = pickle.loads(pickle.dumps(batch))
+    fleet_copy = pickle.loads(pickle.dumps(fleet))
+
+    assert list(batch_copy) == list(batch)
+    assert batch_copy.assigned == batch.assigned
+    assert list(fleet_copy) == list(fleet)
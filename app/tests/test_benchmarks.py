@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from app.benchmarks.__main__ import main
+from app.benchmarks.runner import BASELINE, compare, run
+from app.benchmarks.workloads import Scenario, generate
+
+pytestmark = pytest.mark.anyio
+
+TINY = Scenario("tiny", parcels=10, trains=3)
+
+
+async def test_generate__seeded():
+    assert generate(TINY) == generate(TINY)
+    assert generate(TINY) != generate(Scenario("tiny", 10, 3, seed=1))
+
+    trains, parcels = generate(TINY)
+    assert len(trains) == 3
+    assert len(parcels) == 10
+    assert sum(t.weight for t in trains) >= sum(p.weight for p in parcels)
+
+
+async def test_run():
+    results = run([TINY], repeat=1)
+    phases = results["scenarios"]["tiny"]["phases"]
+
+    assert set(phases) == {
+        "setup",
+        "table_max",
+        "select_trains",
+        "assign_parcels",
+        "process",
+    }
+    assert all(
+        m["wall_ms"] >= 0 and m["peak_kib"] > 0 for m in phases.values()
+    )
+    json.dumps(results)
+
+
+def _results(wall_ms, peak_kib=100.0, tracked=True):
+    return {
+        "scenarios": {
+            "tiny": {
+                "tracked": tracked,
+                "phases": {
+                    "process": {"wall_ms": wall_ms, "peak_kib": peak_kib}
+                },
+            }
+        }
+    }
+
+
+async def test_compare():
+    baseline = _results(10.0)
+
+    assert compare(baseline, _results(12.0), threshold=0.25) == []
+
+    regressions = compare(baseline, _results(20.0), threshold=0.25)
+    assert [(r["phase"], r["metric"]) for r in regressions] == [
+        ("process", "wall_ms")
+    ]
+
+    regressions = compare(baseline, _results(10.0, peak_kib=200.0))
+    assert [r["metric"] for r in regressions] == ["peak_kib"]
+
+
+async def test_compare__untracked_or_noise():
+    assert compare(_results(10.0, tracked=False), _results(50.0)) == []
+    assert compare(_results(0.1), _results(0.5)) == []
+
+
+async def test_main__compare(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    current = tmp_path / "current.json"
+    baseline.write_text(json.dumps(_results(10.0)))
+
+    current.write_text(json.dumps(_results(11.0)))
+    assert main(["compare", str(baseline), "--current", str(current)]) == 0
+
+    current.write_text(json.dumps(_results(30.0)))
+    assert main(["compare", str(baseline), "--current", str(current)]) == 1
+
+
+async def test_main__committed_baseline(capsys):
+    # the regression gate of the test run, loose enough for the noise of
+    # shared runners; compare at 0.25 on the reference machine
+    baseline = json.loads(BASELINE.read_text())
+    assert all(s["tracked"] for s in baseline["scenarios"].values())
+
+    assert main(["compare", "--threshold", "1.0"]) == 0, capsys.readouterr()
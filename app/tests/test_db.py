@@ -0,0 +1,119 @@
+import pytest
+import sqlalchemy
+
+from app.db import (
+    DataVersion,
+    Parcel,
+    Train,
+    create_data_version_row,
+    create_missing_columns,
+    create_missing_indexes,
+    engine,
+    metadata,
+)
+from app.routers.parcel import (
+    _available_train_query,
+    _residual_train_query,
+    _unassigned_parcel_query,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def query_plan(query) -> str:
+    sql = query.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        rows = conn.execute(sqlalchemy.text(f"EXPLAIN QUERY PLAN {sql}"))
+        return "\n".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize(
+    "query, index",
+    [
+        (_unassigned_parcel_query(), "COVERING INDEX ix_parcels_unassigned"),
+        (
+            Parcel.select().where(Parcel.c.train_id == 1).limit(10),
+            "INDEX ix_parcels_train_id",
+        ),
+        (_available_train_query(), "INDEX ix_trains_unbooked"),
+        (_residual_train_query(), "INDEX ix_parcels_train_id"),
+        (
+            Train.select().where(
+                Train.c.ready_to_book == True, Train.c.booked_at == None
+            ),
+            "INDEX ix_trains_unbooked",
+        ),
+        (
+            Train.select()
+            .where(Train.c.booked_at == None)
+            .order_by(Train.c.name)
+            .limit(100),
+            "INDEX ix_trains_unbooked_name",
+        ),
+        (
+            Train.select().where(Train.c.line_id == 1),
+            "INDEX ix_trains_line_id",
+        ),
+    ],
+)
+async def test_hot_queries_use_indexes(query, index):
+    plan = query_plan(query)
+
+    assert index in plan
+    assert "TEMP B-TREE" not in plan
+
+
+async def test_create_missing_indexes():
+    old_engine = sqlalchemy.create_engine("sqlite://")
+    # a database created before the indexes were declared
+    with old_engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            conn.execute(sqlalchemy.schema.CreateTable(table))
+
+    created = create_missing_indexes(old_engine)
+
+    assert set(created) == {
+        "ix_parcels_unassigned",
+        "ix_parcels_train_id",
+        "ix_trains_unbooked",
+        "ix_trains_unbooked_name",
+        "ix_trains_line_id",
+        "ix_fill_jobs_pending",
+    }
+    assert create_missing_indexes(old_engine) == []
+
+
+async def test_create_missing_columns():
+    old_engine = sqlalchemy.create_engine("sqlite://")
+    metadata.create_all(old_engine)
+    # a database created before the version columns were declared
+    with old_engine.begin() as conn:
+        conn.execute(sqlalchemy.text("ALTER TABLE trains DROP COLUMN version"))
+        conn.execute(
+            sqlalchemy.text("INSERT INTO trains (name) VALUES ('Percy')")
+        )
+        conn.execute(
+            sqlalchemy.text("ALTER TABLE parcels DROP COLUMN version")
+        )
+
+    added = create_missing_columns(old_engine)
+
+    assert added == ["trains.version", "parcels.version"]
+    assert create_missing_columns(old_engine) == []
+    with old_engine.connect() as conn:
+        train = conn.execute(Train.select()).one()
+    assert train.version == 0
+
+
+async def test_create_data_version_row():
+    new_engine = sqlalchemy.create_engine("sqlite://")
+    metadata.create_all(new_engine)
+
+    create_data_version_row(new_engine)
+    create_data_version_row(new_engine)
+
+    with new_engine.connect() as conn:
+        rows = conn.execute(DataVersion.select()).all()
+    assert [(row.id, row.trains, row.trainlines) for row in rows] == [
+        (1, 0, 0)
+    ]
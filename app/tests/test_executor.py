@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.batches import ParcelItem, TrainItem
+from app.services.executor import SolverExecutor
+from app.services.parcel_assignment import AssignmentProblem, run_assignment
+
+pytestmark = pytest.mark.anyio
+
+
+def sample_problem(**options) -> AssignmentProblem:
+    trains = [TrainItem(1, 10, 10, 10.0), TrainItem(2, 10, 10, 30.0)]
+    parcels = [ParcelItem(1, 4, 1), ParcelItem(2, 6, 1)]
+    return AssignmentProblem(trains, parcels, options)
+
+
+@pytest.mark.parametrize("kind", ["process", "thread", "inline"])
+async def test_run_assignment(kind):
+    executor = SolverExecutor(kind=kind, max_workers=1)
+
+    try:
+        assigned, cost, stats, report = await executor.run(
+            run_assignment, sample_problem(deadline_ms=60_000)
+        )
+    finally:
+        executor.shutdown()
+
+    assert (assigned, cost) == ({1: [2, 1]}, 10.0)
+    assert report["optimal"] is True
+    assert "solve" in stats.timings
+
+
+async def test_max_concurrency():
+    executor = SolverExecutor(kind="thread", max_workers=4, max_concurrency=2)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def work():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+
+    try:
+        await asyncio.gather(*(executor.run(work) for _ in range(6)))
+    finally:
+        executor.shutdown()
+
+    assert max(peak) == 2
+
+
+async def test_unknown_executor():
+    with pytest.raises(ValueError):
+        SolverExecutor(kind="gpu")
+
+
+@pytest.mark.parametrize("kind", ["process", "thread", "inline"])
+async def test_map(kind):
+    executor = SolverExecutor(kind=kind, max_workers=2)
+
+    try:
+        results = await executor.map(
+            run_assignment,
+            [sample_problem(deadline_ms=60_000) for _ in range(2)],
+        )
+    finally:
+        executor.shutdown()
+
+    assert [result[:2] for result in results] == [({1: [2, 1]}, 10.0)] * 2
@@ -0,0 +1,128 @@
+import random
+
+import pytest
+
+from app.services.deadline import Deadline, DeadlineExceeded
+from app.services.knapsack import (
+    HAS_NUMPY,
+    compute_knapsack_choices_for_max,
+    compute_knapsack_table_for_max_np,
+    knapsack_fptas,
+)
+from app.services.parcel_assignment import (
+    AssignmentService,
+    compute_knapsack_table_for_max,
+    get_knapsack_backend,
+)
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not HAS_NUMPY, reason="numpy not installed"),
+]
+
+
+def random_items(seed: int, n: int, max_weight: int, max_cost: int):
+    rnd = random.Random(seed)
+    weights = [rnd.randint(1, max_weight) for _ in range(n)]
+    costs = [rnd.randint(1, max_cost) for _ in range(n)]
+    return weights, costs
+
+
+@pytest.mark.parametrize("seed", range(10))
+async def test_max_table__matches_python(seed):
+    weights, costs = random_items(seed, n=12, max_weight=9, max_cost=50)
+
+    expected = compute_knapsack_table_for_max(weights, costs)
+    result = compute_knapsack_table_for_max_np(weights, costs)
+
+    assert result.tolist() == expected
+
+
+async def test_max_table__float_costs():
+    weights, costs = [2, 3, 4], [1.5, 2.25, 3.0]
+
+    expected = compute_knapsack_table_for_max(weights, costs)
+    result = compute_knapsack_table_for_max_np(weights, costs)
+
+    assert result.tolist() == expected
+
+
+@pytest.mark.parametrize(
+    "compute_table",
+    [compute_knapsack_table_for_max, compute_knapsack_table_for_max_np],
+)
+async def test_max_table__deadline(compute_table):
+    weights, costs = random_items(0, n=12, max_weight=9, max_cost=50)
+
+    with pytest.raises(DeadlineExceeded):
+        compute_table(weights, costs, deadline=Deadline(0))
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+async def test_max_choices__match_table(seed, use_numpy):
+    weights, costs = random_items(seed, n=12, max_weight=9, max_cost=50)
+    capacity = sum(weights) // 2
+
+    K = compute_knapsack_table_for_max(weights, costs)
+    last_row, choices = compute_knapsack_choices_for_max(
+        weights, costs, capacity=capacity, use_numpy=use_numpy
+    )
+
+    assert last_row == K[-1][: capacity + 1]
+    assert choices.nbytes == len(weights) * ((capacity + 8) // 8)
+    for i in range(len(weights)):
+        for w in range(capacity + 1):
+            assert choices.get(i, w) == (K[i + 1][w] != K[i][w])
+
+
+@pytest.mark.parametrize("epsilon", [0.5, 0.1])
+@pytest.mark.parametrize("seed", range(5))
+async def test_knapsack_fptas__within_epsilon(seed, epsilon):
+    weights, costs = random_items(seed, n=15, max_weight=20, max_cost=500)
+    capacity = sum(weights) // 3
+
+    K = compute_knapsack_table_for_max(weights, costs)
+    indexes = knapsack_fptas(weights, costs, capacity, epsilon)
+
+    assert indexes == sorted(set(indexes), reverse=True)
+    assert sum(weights[i] for i in indexes) <= capacity
+    assert sum(costs[i] for i in indexes) >= (1 - epsilon) * K[-1][capacity]
+
+
+async def test_get_knapsack_backend():
+    assert get_knapsack_backend("auto") == "numpy"
+    assert get_knapsack_backend("python") == "python"
+
+    with pytest.raises(ValueError):
+        get_knapsack_backend("fortran")
+
+
+class Item:
+    def __init__(self, id, weight, volume, cost=0):
+        self.id = id
+        self.weight = weight
+        self.volume = volume
+        self.cost = cost
+
+
+@pytest.mark.parametrize("seed", range(5))
+async def test_assignment__backends_agree(seed):
+    rnd = random.Random(seed)
+    trains = [
+        Item(i, rnd.randint(5, 20), rnd.randint(50, 100), rnd.randint(5, 50))
+        for i in range(1, 7)
+    ]
+    parcels = [
+        Item(i, rnd.randint(1, 6), rnd.randint(1, 3)) for i in range(1, 16)
+    ]
+
+    expected = AssignmentService(trains, parcels, backend="python").process()
+
+    for backend in ("python", "numpy"):
+        for compact in (False, True):
+            result = AssignmentService(
+                trains, parcels, backend=backend, compact=compact
+            ).process()
+
+            assert result == expected
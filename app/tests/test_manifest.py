@@ -0,0 +1,91 @@
+import pytest
+
+from app.services.manifest import ManifestError, iter_csv_rows
+
+pytestmark = pytest.mark.anyio
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+async def _rows(data: bytes, size: int = 7):
+    return [row async for row in iter_csv_rows(_chunks(data, size))]
+
+
+@pytest.mark.parametrize("size", [1, 5, 1000])
+async def test_iter_csv_rows(size):
+    data = "\ufeffid,Weight,volume\r\n1,5,2\n2,x,1\n\n3,1.5,0.5".encode()
+
+    rows = await _rows(data, size)
+
+    assert [(r.line, r.values) for r in rows] == [
+        (1, {"weight": 5.0, "volume": 2.0}),
+        (2, None),
+        (3, {"weight": 1.5, "volume": 0.5}),
+    ]
+    assert rows[1].error.startswith("weight: ")
+
+
+@pytest.mark.parametrize(
+    "row, field",
+    [
+        (b"nan,1", "weight"),
+        (b"1,inf", "volume"),
+        (b"-1,1", "weight"),
+        (b"1,-0.5", "volume"),
+    ],
+)
+async def test_iter_csv_rows__invalid_values(row, field):
+    rows = await _rows(b"weight,volume\n1,1\n" + row + b"\n")
+
+    assert rows[0].values == {"weight": 1.0, "volume": 1.0}
+    assert (rows[1].line, rows[1].values) == (2, None)
+    assert rows[1].error.startswith(f"{field}: ")
+
+
+async def test_iter_csv_rows__missing_fields():
+    rows = await _rows(b"weight,volume\n1\n")
+
+    assert rows[0].values is None
+    assert rows[0].error == "missing fields"
+
+
+@pytest.mark.parametrize("data", [b"", b"weight,size\n1,2\n"])
+async def test_iter_csv_rows__invalid_header(data):
+    with pytest.raises(ManifestError):
+        await _rows(data)
+
+
+async def test_iter_arrow_rows():
+    pa = pytest.importorskip("pyarrow")
+    from app.services.manifest import iter_arrow_rows
+
+    table = pa.table({"weight": [1.0, None], "volume": [2.0, 3.0]})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    data = sink.getvalue().to_pybytes()
+
+    rows = [row async for row in iter_arrow_rows(_chunks(data, 64))]
+
+    assert [r.values for r in rows] == [{"weight": 1.0, "volume": 2.0}, None]
+
+
+async def test_iter_arrow_rows__truncated():
+    pa = pytest.importorskip("pyarrow")
+    from app.services.manifest import iter_arrow_rows
+
+    table = pa.table({"weight": [1.0, 2.0], "volume": [2.0, 3.0]})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+        writer.write_table(table)
+    data = sink.getvalue().to_pybytes()
+
+    rows = []
+    with pytest.raises(ManifestError):
+        async for row in iter_arrow_rows(_chunks(data[:-40], 64)):
+            rows.append(row)
+    assert len(rows) == 2
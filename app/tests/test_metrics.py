@@ -0,0 +1,61 @@
+import pytest
+from httpx import AsyncClient
+
+from app.services.metrics import MetricsRegistry, PhaseStats, metrics
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_phase_stats():
+    stats = PhaseStats()
+    with stats.timer("solve"):
+        pass
+    with stats.timer("solve"):
+        pass
+    stats.count("rows_updated", 3)
+    stats.count("rows_updated")
+
+    other = PhaseStats()
+    other.count("rows_updated", 2)
+    with other.timer("fetch"):
+        pass
+    stats.merge(other)
+
+    assert set(stats.timings) == {"solve", "fetch"}
+    assert stats.counters == {"rows_updated": 6}
+
+
+async def test_record_fill():
+    registry = MetricsRegistry()
+    stats = PhaseStats()
+    stats.timings["solve"] = 20.0
+    stats.count("table_cells", 500)
+
+    registry.record_fill(stats)
+    registry.record_fill(stats)
+
+    histograms = registry.histograms()
+    solve = histograms[("fill_phase_seconds", (("phase", "solve"),))]
+    assert solve.count == 2
+    assert solve.sum == pytest.approx(0.04)
+
+    text = registry.render()
+    assert "# TYPE fill_phase_seconds histogram" in text
+    assert 'fill_phase_seconds_bucket{phase="solve",le="0.01"} 0' in text
+    assert 'fill_phase_seconds_bucket{phase="solve",le="0.05"} 2' in text
+    assert 'fill_phase_seconds_bucket{phase="solve",le="+Inf"} 2' in text
+    assert 'fill_size_bucket{counter="table_cells",le="1000"} 2' in text
+    assert 'fill_size_count{counter="table_cells"} 2' in text
+
+
+async def test_get_metrics(async_client: AsyncClient):
+    stats = PhaseStats()
+    stats.timings["fetch"] = 1.0
+    metrics.record_fill(stats)
+
+    resp = await async_client.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert 'fill_phase_seconds_count{phase="fetch"}' in resp.text
+    assert "solution_cache_hits" in resp.text
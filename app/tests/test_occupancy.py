@@ -0,0 +1,116 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import LineOccupancy, TrainLine, database
+from app.services.occupancy import IntervalTree, LineOccupancyIndex
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_overlapping_matches_scan():
+    rnd = random.Random(7)
+    intervals = []
+    tree = IntervalTree()
+    for i in range(500):
+        start = rnd.randint(0, 1000)
+        end = start + rnd.randint(1, 50)
+        intervals.append((start, end, i))
+        tree.add(start, end, i)
+
+    assert len(tree) == 500
+    for _ in range(200):
+        start = rnd.randint(0, 1050)
+        end = start + rnd.randint(1, 100)
+        expected = sorted(
+            (s, e, i) for s, e, i in intervals if s < end and start < e
+        )
+
+        assert sorted(tree.overlapping(start, end)) == expected
+
+
+async def test_half_open_intervals():
+    tree = IntervalTree()
+    tree.add(10, 20, "a")
+    tree.add(10, 20, "b")
+
+    assert list(tree.overlapping(0, 10)) == []
+    assert list(tree.overlapping(20, 30)) == []
+    assert sorted(v for _, _, v in tree.overlapping(19, 21)) == ["a", "b"]
+    assert list(IntervalTree().overlapping(0, 10)) == []
+
+    with pytest.raises(ValueError):
+        tree.add(20, 20)
+
+
+async def test_line_occupancy_index():
+    index = LineOccupancyIndex()
+    line_id = await database.execute(TrainLine.insert().values(name="Green"))
+    start = datetime.utcnow() + timedelta(days=1)
+
+    await index.occupy(
+        [
+            dict(
+                line_id=line_id,
+                start_at=start,
+                end_at=start + timedelta(hours=1),
+            )
+        ]
+    )
+    await index.refresh()
+
+    assert await index.busy_lines(start, start + timedelta(minutes=1)) == {
+        line_id
+    }
+    assert (
+        await index.busy_lines(start + timedelta(hours=1), start.max) == set()
+    )
+
+    # stored by another worker, read before the next query
+    await database.execute(
+        LineOccupancy.insert().values(
+            line_id=line_id,
+            start_at=start + timedelta(hours=2),
+            end_at=start + timedelta(hours=3),
+        )
+    )
+    assert await index.busy_lines(start + timedelta(hours=2), start.max) == {
+        line_id
+    }
+
+    await index.rebuild()
+    assert len(index.tree) == 2
+
+
+async def test_line_occupancy_index__skips_ended_intervals():
+    index = LineOccupancyIndex(prune_every=timedelta(hours=1))
+    line_id = await database.execute(TrainLine.insert().values(name="Green"))
+    now = datetime.utcnow()
+
+    await index.occupy(
+        [
+            dict(
+                line_id=line_id,
+                start_at=now - timedelta(hours=2),
+                end_at=now - timedelta(hours=1),
+            ),
+            dict(
+                line_id=line_id,
+                start_at=now - timedelta(minutes=30),
+                end_at=now + timedelta(minutes=30),
+            ),
+        ]
+    )
+    await index.rebuild()
+    assert len(index.tree) == 1
+
+    # ended since the last load
+    await database.execute(
+        LineOccupancy.update()
+        .where(LineOccupancy.c.end_at > now)
+        .values(end_at=now)
+    )
+    index.pruned_at = now - timedelta(hours=1)
+    assert await index.busy_lines(now, now + timedelta(hours=1)) == set()
+    assert len(index.tree) == 0
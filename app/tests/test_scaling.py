@@ -0,0 +1,81 @@
+from fractions import Fraction
+
+import pytest
+
+from app.services.batches import ParcelItem, TrainItem
+from app.services.parcel_assignment import AssignmentService
+from app.services.scaling import scale_problem, scale_values
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_scale_values__divides_by_gcd():
+    scale = scale_values([2000, 3000, 500], [10000, 7500])
+
+    assert scale.unit == 500
+    assert scale.parcels == [4, 6, 1]
+    assert scale.trains == [20, 15]
+
+
+async def test_scale_values__fractional_values():
+    scale = scale_values([0.5, 1.25], [2.0])
+
+    assert scale.unit == Fraction(1, 4)
+    assert scale.parcels == [2, 5]
+    assert scale.trains == [8]
+
+
+async def test_scale_values__precision_is_conservative():
+    scale = scale_values([1.2, 0.9], [2.9], precision=0.5)
+
+    # parcels are rounded up and capacities rounded down
+    assert scale.unit == Fraction(1, 2)
+    assert scale.parcels == [3, 2]
+    assert scale.trains == [5]
+
+
+async def test_scale_values__invalid_precision():
+    with pytest.raises(ValueError):
+        scale_values([1], [2], precision=0)
+
+
+async def test_scale_values__float_noise_is_bounded():
+    scale = scale_values([0.30000000000000004, 5], [1000], max_units=1000)
+
+    # quantized to 1000 steps of the largest value, conservatively
+    assert scale.unit == 1
+    assert scale.parcels == [1, 5]
+    assert scale.trains == [1000]
+
+    exact = scale_values([0.30000000000000004, 5], [1000], max_units=None)
+    assert exact.trains[0] > 10**18
+
+
+async def test_scale_problem():
+    trains = [TrainItem(1, 10000, 30, 15.5)]
+    parcels = [ParcelItem(7, 2500, 12), ParcelItem(8, 5000, 6)]
+
+    problem = scale_problem(trains, parcels)
+
+    assert list(problem.trains) == [TrainItem(1, 4, 5, 15.5)]
+    assert list(problem.parcels) == [ParcelItem(7, 1, 2), ParcelItem(8, 2, 1)]
+    assert problem.weight_unit == 2500
+    assert problem.volume_unit == 6
+    assert problem.table_dimensions() == {
+        "select_trains": (2, 5),
+        "assign_parcels": (3, 4),
+    }
+
+
+async def test_assignment__fractional_weights():
+    trains = [TrainItem(1, 2.5, 10, 10.0), TrainItem(2, 1.5, 10, 5.0)]
+    parcels = [
+        ParcelItem(1, 0.5, 1),
+        ParcelItem(2, 0.75, 1),
+        ParcelItem(3, 1.25, 1),
+    ]
+
+    results, costs = AssignmentService(trains, parcels).process()
+
+    assert costs == 10.0
+    assert results == {1: [1, 2, 3]}
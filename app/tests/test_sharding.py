@@ -0,0 +1,83 @@
+from typing import NamedTuple, Optional
+
+import pytest
+
+from app.services.batches import ParcelItem
+from app.services.sharding import (
+    ROUTING_POLICIES,
+    RoutingPolicy,
+    get_routing_policy,
+    partition,
+    register_routing_policy,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class LineTrain(NamedTuple):
+    id: int
+    weight: int
+    volume: int
+    cost: float
+    line_id: Optional[int]
+
+
+TRAINS = [
+    LineTrain(1, 30, 10, 10.0, 2),
+    LineTrain(2, 10, 10, 10.0, 1),
+    LineTrain(3, 10, 10, 10.0, 2),
+    LineTrain(4, 10, 10, 10.0, None),
+]
+PARCELS = [ParcelItem(i, w, 1) for i, w in enumerate([9, 8, 7, 6, 5], 1)]
+
+
+async def test_partition_by_line():
+    shards = partition(TRAINS, PARCELS, get_routing_policy("hash"))
+
+    assert [s.line_id for s in shards] == [1, 2, None]
+    assert [[t.id for t in s.trains] for s in shards] == [[2], [1, 3], [4]]
+    # every parcel is routed to one line
+    routed = sorted(p.id for s in shards for p in s.parcels)
+    assert routed == [p.id for p in PARCELS]
+    assert [[p.id for p in s.parcels] for s in shards] == [[3], [1, 4], [2, 5]]
+
+
+async def test_capacity_routing():
+    shards = partition(TRAINS, PARCELS, get_routing_policy("capacity"))
+    weights = {s.line_id: sum(p.weight for p in s.parcels) for s in shards}
+
+    # the line of 40 gets the parcels until it has as much left as the
+    # others, then the ties go to the first line
+    assert weights == {1: 5, 2: 30, None: 0}
+    for shard in shards:
+        assert shard.parcels == sorted(shard.parcels, key=lambda p: p.id)
+
+
+async def test_partition_without_trains():
+    assert partition([], PARCELS, get_routing_policy("capacity")) == []
+
+
+async def test_register_routing_policy():
+    @register_routing_policy("first")
+    class FirstLine(RoutingPolicy):
+        def route(self, parcels, lines):
+            return {next(iter(lines)): parcels}
+
+    try:
+        shards = partition(TRAINS, PARCELS, get_routing_policy("first"))
+        assert [len(s.parcels) for s in shards] == [5, 0, 0]
+    finally:
+        del ROUTING_POLICIES["first"]
+
+
+async def test_unknown_routing_policy():
+    with pytest.raises(ValueError):
+        get_routing_policy("random")
+
+
+async def test_routing_policy_is_abstract():
+    class NoRoute(RoutingPolicy):
+        pass
+
+    with pytest.raises(TypeError):
+        NoRoute()
@@ -0,0 +1,80 @@
+import pytest
+
+from app.services.batches import ParcelItem, TrainItem
+from app.services.solution_cache import SolutionCache, solution_fingerprint
+
+pytestmark = pytest.mark.anyio
+
+TRAINS = [TrainItem(1, 10, 10, 10.0), TrainItem(2, 20, 5, 30.0)]
+PARCELS = [ParcelItem(1, 4, 1), ParcelItem(2, 6, 1)]
+
+
+async def test_fingerprint__order_independent():
+    key = solution_fingerprint(TRAINS, PARCELS, {"strategy": "exact"})
+
+    assert key == solution_fingerprint(
+        TRAINS[::-1], PARCELS[::-1], {"strategy": "exact"}
+    )
+
+
+@pytest.mark.parametrize(
+    "trains, parcels, options",
+    [
+        ([TrainItem(1, 10, 10, 11.0), TRAINS[1]], PARCELS, None),
+        (TRAINS, [ParcelItem(1, 4, 2), PARCELS[1]], None),
+        (TRAINS, PARCELS[:1], None),
+        (TRAINS, PARCELS, {"strategy": "greedy"}),
+    ],
+)
+async def test_fingerprint__input_changed(trains, parcels, options):
+    key = solution_fingerprint(TRAINS, PARCELS, {"strategy": "exact"})
+
+    assert key != solution_fingerprint(
+        trains, parcels, options or {"strategy": "exact"}
+    )
+
+
+async def test_get_put():
+    cache = SolutionCache(max_entries=2)
+
+    assert cache.get("a") is None
+    cache.put("a", ({1: [1, 2]}, 10.0))
+
+    assert cache.get("a") == ({1: [1, 2]}, 10.0)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+async def test_lru_eviction__entries():
+    cache = SolutionCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+async def test_lru_eviction__bytes():
+    cache = SolutionCache(max_entries=10, max_bytes=300)
+    cache.put("a", "x" * 100)
+    cache.put("b", "y" * 100)
+    cache.put("c", "z" * 100)
+
+    assert cache.get("a") is None
+    assert len(cache) == 2
+    assert cache.size <= 300
+
+    cache.put("d", "w" * 1000)
+    assert cache.get("d") is None
+
+
+async def test_disabled():
+    cache = SolutionCache(max_entries=0)
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
@@ -0,0 +1,74 @@
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+import sqlalchemy
+
+from app.db import database, engine
+from app.storage import (
+    ProfiledConnection,
+    checkpoint,
+    storage_pragmas,
+    verify_storage_profile,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_databases_connection_profile():
+    synchronous = await database.fetch_val(
+        sqlalchemy.text("PRAGMA synchronous")
+    )
+    journal_mode = await database.fetch_val(
+        sqlalchemy.text("PRAGMA journal_mode")
+    )
+
+    assert synchronous == 1
+    assert journal_mode == "wal"
+
+
+async def test_engine_connection_profile():
+    with engine.connect() as conn:
+        report = verify_storage_profile(conn.connection)
+
+    assert report["journal_mode"]["effective"] == "wal"
+    assert report["busy_timeout"]["effective"] == 5000
+    assert report["cache_size"]["effective"] == -64 * 1024
+    assert report["temp_store"]["effective"] == 2
+
+
+async def test_verify_storage_profile__ignored(caplog):
+    # an in-memory database has no WAL
+    conn = sqlite3.connect(":memory:", factory=ProfiledConnection)
+
+    report = verify_storage_profile(conn)
+
+    assert report["journal_mode"] == {
+        "configured": "wal",
+        "effective": "memory",
+    }
+    assert "SQLite journal_mode is memory instead of wal" in caplog.text
+
+
+async def test_storage_pragmas__disabled():
+    with patch("app.storage.app_config.SQLITE_JOURNAL_MODE", None), patch(
+        "app.storage.app_config.SQLITE_CACHE_SIZE_KIB", None
+    ):
+        names = [name for name, _ in storage_pragmas()]
+
+    assert "journal_mode" not in names
+    assert "cache_size" not in names
+    assert "synchronous" in names
+
+
+async def test_checkpoint(tmp_path):
+    conn = sqlite3.connect(tmp_path / "wal.db", factory=ProfiledConnection)
+    conn.execute("CREATE TABLE t (x)")
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.commit()
+
+    assert checkpoint(conn, "truncate") == (0, 0, 0)
+    assert (tmp_path / "wal.db-wal").stat().st_size == 0
+
+    with pytest.raises(ValueError):
+        checkpoint(conn, "sometimes")
@@ -0,0 +1,170 @@
+import random
+
+import pytest
+
+from app.services.batches import ParcelItem, TrainItem
+from app.services.deadline import Deadline, DeadlineExceeded
+from app.services.parcel_assignment import AssignmentService
+from app.services.strategies import (
+    STRATEGIES,
+    AssignmentStrategy,
+    get_strategy,
+    register_strategy,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def random_problem(seed: int):
+    rnd = random.Random(seed)
+    trains = [
+        TrainItem(
+            i, rnd.randint(20, 60), rnd.randint(20, 60), rnd.randint(10, 90)
+        )
+        for i in range(1, 9)
+    ]
+    parcels = [
+        ParcelItem(i, rnd.randint(1, 10), rnd.randint(1, 10))
+        for i in range(1, 31)
+    ]
+    return trains, parcels
+
+
+async def test_get_strategy():
+    assert {"exact", "greedy", "fptas"} <= set(STRATEGIES)
+    assert get_strategy("greedy").name == "greedy"
+
+    with pytest.raises(ValueError):
+        get_strategy("random")
+
+
+async def test_register_strategy():
+    @register_strategy("nothing")
+    class NothingStrategy(AssignmentStrategy):
+        def solve(self, service):
+            return {}
+
+    try:
+        trains, parcels = random_problem(0)
+        svc = AssignmentService(trains, parcels, strategy="nothing")
+
+        assert svc.process() == ({}, 0)
+    finally:
+        del STRATEGIES["nothing"]
+
+
+@pytest.mark.parametrize("strategy", ["greedy", "fptas"])
+@pytest.mark.parametrize("seed", range(5))
+async def test_strategies__respect_capacities(strategy, seed):
+    trains, parcels = random_problem(seed)
+    trains_by_id = {t.id: t for t in trains}
+    parcels_by_id = {p.id: p for p in parcels}
+
+    results, costs = AssignmentService(
+        trains, parcels, strategy=strategy, epsilon=0.2
+    ).process()
+
+    assigned = [i for ids in results.values() for i in ids]
+    assert len(assigned) == len(set(assigned))
+    assert costs == sum(trains_by_id[i].cost for i in results)
+    for train_id, parcel_ids in results.items():
+        weight = sum(parcels_by_id[i].weight for i in parcel_ids)
+        assert weight <= trains_by_id[train_id].weight
+
+    if strategy == "greedy":
+        for train_id, parcel_ids in results.items():
+            volume = sum(parcels_by_id[i].volume for i in parcel_ids)
+            assert volume <= trains_by_id[train_id].volume
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("strategy", ["exact", "greedy", "fptas"])
+@pytest.mark.parametrize("seed", range(5))
+async def test_residual__respects_volumes(strategy, compact, seed):
+    trains, parcels = random_problem(seed)
+    trains_by_id = {t.id: t for t in trains}
+    parcels_by_id = {p.id: p for p in parcels}
+
+    results = AssignmentService(
+        trains, parcels, strategy=strategy, compact=compact, epsilon=0.2
+    ).process_residual()
+
+    for train_id, parcel_ids in results.items():
+        train = trains_by_id[train_id]
+        assert sum(parcels_by_id[i].weight for i in parcel_ids) <= train.weight
+        assert sum(parcels_by_id[i].volume for i in parcel_ids) <= train.volume
+
+
+async def test_residual__no_volume_left():
+    trains = [TrainItem(1, 10, 0, 10.0), TrainItem(2, 10, 3, 10.0)]
+    parcels = [ParcelItem(1, 5, 2), ParcelItem(2, 5, 2)]
+
+    results = AssignmentService(trains, parcels).process_residual()
+
+    assert list(results) == [2]
+    assert len(results[2]) == 1
+
+
+async def test_greedy__first_fit_decreasing():
+    trains = [TrainItem(1, 10, 10, 10.0), TrainItem(2, 10, 10, 10.0)]
+    parcels = [
+        ParcelItem(1, 3, 1),
+        ParcelItem(2, 7, 1),
+        ParcelItem(3, 5, 1),
+        ParcelItem(4, 5, 1),
+    ]
+
+    results, costs = AssignmentService(
+        trains, parcels, strategy="greedy"
+    ).process()
+
+    assert costs == 20.0
+    assert results == {1: [2, 1], 2: [3, 4]}
+
+
+async def test_deadline():
+    with pytest.raises(DeadlineExceeded):
+        Deadline(0).check()
+
+    assert Deadline(60_000).expired() is False
+
+
+async def test_anytime__proven_optimal():
+    trains = [TrainItem(1, 10, 10, 10.0), TrainItem(2, 10, 10, 30.0)]
+    parcels = [ParcelItem(1, 4, 1), ParcelItem(2, 6, 1)]
+
+    svc = AssignmentService(trains, parcels, deadline_ms=60_000)
+    results, costs = svc.process()
+
+    assert results == {1: [2, 1]}
+    assert costs == 10.0
+    assert svc.lower_bound == 10.0
+    assert svc.optimal is True
+    assert svc.gap == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+async def test_anytime__not_worse_than_greedy(seed):
+    trains, parcels = random_problem(seed)
+
+    greedy = AssignmentService(trains, parcels, strategy="greedy").process()
+    svc = AssignmentService(trains, parcels, deadline_ms=60_000)
+    results, costs = svc.process()
+
+    assigned = sum(map(len, results.values()))
+    greedy_assigned = sum(map(len, greedy[0].values()))
+    assert (-assigned, costs) <= (-greedy_assigned, greedy[1])
+    assert svc.optimal is not None
+    assert svc.lower_bound <= costs or assigned < len(parcels)
+
+
+async def test_anytime__expired_deadline_returns_heuristic():
+    trains, parcels = random_problem(0)
+
+    svc = AssignmentService(trains, parcels, deadline_ms=1e-6)
+    results, _ = svc.process()
+
+    expected, _ = AssignmentService(
+        trains, parcels, strategy="greedy"
+    ).process()
+    assert results == expected
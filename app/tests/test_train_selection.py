@@ -0,0 +1,87 @@
+import itertools
+import random
+
+import pytest
+
+from app.services.train_selection import select_min_cost_cover
+
+pytestmark = pytest.mark.anyio
+
+
+def brute_force_cover(weights, volumes, costs, min_weight, min_volume):
+    best = None
+    for size in range(len(weights) + 1):
+        for indexes in itertools.combinations(range(len(weights)), size):
+            if (
+                sum(weights[i] for i in indexes) >= min_weight
+                and sum(volumes[i] for i in indexes) >= min_volume
+            ):
+                cost = sum(costs[i] for i in indexes)
+                if best is None or cost < best:
+                    best = cost
+    return best
+
+
+@pytest.mark.parametrize("seed", range(20))
+async def test_select_min_cost_cover__optimal(seed):
+    rnd = random.Random(seed)
+    n = 8
+    weights = [rnd.randint(1, 20) for _ in range(n)]
+    volumes = [rnd.randint(1, 20) for _ in range(n)]
+    costs = [rnd.randint(1, 100) for _ in range(n)]
+    min_weight = rnd.randint(1, sum(weights))
+    min_volume = rnd.randint(1, sum(volumes))
+
+    result = select_min_cost_cover(
+        weights, volumes, costs, min_weight, min_volume
+    )
+
+    assert result.exact is True
+    assert result.cost == brute_force_cover(
+        weights, volumes, costs, min_weight, min_volume
+    )
+    assert result.indexes == sorted(result.indexes, reverse=True)
+    assert sum(weights[i] for i in result.indexes) >= min_weight
+    assert sum(volumes[i] for i in result.indexes) >= min_volume
+
+
+async def test_select_min_cost_cover__volume_bound():
+    # the cheapest weight cover (index 0) does not have enough volume
+    result = select_min_cost_cover(
+        weights=[13, 1, 1, 1, 5],
+        volumes=[1, 1, 1, 1, 1],
+        costs=[130, 10, 11, 12, 50],
+        min_weight=14,
+        min_volume=4,
+    )
+
+    assert result.indexes == [3, 2, 1, 0]
+    assert result.cost == 163
+
+
+async def test_select_min_cost_cover__infeasible():
+    result = select_min_cost_cover(
+        weights=[10, 10],
+        volumes=[1, 1],
+        costs=[1, 1],
+        min_weight=5,
+        min_volume=5,
+    )
+
+    assert result is None
+
+
+async def test_select_min_cost_cover__max_states():
+    rnd = random.Random(0)
+    n = 40
+    weights = [rnd.randint(1, 1000) for _ in range(n)]
+    volumes = [rnd.randint(1, 1000) for _ in range(n)]
+    costs = [rnd.randint(1, 1000) for _ in range(n)]
+
+    result = select_min_cost_cover(
+        weights, volumes, costs, 10_000, 10_000, max_states=16
+    )
+
+    assert sum(weights[i] for i in result.indexes) >= 10_000
+    assert sum(volumes[i] for i in result.indexes) >= 10_000
+    assert result.cost == sum(costs[i] for i in result.indexes)